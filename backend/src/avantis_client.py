@@ -1,9 +1,13 @@
+import threading
 from typing import Optional
 
 from .config import settings
 
 
 _trader_client = None
+# Warmup builds the client in a worker thread while handlers may ask for it
+# on the event loop; only one may construct (and patch) it
+_trader_client_lock = threading.Lock()
 
 
 def get_trader_client():
@@ -13,11 +17,21 @@ def get_trader_client():
     dependencies are being installed, and to make testing easier.
     """
     global _trader_client
-    if _trader_client is None:
-        # Import here to avoid slowing module import time
-        from avantis_trader_sdk import TraderClient
-
-        _trader_client = TraderClient(settings.provider_url)
+    if _trader_client is not None:
+        return _trader_client
+    with _trader_client_lock:
+        if _trader_client is None:
+            # Import here to avoid slowing module import time
+            from avantis_trader_sdk import TraderClient
+
+            trader_client = TraderClient(settings.provider_url)
+            if settings.rpc_cache_enabled:
+                # Cache, coalesce and batch the SDK's JSON-RPC calls
+                from .rpc_client import install
+
+                install(trader_client)
+            # Published only once patched, so no caller sees the bare client
+            _trader_client = trader_client
     return _trader_client
 
 
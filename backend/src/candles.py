@@ -0,0 +1,318 @@
+"""OHLC candles built in memory from price feed ticks.
+
+Each resolution keeps a fixed number of candles in a ring buffer shared by
+all pairs: one row per time bucket, one column per pair, NumPy arrays for
+open/high/low/close and the tick count. Every feed update carries one
+timestamp for all pairs, so a whole update lands in one row and is applied
+with a handful of vectorized operations per resolution. A pair without
+ticks in a bucket has NaN prices there and no candle is served for it.
+
+Memory is fixed per pair and resolution (`capacity` rows of four float64
+prices and an int32 count); columns are allocated as pairs first tick, up
+to `max_pairs`. At startup the rings can be refilled from the tick store in
+a worker thread; live ticks arriving meanwhile are held and applied after.
+"""
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import settings
+from .metrics import candle_buffer_bytes
+from .price_snapshot import price_snapshot
+
+if TYPE_CHECKING:
+    from .tick_store import Ticks, TickStore
+
+
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600, "1d": 86400}
+
+_PRICE_COLUMNS = ("o", "h", "l", "c")
+
+
+class CandleRing:
+    """Ring buffer of `capacity` time buckets of `seconds` for many pairs."""
+
+    def __init__(self, seconds: int, capacity: int, columns: int):
+        self.seconds = seconds
+        self.capacity = capacity
+        self.t = np.zeros(capacity, dtype=np.int64)
+        self.prices = {name: np.full((capacity, columns), np.nan) for name in _PRICE_COLUMNS}
+        self.v = np.zeros((capacity, columns), dtype=np.int32)
+        self.head = -1  # row of the newest bucket
+        self.count = 0
+        self.late_ticks = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.t.nbytes + self.v.nbytes + sum(a.nbytes for a in self.prices.values())
+
+    def bytes_per_pair(self) -> int:
+        return self.capacity * (8 * len(_PRICE_COLUMNS) + 4)
+
+    def grow(self, columns: int) -> None:
+        extra = columns - self.v.shape[1]
+        for name, array in self.prices.items():
+            self.prices[name] = np.hstack([array, np.full((self.capacity, extra), np.nan)])
+        self.v = np.hstack([self.v, np.zeros((self.capacity, extra), dtype=np.int32)])
+
+    def _row_for(self, timestamp: float) -> Optional[int]:
+        bucket = int(timestamp) // self.seconds * self.seconds
+        if self.count and bucket == self.t[self.head]:
+            return self.head
+        if self.count and bucket < self.t[self.head]:
+            # Older than the open candle: ingestion is in time order
+            self.late_ticks += 1
+            return None
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.t[self.head] = bucket
+        for array in self.prices.values():
+            array[self.head] = np.nan
+        self.v[self.head] = 0
+        return self.head
+
+    def add(self, timestamp: float, columns: np.ndarray, prices: np.ndarray) -> None:
+        self.merge(timestamp, columns, prices, prices, prices, prices, 1)
+
+    def merge(
+        self,
+        timestamp: float,
+        columns: np.ndarray,
+        opens: np.ndarray,
+        highs: np.ndarray,
+        lows: np.ndarray,
+        closes: np.ndarray,
+        counts: Any,
+    ) -> None:
+        """Fold partial candles of the bucket holding `timestamp` into it."""
+        row = self._row_for(timestamp)
+        if row is None:
+            return
+        o, h, l, c = (self.prices[name][row] for name in _PRICE_COLUMNS)
+        opening = np.isnan(o[columns])
+        o[columns[opening]] = opens[opening]
+        h[columns] = np.fmax(h[columns], highs)
+        l[columns] = np.fmin(l[columns], lows)
+        c[columns] = closes
+        self.v[row, columns] += counts
+
+    def ordered_rows(self) -> np.ndarray:
+        """Row numbers from the oldest bucket to the newest."""
+        start = (self.head - self.count + 1) % self.capacity
+        return (start + np.arange(self.count)) % self.capacity
+
+    def query(self, column: int, start: Optional[int], end: Optional[int]) -> Dict[str, List[Any]]:
+        """Candles of one pair with bucket times in [start, end], oldest first."""
+        rows = self.ordered_rows()
+        times = self.t[rows]
+        lo = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+        hi = len(rows) if end is None else int(np.searchsorted(times, end, side="right"))
+        rows = rows[lo:hi]
+        closes = self.prices["c"][rows, column]
+        rows = rows[~np.isnan(closes)]
+        candles = {"t": self.t[rows].tolist()}
+        for name in _PRICE_COLUMNS:
+            candles[name] = self.prices[name][rows, column].tolist()
+        candles["v"] = self.v[rows, column].tolist()
+        return candles
+
+
+class CandleStore:
+    """Candles per resolution for every pair seen on the price feed."""
+
+    def __init__(self, resolutions: Sequence[str], capacity: int, max_pairs: int):
+        unknown = [r for r in resolutions if r not in RESOLUTIONS]
+        if unknown:
+            raise ValueError(f"Unknown candle resolutions: {unknown}")
+        self.capacity = capacity
+        self.max_pairs = max_pairs
+        self.slots: Dict[int, int] = {}
+        # pair index -> column, -1 where unassigned (vectorized lookups)
+        self._slot_lookup = np.full(0, -1, dtype=np.int64)
+        self._columns = 0
+        self.rings = {r: CandleRing(RESOLUTIONS[r], capacity, 0) for r in resolutions}
+        # Live updates held while a backfill runs: (timestamp, pair indices, prices)
+        self._held: Optional[List[Tuple[float, np.ndarray, np.ndarray]]] = None
+        self._backfill_task: Optional[asyncio.Task] = None
+        self._report_memory()
+
+    def _assign(self, pair_indices: np.ndarray) -> None:
+        new = []
+        for pidx in np.unique(pair_indices).tolist():
+            if pidx in self.slots:
+                continue
+            if len(self.slots) + len(new) >= self.max_pairs:
+                logger.warning("⚠️ Candle store is full (%s pairs); not tracking pair %s", self.max_pairs, pidx)
+                continue
+            new.append(pidx)
+        if len(self.slots) + len(new) > self._columns:
+            # Grow in steps so new pairs do not reallocate every time
+            columns = min(self.max_pairs, max(len(self.slots) + len(new), 2 * self._columns, 16))
+            for ring in self.rings.values():
+                ring.grow(columns)
+            self._columns = columns
+            self._report_memory()
+        # Columns exist before any reader can look a new pair up
+        for pidx in new:
+            if pidx >= len(self._slot_lookup):
+                grown = np.full(max(pidx + 1, 2 * len(self._slot_lookup)), -1, dtype=np.int64)
+                grown[:len(self._slot_lookup)] = self._slot_lookup
+                self._slot_lookup = grown
+            slot = len(self.slots)
+            self._slot_lookup[pidx] = slot
+            self.slots[pidx] = slot
+
+    def _columns_for(self, pair_indices: np.ndarray) -> np.ndarray:
+        known = pair_indices < len(self._slot_lookup)
+        columns = np.full(len(pair_indices), -1, dtype=np.int64)
+        columns[known] = self._slot_lookup[pair_indices[known]]
+        return columns
+
+    def ingest(self, timestamp: float, pair_indices: np.ndarray, prices: np.ndarray) -> None:
+        """Add one tick per pair, all at `timestamp` (pair indices unique)."""
+        pair_indices = np.asarray(pair_indices, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        valid = (pair_indices >= 0) & np.isfinite(prices) & (prices > 0)
+        pair_indices, prices = pair_indices[valid], prices[valid]
+        if not len(pair_indices):
+            return
+        columns = self._columns_for(pair_indices)
+        if (columns < 0).any():
+            self._assign(pair_indices[columns < 0])
+            columns = self._columns_for(pair_indices)
+            tracked = columns >= 0
+            columns, prices = columns[tracked], prices[tracked]
+        for ring in self.rings.values():
+            ring.add(timestamp, columns, prices)
+
+    def backfill(self, store: "TickStore", now: float) -> int:
+        """Fill the rings from ticks stored before `now`; returns how many were read.
+
+        Runs before live ingestion (ticks older than a ring's newest candle
+        are dropped). Each resolution reads only its own window, no older
+        than the store's retention, in time order across segments,
+        aggregating every (bucket, pair) group with vectorized reductions.
+        """
+        read = 0
+        for ring in self.rings.values():
+            start = (int(now) // ring.seconds - ring.capacity + 1) * ring.seconds
+            start = max(start, int(now - store.retention) // ring.seconds * ring.seconds)
+            for ticks in store.iter_merged(start, now, step=max(ring.seconds, 3600)):
+                self._fold(ring, ticks)
+                read += len(ticks)
+        return read
+
+    def start_backfill(self, store: "TickStore", now: float) -> None:
+        """Backfill in a worker thread; startup does not wait for it."""
+        if self._backfill_task is None or self._backfill_task.done():
+            self._held = []
+            self._backfill_task = asyncio.create_task(self._run_backfill(store, now))
+
+    async def _run_backfill(self, store: "TickStore", now: float) -> None:
+        started = time.monotonic()
+        try:
+            read = await asyncio.to_thread(self.backfill, store, now)
+            logger.info("🕯️ Backfilled candles from %s stored ticks in %.1fs", read, time.monotonic() - started)
+        except Exception as e:
+            logger.warning("⚠️ Candle backfill from the tick store failed: %s", e)
+        finally:
+            held, self._held = self._held or [], None
+            for timestamp, pair_indices, prices in held:
+                self.ingest(timestamp, pair_indices, prices)
+
+    async def stop(self) -> None:
+        task, self._backfill_task = self._backfill_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def _fold(self, ring: CandleRing, ticks: "Ticks") -> None:
+        pair_indices = ticks.pair_index.astype(np.int64)
+        columns = self._columns_for(pair_indices)
+        if (columns < 0).any():
+            self._assign(pair_indices[columns < 0])
+            columns = self._columns_for(pair_indices)
+        keep = (columns >= 0) & np.isfinite(ticks.price) & (ticks.price > 0)
+        columns, prices = columns[keep], ticks.price[keep]
+        buckets = (ticks.t[keep] // ring.seconds).astype(np.int64) * ring.seconds
+        if not len(buckets):
+            return
+
+        # Stable: ticks keep their time order within each (bucket, pair) group
+        order = np.lexsort((columns, buckets))
+        buckets, columns, prices = buckets[order], columns[order], prices[order]
+        first = np.ones(len(buckets), dtype=bool)
+        first[1:] = (buckets[1:] != buckets[:-1]) | (columns[1:] != columns[:-1])
+        starts = np.flatnonzero(first)
+        ends = np.append(starts[1:], len(prices))
+        g_buckets, g_columns = buckets[starts], columns[starts]
+        opens, closes = prices[starts], prices[ends - 1]
+        highs, lows = np.maximum.reduceat(prices, starts), np.minimum.reduceat(prices, starts)
+        counts = (ends - starts).astype(np.int32)
+
+        bounds = np.append(np.flatnonzero(np.diff(g_buckets)) + 1, len(g_buckets))
+        lo = 0
+        for hi in bounds.tolist():
+            part = slice(lo, hi)
+            ring.merge(
+                int(g_buckets[lo]), g_columns[part], opens[part], highs[part], lows[part], closes[part], counts[part]
+            )
+            lo = hi
+
+    def on_prices(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """price_snapshot listener: the changed feed entries are this update's ticks."""
+        pair_indices, prices = [], []
+        for entry in entries:
+            try:
+                pidx, price = int(entry["pairIndex"]), float(entry["c"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            pair_indices.append(pidx)
+            prices.append(price)
+        if not pair_indices:
+            return
+        if self._held is not None:
+            self._held.append((time.time(), np.array(pair_indices), np.array(prices)))
+            return
+        self.ingest(time.time(), np.array(pair_indices), np.array(prices))
+
+    def candles(
+        self, pair_index: int, resolution: str, start: Optional[int] = None, end: Optional[int] = None
+    ) -> Optional[Dict[str, List[Any]]]:
+        """Candles for a pair (None if it has never ticked)."""
+        ring = self.rings[resolution]
+        column = self.slots.get(pair_index)
+        if column is None:
+            return None
+        return ring.query(column, start, end)
+
+    def memory(self) -> Dict[str, Dict[str, int]]:
+        return {
+            resolution: {
+                "bytes": ring.nbytes,
+                "bytesPerPair": ring.bytes_per_pair(),
+                "capacity": ring.capacity,
+                "candles": ring.count,
+            }
+            for resolution, ring in self.rings.items()
+        }
+
+    def _report_memory(self) -> None:
+        for resolution, ring in self.rings.items():
+            candle_buffer_bytes.set(resolution, value=ring.nbytes)
+
+
+candle_store = CandleStore(
+    resolutions=settings.candle_resolutions,
+    capacity=settings.candle_capacity,
+    max_pairs=settings.candle_max_pairs,
+)
+price_snapshot.add_listener(candle_store.on_prices)
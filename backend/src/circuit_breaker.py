@@ -0,0 +1,112 @@
+import time
+from typing import Awaitable, Callable, Dict, TypeVar
+
+import httpx
+
+from .config import settings
+from .http_clients import CORE, HISTORY, PRICE_FEED
+
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Upstream '{name}' is unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """True for errors that say the upstream is unhealthy (not for 4xx answers)."""
+    if isinstance(exc, (httpx.TransportError, CircuitOpenError)):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    """Per-host breaker: opens after consecutive failures, then lets a single
+    trial call through once `reset_timeout` has passed (half-open)."""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.failure_threshold:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def reset(self) -> None:
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        if not self.allow():
+            retry_in = self.reset_timeout - (time.monotonic() - self.opened_at)
+            raise CircuitOpenError(self.name, max(retry_in, 0.0))
+        try:
+            result = await fn()
+        except BaseException as e:
+            if is_upstream_failure(e):
+                self.record_failure()
+            elif isinstance(e, httpx.HTTPStatusError):
+                # A 4xx still means the host answered
+                self.record_success()
+            else:
+                # Cancelled, out of deadline or our own error: says nothing
+                # about the host, so only give up the trial slot
+                self._trial_in_flight = False
+            raise
+        self.record_success()
+        return result
+
+
+_breakers: Dict[str, CircuitBreaker] = {
+    name: CircuitBreaker(
+        name,
+        failure_threshold=settings.breaker_failure_threshold,
+        reset_timeout=settings.breaker_reset_timeout,
+    )
+    for name in (CORE, HISTORY, PRICE_FEED)
+}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    return _breakers[name]
+
+
+def reset_breakers() -> None:
+    for breaker in _breakers.values():
+        breaker.reset()
@@ -1,5 +1,8 @@
+import os
+import tempfile
+
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
@@ -13,11 +16,173 @@ class Settings(BaseSettings):
         "https://3fe56a7c50e7.ngrok-free.app",
     ]
 
+    # Avantis upstream hosts (one pooled HTTP client is kept per host)
+    core_api_url: str = "https://core.avantisfi.com"
+    history_api_url: str = "https://api.avantisfi.com"
+    price_feed_url: str = "https://feed-v3.avantisfi.com"
+
+    # Per-host request timeouts in seconds
+    core_api_timeout: float = 10.0
+    history_api_timeout: float = 10.0
+    price_feed_timeout: float = 10.0
+    rpc_timeout: float = 10.0
+
+    # Connection pool limits shared by every upstream client
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http2_enabled: bool = True
+
+    # Background price snapshot: refresh period and the age after which a
+    # request refreshes synchronously instead of serving from memory
+    price_snapshot_refresh_interval: float = 2.0
+    price_snapshot_max_staleness: float = 10.0
+
+    # Seconds between keepalive comments on idle price streams
+    price_stream_keepalive: float = 15.0
+
+    # Seconds a trader's core user-data response is reused
+    user_data_cache_ttl: float = 3.0
+    # Seconds past the TTL an entry is kept to serve read-only views while
+    # core is failing, and the most traders kept (least recently used go first)
+    user_data_stale_ttl: float = 300.0
+    user_data_cache_max_entries: int = 10000
+
+    # /tx/batch limits: max items per batch and concurrent SDK builds
+    tx_batch_max_items: int = 50
+    tx_batch_concurrency: int = 8
+
+    # Streaming portfolio history: pages fetched ahead and a hard page cap
+    history_prefetch_window: int = 4
+    history_stream_max_pages: int = 500
+
+    # Timeout applied to each upstream source of the portfolio overview
+    overview_source_timeout: float = 8.0
+
+    # Batch PnL: max addresses per request and concurrent user-data fetches
+    pnl_batch_max_addresses: int = 500
+    pnl_batch_concurrency: int = 16
+
+    # Local closed-trade history store (SQLite). /tmp is the only writable
+    # path on serverless hosts.
+    history_db_path: str = os.path.join(tempfile.gettempdir(), "lattice-history.sqlite3")
+    history_sync_interval: float = 30.0
+    history_page_size: int = 20
+    history_top_trades_limit: int = 10
+    # Seconds a request waits for a first-time history backfill before
+    # serving the trades stored so far (the backfill carries on meanwhile)
+    history_backfill_wait: float = 2.0
+
+    # Stale-while-revalidate cache for read-only proxy routes: seconds a
+    # response is fresh, and how long after that it is still served while
+    # refreshing in the background
+    cache_ttl_profit_loss: float = 30.0
+    cache_ttl_win_rate: float = 30.0
+    cache_stale_ttl: float = 300.0
+    cache_max_entries: int = 10000
+
+    # Per-host circuit breaker: consecutive failures before opening, and
+    # seconds before a trial request is let through again
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout: float = 30.0
+
+    # Pass-through proxy responses: bodies at or above the threshold are
+    # streamed to the client in chunks of `passthrough_chunk_size` bytes
+    passthrough_stream_threshold: int = 256 * 1024
+    passthrough_chunk_size: int = 64 * 1024
+
+    # Build the TraderClient and preload pairs info at startup; /ready
+    # reports 503 until this has finished
+    warmup_on_startup: bool = True
+
+    # Pairs info snapshot loaded at startup (written by
+    # `python -m backend.src.pairs_snapshot`); ignored when the file is missing
+    pairs_snapshot_path: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pairs_snapshot.json")
+
+    # Results returned by /pairs/search at most (its `limit` is clamped)
+    pair_search_max_results: int = 50
+
+    # In-memory OHLC candles built from the price feed: candles kept per
+    # pair and resolution, and the most pairs tracked. Each pair costs
+    # capacity * 36 bytes per resolution.
+    candle_resolutions: List[str] = ["1m", "5m", "15m", "1h", "1d"]
+    candle_capacity: int = 1440
+    candle_max_pairs: int = 512
+    # Rebuild candles from the tick store at startup
+    candle_backfill_on_startup: bool = True
+
+    # On-disk tick store of feed prices: memory-mapped segment files of
+    # `tick_segment_capacity` ticks (20 bytes each), started at least every
+    # `tick_segment_seconds` and deleted after `tick_retention_days`, or
+    # oldest first past `tick_store_max_bytes` / `tick_store_max_segments`.
+    # The feed writes ~4M ticks (~80 MB) a day, so it is off by default:
+    # enable it only on hosts with a persistent disk. One process writes a
+    # directory (a file lock); other workers sharing it only read.
+    tick_store_enabled: bool = False
+    tick_store_path: str = os.path.join(tempfile.gettempdir(), "lattice-ticks")
+    tick_segment_capacity: int = 1_048_576
+    tick_segment_seconds: float = 86400.0
+    tick_retention_days: float = 7.0
+    tick_store_max_bytes: int = 512 * 1024 * 1024
+    tick_store_max_segments: int = 32
+
+    # JSON-RPC layer under the TraderClient's web3 provider: chain-invariant
+    # results are cached for good and per-block results for one block time,
+    # identical in-flight calls are shared, and calls made within
+    # `rpc_batch_window` seconds go out as one JSON-RPC batch
+    rpc_cache_enabled: bool = True
+    rpc_block_time: float = 2.0  # Base
+    rpc_batch_window: float = 0.002
+    rpc_batch_max_size: int = 20
+    rpc_cache_max_entries: int = 4096
+
+    # Further JSON-RPC URLs for the same chain, pooled with provider_url.
+    # Calls go to the endpoint with the best EWMA latency and error rate;
+    # a read still unanswered after that endpoint's p95 latency (clamped to
+    # the hedge delay bounds) is also sent to the next one, and the first
+    # answer wins. Failing endpoints sit out `rpc_error_cooldown` seconds.
+    rpc_urls: List[str] = []
+    rpc_ewma_alpha: float = 0.2
+    rpc_hedge_min_delay: float = 0.02
+    rpc_hedge_max_delay: float = 1.0
+    rpc_error_cooldown: float = 5.0
+
+    # Time budget in seconds for each incoming request (0: none), with
+    # overrides by path prefix. Upstream HTTP and SDK calls only get what is
+    # left of it, and a request still unanswered at its deadline is
+    # cancelled and answered with a 504.
+    request_deadline: float = 10.0
+    request_deadlines: Dict[str, float] = {
+        "/tx/batch": 30.0,
+        "/api/portfolio/pnl/batch": 20.0,
+        # No upstream call to bound
+        "/health": 0.0,
+        "/ready": 0.0,
+        "/metrics": 0.0,
+        "/api/candles": 0.0,
+    }
+
+    # Hedged GETs to the avantisfi.com APIs: a GET still without response
+    # headers after that host's p95 time-to-headers (clamped to the delay
+    # bounds) is sent a second time and the first response wins
+    upstream_hedge_enabled: bool = False
+    upstream_hedge_min_delay: float = 0.05
+    upstream_hedge_max_delay: float = 2.0
+
+    # Logging: level, "text" or "json" lines, and the share of requests per
+    # path prefix whose INFO logs are kept (warnings and errors always are)
+    log_level: str = "INFO"
+    log_format: str = "text"
+    log_sample_rates: Dict[str, float] = {
+        "/health": 0.0,
+        "/ready": 0.0,
+        "/metrics": 0.0,
+        "/api/price-feeds/last-price": 0.01,
+    }
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
 
 
 settings = Settings()
-
-
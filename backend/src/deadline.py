@@ -0,0 +1,132 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, Optional, TypeVar
+
+import httpx
+from fastapi import HTTPException
+
+from .config import settings
+
+
+T = TypeVar("T")
+
+# Absolute time.monotonic() by which the current request must have started
+# its response; set by DeadlineMiddleware and cleared once it has
+deadline_var: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(HTTPException):
+    """The request ran out of its time budget (answered as 504)."""
+
+    def __init__(self):
+        super().__init__(status_code=504, detail="Request deadline exceeded")
+
+
+def budget_for(path: str) -> Optional[float]:
+    """Seconds a request to `path` may take before responding (None: unbounded)."""
+    best, budget = -1, settings.request_deadline
+    for prefix, prefix_budget in settings.request_deadlines.items():
+        if path.startswith(prefix) and len(prefix) > best:
+            best, budget = len(prefix), prefix_budget
+    return budget if budget > 0 else None
+
+
+def remaining() -> Optional[float]:
+    deadline = deadline_var.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def timeout(cap: Optional[float] = None) -> Optional[float]:
+    """`cap` shortened to what is left of the deadline."""
+    left = remaining()
+    if left is None:
+        return cap
+    left = max(left, 0.0)
+    return left if cap is None else min(cap, left)
+
+
+async def within_deadline(awaitable: Awaitable[T], cap: Optional[float] = None) -> T:
+    """Await with what is left of the deadline; the work is cancelled when it runs out.
+
+    Timeouts caused by the deadline become DeadlineExceeded; a timeout from
+    `cap` alone is raised as asyncio.TimeoutError.
+    """
+    limit = timeout(cap)
+    try:
+        # Cancels the current task at the limit, without a task per call
+        async with asyncio.timeout(limit):
+            return await awaitable
+    except (asyncio.TimeoutError, httpx.TimeoutException) as e:
+        if expired():
+            raise DeadlineExceeded() from e
+        raise
+
+
+async def detached(awaitable: Awaitable[T]) -> T:
+    """Run shared work (e.g. a single-flight fetch) without the caller's deadline.
+
+    Every caller still bounds its own wait with `within_deadline`; the work
+    itself should not fail for all of them because the first one was short
+    on time. Only affects the task this runs in.
+    """
+    deadline_var.set(None)
+    return await awaitable
+
+
+class DeadlineMiddleware:
+    """Pure ASGI middleware giving each request a deadline.
+
+    Upstream HTTP timeouts and SDK calls use what is left of it. A request
+    that has not started its response when the deadline passes is cancelled
+    and answered with a 504. Once the response has started (e.g. a stream)
+    the deadline no longer applies. Paths whose budget is 0 (health checks,
+    metrics, in-memory reads) are passed through untouched.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        budget = budget_for(scope["path"]) if scope["type"] == "http" else None
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = False
+        # Runs in the request's own task: no extra task per request
+        limit = asyncio.timeout(budget)
+
+        async def send_tracking(message: Dict[str, Any]) -> None:
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                deadline_var.set(None)
+                limit.reschedule(None)
+            await send(message)
+
+        token = deadline_var.set(time.monotonic() + budget)
+        try:
+            async with limit:
+                await self.app(scope, receive, send_tracking)
+        except TimeoutError:
+            # Only answer for our own timeout; one raised by the app is its own
+            if not limit.expired() or started:
+                raise
+        else:
+            return
+        finally:
+            deadline_var.reset(token)
+
+        body = b'{"detail":"Request deadline exceeded"}'
+        await send({
+            "type": "http.response.start",
+            "status": 504,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
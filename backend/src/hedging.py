@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import httpx
+
+from .metrics import upstream_hedges
+
+
+logger = logging.getLogger(__name__)
+
+# Time-to-headers samples kept per host for its p95
+_WINDOW = 128
+_MIN_SAMPLES = 8
+
+# Only requests that are safe to send twice
+HEDGED_METHODS = {"GET", "HEAD"}
+
+
+class HedgingTransport(httpx.AsyncBaseTransport):
+    """Sends a second copy of a slow idempotent request to the same host.
+
+    A GET or HEAD still without response headers after the host's p95
+    time-to-headers (clamped to `min_delay`..`max_delay`) is sent again on
+    another connection; the first response wins and the other request is
+    cancelled, or its response closed. Until enough samples are in, the
+    delay is `max_delay`. Other methods pass straight through.
+    """
+
+    def __init__(self, host: str, transport: httpx.AsyncBaseTransport, min_delay: float, max_delay: float):
+        self.host = host
+        self.transport = transport
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.samples: Deque[float] = deque(maxlen=_WINDOW)
+
+    def hedge_delay(self) -> float:
+        if len(self.samples) < _MIN_SAMPLES:
+            return self.max_delay
+        ordered = sorted(self.samples)
+        p95 = ordered[int(0.95 * (len(ordered) - 1))]
+        return min(self.max_delay, max(self.min_delay, p95))
+
+    async def _attempt(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        self.samples.append(time.perf_counter() - started)
+        return response
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method not in HEDGED_METHODS:
+            return await self.transport.handle_async_request(request)
+
+        first = asyncio.ensure_future(self._attempt(request))
+        running: Dict[asyncio.Future, bool] = {first: False}  # task -> is the hedge
+        last_error: Optional[BaseException] = None
+        try:
+            done, _ = await asyncio.wait(running, timeout=self.hedge_delay())
+            if not done:
+                upstream_hedges.inc(self.host, "sent")
+                running[asyncio.ensure_future(self._attempt(request))] = True
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    hedge = running.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if hedge:
+                            upstream_hedges.inc(self.host, "won")
+                        return task.result()
+                    last_error = error
+                    if running:
+                        logger.warning("⚠️ %s request failed while hedged: %s", self.host, error)
+            raise last_error
+        finally:
+            for task in running:
+                task.cancel()
+                task.add_done_callback(_close_response)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def _close_response(task: asyncio.Future) -> None:
+    # A losing request that got its headers anyway still holds a connection
+    if task.cancelled() or task.exception() is not None:
+        return
+    asyncio.ensure_future(task.result().aclose())
@@ -0,0 +1,362 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from .circuit_breaker import get_breaker, is_upstream_failure
+from .config import settings
+from .deadline import detached, remaining
+from .http_clients import HISTORY
+from .portfolio_history import fetch_history_page, iter_history_pages
+from .user_data import normalize_address
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    address TEXT NOT NULL,
+    trade_id TEXT NOT NULL,
+    sort_key INTEGER NOT NULL,
+    net_pnl REAL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (address, trade_id)
+);
+CREATE INDEX IF NOT EXISTS trades_by_recency ON trades (address, sort_key DESC);
+CREATE INDEX IF NOT EXISTS trades_by_pnl ON trades (address, net_pnl DESC);
+CREATE TABLE IF NOT EXISTS sync_state (
+    address TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL,
+    backfill_page INTEGER
+);
+"""
+
+
+def trade_id(trade: Dict[str, Any]) -> str:
+    """Stable id for a closed trade: the upstream `_id`, else a content hash."""
+    if trade.get("_id"):
+        return str(trade["_id"])
+    return hashlib.sha1(json.dumps(trade, sort_keys=True).encode()).hexdigest()
+
+
+def trade_net_pnl(trade: Dict[str, Any]) -> Optional[float]:
+    if trade.get("_mapped_netPnl") is not None:
+        return float(trade["_mapped_netPnl"])
+    args = (trade.get("event") or {}).get("args") or {}
+    try:
+        return float(args["usdcSentToTrader"]) - float(args["positionSizeUSDC"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class HistoryStore:
+    """On-disk (SQLite, WAL) store of closed trades keyed by (address, trade id).
+
+    Closed trades never change, so a sync only walks upstream pages (newest
+    first) until it reaches a trade that is already stored. History pages and
+    top trades are then answered from the local table.
+
+    An address seen for the first time is backfilled in the background, a
+    page at a time (prefetching `history_prefetch_window` pages): each page
+    is committed with the next page number as a cursor, so a backfill cut
+    short (deadline, upstream error, restart) resumes where it stopped.
+    Requests wait up to `history_backfill_wait` for it and then serve the
+    trades stored so far.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._sync_locks: Dict[str, asyncio.Lock] = {}
+        self._backfills: Dict[str, asyncio.Task] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sync_state)")}
+            if "backfill_page" not in columns:
+                # Databases from before resumable backfills were always fully synced
+                conn.execute("ALTER TABLE sync_state ADD COLUMN backfill_page INTEGER")
+            self._conn = conn
+        return self._conn
+
+    def open(self, path: str) -> None:
+        """Switch to another database file (closing the current one)."""
+        self.close()
+        self.path = path
+
+    def close(self) -> None:
+        for task in self._backfills.values():
+            task.cancel()
+        self._backfills.clear()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def _run(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        def _locked() -> T:
+            with self._db_lock:
+                return fn(self._connect())
+
+        return await asyncio.to_thread(_locked)
+
+    # --- sync ---
+
+    def _synced_at(self, conn: sqlite3.Connection, address: str) -> Optional[float]:
+        row = conn.execute("SELECT synced_at FROM sync_state WHERE address = ?", (address,)).fetchone()
+        return row[0] if row else None
+
+    def _state(self, conn: sqlite3.Connection, address: str) -> Optional[Tuple[float, Optional[int]]]:
+        """(synced_at, next backfill page or None once complete), or None if never stored."""
+        return conn.execute(
+            "SELECT synced_at, backfill_page FROM sync_state WHERE address = ?", (address,)
+        ).fetchone()
+
+    def _known_ids(self, conn: sqlite3.Connection, address: str, ids: List[str]) -> set:
+        placeholders = ",".join("?" * len(ids))
+        rows = conn.execute(
+            f"SELECT trade_id FROM trades WHERE address = ? AND trade_id IN ({placeholders})",
+            (address, *ids),
+        )
+        return {row[0] for row in rows}
+
+    def _insert(self, conn: sqlite3.Connection, address: str, trades: List[Dict[str, Any]]) -> None:
+        # `trades` is newest first; newer trades get larger sort keys
+        (max_key,) = conn.execute(
+            "SELECT COALESCE(MAX(sort_key), 0) FROM trades WHERE address = ?", (address,)
+        ).fetchone()
+        rows = [
+            (address, trade_id(t), max_key + len(trades) - i, trade_net_pnl(t), json.dumps(t, separators=(",", ":")))
+            for i, t in enumerate(trades)
+        ]
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO trades (address, trade_id, sort_key, net_pnl, payload) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute(
+                "INSERT INTO sync_state (address, synced_at) VALUES (?, ?) "
+                "ON CONFLICT (address) DO UPDATE SET synced_at = excluded.synced_at",
+                (address, time.time()),
+            )
+
+    def _insert_older(
+        self, conn: sqlite3.Connection, address: str, trades: List[Dict[str, Any]], next_page: Optional[int]
+    ) -> None:
+        # One backfill page (newest first), older than everything stored so far
+        (min_key,) = conn.execute(
+            "SELECT COALESCE(MIN(sort_key), 0) FROM trades WHERE address = ?", (address,)
+        ).fetchone()
+        rows = [
+            (address, trade_id(t), min_key - 1 - i, trade_net_pnl(t), json.dumps(t, separators=(",", ":")))
+            for i, t in enumerate(trades)
+        ]
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO trades (address, trade_id, sort_key, net_pnl, payload) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute(
+                "INSERT INTO sync_state (address, synced_at, backfill_page) VALUES (?, ?, ?) "
+                "ON CONFLICT (address) DO UPDATE SET backfill_page = excluded.backfill_page",
+                (address, time.time(), next_page),
+            )
+
+    async def _backfill(self, key: str, address: str, first_page: int) -> int:
+        """Store pages from `first_page` to the end of the history; returns how many trades."""
+        stored = 0
+        page_number = first_page
+        pages = iter_history_pages(
+            lambda n: get_breaker(HISTORY).call(lambda: fetch_history_page(address, n)),
+            window=settings.history_prefetch_window,
+            max_pages=max(settings.history_stream_max_pages - first_page + 1, 0),
+            first_page=first_page,
+        )
+        try:
+            async for trades in pages:
+                page_number += 1
+                await self._run(lambda conn: self._insert_older(conn, key, trades, page_number))
+                stored += len(trades)
+        finally:
+            await pages.aclose()
+        # Past the last page (or the page cap): the history is complete
+        await self._run(lambda conn: self._insert_older(conn, key, [], None))
+        logger.info("🗄️ Backfilled %s closed trades for %s (pages %s-%s)", stored, key, first_page, page_number - 1)
+        return stored
+
+    def _start_backfill(self, key: str, address: str, first_page: int) -> asyncio.Task:
+        task = self._backfills.get(key)
+        if task is None:
+            # Shared by every request for the address, so not bound to one deadline
+            task = asyncio.ensure_future(detached(self._backfill(key, address, first_page)))
+            self._backfills[key] = task
+            task.add_done_callback(lambda t: self._backfill_done(key, t))
+        return task
+
+    def _backfill_done(self, key: str, task: asyncio.Task) -> None:
+        if self._backfills.get(key) is task:
+            del self._backfills[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("⚠️ History backfill for %s stopped, will resume: %s", key, task.exception())
+
+    def backfilling(self, address: str) -> bool:
+        return normalize_address(address) in self._backfills
+
+    async def sync(self, address: str, force: bool = False) -> int:
+        """Fetch trades newer than the newest stored one; returns how many were added.
+
+        Also starts or resumes the address's backfill and waits for it up to
+        `history_backfill_wait` (and half the request's remaining deadline).
+        """
+        key = normalize_address(address)
+        lock = self._sync_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            state = await self._run(lambda conn: self._state(conn, key))
+            synced_at, backfill_page = state if state is not None else (None, 1)
+            if (
+                not force
+                and backfill_page is None
+                and synced_at is not None
+                and time.time() - synced_at < settings.history_sync_interval
+            ):
+                return 0
+
+            added = 0
+            # Before the first backfilled page is stored the backfill covers the newest trades
+            if state is not None and key not in self._backfills:
+                added = await self._sync_newest(key, address)
+            if backfill_page is None:
+                return added
+            task = self._start_backfill(key, address, backfill_page)
+
+        wait = settings.history_backfill_wait
+        left = remaining()
+        if left is not None:
+            wait = min(wait, max(left / 2, 0.0))
+        done, _ = await asyncio.wait({task}, timeout=wait)
+        if task in done:
+            added += task.result()
+        return added
+
+    async def _sync_newest(self, key: str, address: str) -> int:
+        new_trades: List[Dict[str, Any]] = []
+        page_number = 1
+        while page_number <= settings.history_stream_max_pages:
+            page = await get_breaker(HISTORY).call(
+                lambda: fetch_history_page(address, page_number)
+            )
+            if not page:
+                break
+            ids = [trade_id(t) for t in page]
+            known = await self._run(lambda conn: self._known_ids(conn, key, ids))
+            fresh = [t for t, tid in zip(page, ids) if tid not in known]
+            new_trades.extend(fresh)
+            if len(fresh) < len(page):
+                break
+            page_number += 1
+
+        await self._run(lambda conn: self._insert(conn, key, new_trades))
+        if new_trades:
+            logger.info("🗄️ Stored %s new closed trades for %s", len(new_trades), key)
+        return len(new_trades)
+
+    async def sync_or_stale(self, address: str) -> bool:
+        """Sync, but fall back to already stored trades if the upstream is failing.
+
+        Returns False when stale or still partially backfilled trades are
+        being served.
+        """
+        try:
+            await self.sync(address)
+            return not self.backfilling(address)
+        except Exception as e:
+            key = normalize_address(address)
+            if not is_upstream_failure(e) or await self._run(lambda conn: self._synced_at(conn, key)) is None:
+                raise
+            logger.warning("⚠️ History sync failed for %s, serving stored trades: %s", key, e)
+            return False
+
+    # --- queries ---
+
+    async def page(self, address: str, page_number: int, page_size: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """Return one page (1-based, newest first) and whether more pages exist.
+
+        While the address's backfill is unfinished older trades are still to
+        come, so more pages are reported even past the stored ones.
+        """
+        key = normalize_address(address)
+        offset = max(page_number - 1, 0) * page_size
+        backfilling = key in self._backfills
+
+        def _query(conn: sqlite3.Connection) -> Tuple[List[Dict[str, Any]], bool]:
+            rows = conn.execute(
+                "SELECT payload FROM trades WHERE address = ? ORDER BY sort_key DESC LIMIT ? OFFSET ?",
+                (key, page_size + 1, offset),
+            ).fetchall()
+            state = self._state(conn, key)
+            unfinished = state[1] is not None if state is not None else backfilling
+            return [json.loads(r[0]) for r in rows[:page_size]], len(rows) > page_size or unfinished
+
+        return await self._run(_query)
+
+    async def iter_pages(self, address: str, page_size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield every stored trade (newest first) in chunks of `page_size`.
+
+        Walks the sort key rather than offsets, so trades stored by a running
+        backfill are picked up: on reaching the oldest stored trade it waits
+        for the backfill and carries on; a failed backfill raises here.
+        """
+        key = normalize_address(address)
+        after: Optional[int] = None
+
+        def _query(conn: sqlite3.Connection) -> List[Tuple[int, str]]:
+            if after is None:
+                return conn.execute(
+                    "SELECT sort_key, payload FROM trades WHERE address = ? ORDER BY sort_key DESC LIMIT ?",
+                    (key, page_size),
+                ).fetchall()
+            return conn.execute(
+                "SELECT sort_key, payload FROM trades WHERE address = ? AND sort_key < ? "
+                "ORDER BY sort_key DESC LIMIT ?",
+                (key, after, page_size),
+            ).fetchall()
+
+        while True:
+            # Taken before the query so a backfill finishing in between is read again
+            task = self._backfills.get(key)
+            rows = await self._run(_query)
+            if rows:
+                after = rows[-1][0]
+                yield [json.loads(r[1]) for r in rows]
+                continue
+            if task is None:
+                return
+            # Shielded: the backfill is shared, a client disconnecting must not cancel it
+            await asyncio.shield(task)
+
+    async def top(self, address: str, limit: int) -> List[Dict[str, Any]]:
+        key = normalize_address(address)
+
+        def _query(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+            rows = conn.execute(
+                "SELECT payload FROM trades WHERE address = ? AND net_pnl IS NOT NULL "
+                "ORDER BY net_pnl DESC LIMIT ?",
+                (key, limit),
+            ).fetchall()
+            return [json.loads(r[0]) for r in rows]
+
+        return await self._run(_query)
+
+
+history_store = HistoryStore(settings.history_db_path)
@@ -0,0 +1,105 @@
+import importlib.util
+from typing import Dict, Tuple
+
+import httpx
+
+from . import deadline
+from .config import settings
+from .hedging import HedgingTransport
+from .metrics import InstrumentedTransport
+from .request_logging import REQUEST_ID_HEADER, get_request_id
+
+
+CORE = "core"
+HISTORY = "history"
+PRICE_FEED = "price_feed"
+RPC = "rpc"
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _upstream_config(name: str) -> Tuple[str, float]:
+    upstreams = {
+        CORE: (settings.core_api_url, settings.core_api_timeout),
+        HISTORY: (settings.history_api_url, settings.history_api_timeout),
+        PRICE_FEED: (settings.price_feed_url, settings.price_feed_timeout),
+        RPC: (settings.provider_url, settings.rpc_timeout),
+    }
+    try:
+        return upstreams[name]
+    except KeyError:
+        raise ValueError(f"Unknown upstream '{name}'") from None
+
+
+def _http2_available() -> bool:
+    # httpx only speaks HTTP/2 when the optional `h2` package is installed
+    return settings.http2_enabled and importlib.util.find_spec("h2") is not None
+
+
+async def _forward_request_id(request: httpx.Request) -> None:
+    request_id = get_request_id()
+    if request_id is not None:
+        request.headers[REQUEST_ID_HEADER] = request_id
+
+
+async def _apply_deadline(request: httpx.Request) -> None:
+    """Shorten the request's timeouts to what is left of the request deadline."""
+    left = deadline.remaining()
+    if left is None:
+        return
+    if left <= 0:
+        raise deadline.DeadlineExceeded()
+    timeouts = request.extensions.get("timeout", {})
+    request.extensions["timeout"] = {
+        phase: left if value is None else min(value, left) for phase, value in timeouts.items()
+    }
+
+
+def _build_client(name: str) -> httpx.AsyncClient:
+    base_url, timeout = _upstream_config(name)
+    transport = httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        ),
+        http2=_http2_available(),
+    )
+    # The RPC URL path is the provider API key; keep it out of /metrics
+    transport = InstrumentedTransport(name, transport, endpoint="jsonrpc" if name == RPC else None)
+    if settings.upstream_hedge_enabled and name != RPC:
+        # JSON-RPC reads are hedged across endpoints by rpc_pool instead
+        transport = HedgingTransport(
+            name, transport, settings.upstream_hedge_min_delay, settings.upstream_hedge_max_delay
+        )
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=httpx.Timeout(timeout),
+        transport=transport,
+        event_hooks={"request": [_forward_request_id, _apply_deadline]},
+    )
+
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    """Return the shared pooled client for an upstream host.
+
+    Clients are normally opened by the app lifespan; this falls back to
+    creating one on first use so handlers also work without it (e.g. tests).
+    """
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _build_client(name)
+        _clients[name] = client
+    return client
+
+
+async def open_http_clients() -> None:
+    for name in (CORE, HISTORY, PRICE_FEED, RPC):
+        get_http_client(name)
+
+
+async def close_http_clients() -> None:
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
@@ -1,14 +1,50 @@
 import asyncio
 import logging
-from typing import Any, Dict, Optional, Set
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Dict, List, Optional
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 import httpx
 
+from .circuit_breaker import CircuitOpenError
 from .config import settings
+from .deadline import DeadlineMiddleware, timeout as deadline_timeout, within_deadline
 from .avantis_client import get_trader_client
+from .candles import RESOLUTIONS, candle_store
+from .http_clients import (
+    HISTORY,
+    close_http_clients,
+    get_http_client,
+    open_http_clients,
+)
+from .metrics import MetricsMiddleware, record_cache, render as render_metrics, sdk_call
+from .passthrough import RawPayload, fetch_raw, passthrough_response
+from .price_snapshot import price_snapshot
+from .tick_store import tick_store
+from .request_logging import RequestContextMiddleware, setup_logging
+from .history_store import history_store
+from .pair_metadata import pair_metadata
+from .pair_search import pair_search
+from .pairs_payload import conditional_response, pairs_payload
+from .swr_cache import CachedResult, history_api_cache
+from .pnl import (
+    compute_pnl,
+    owner_totals,
+    pnl_rows,
+    pnl_totals,
+    positions_to_arrays,
+    prices_for,
+    stack_positions,
+)
+from .portfolio_history import stream_history_ndjson
+from .price_stream import parse_pair_indices, price_broadcaster, stream_prices
+from .tx_batch import TxBuildContext, run_batch
+from .user_data import user_data_cache
+from .warmup import warmup
 from .models import (
     OpenTradeRequest,
     CloseTradeRequest,
@@ -18,16 +54,45 @@ from .models import (
     PendingLimitOrderExtended,
     CancelOrderRequest,
     UpdateTpSlRequest,
+    BatchTxRequest,
+    BatchTxResponse,
+    PnlBatchRequest,
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging: records are queued and written by a background thread
+setup_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Lattice Trade Builder API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await open_http_clients()
+    try:
+        pair_metadata.load_snapshot(settings.pairs_snapshot_path)
+    except Exception as e:
+        logger.warning("⚠️ Ignoring unreadable pairs snapshot: %s", e)
+    if settings.tick_store_enabled and settings.candle_backfill_on_startup:
+        # Before the price snapshot starts, so live ticks are held until it is done
+        candle_store.start_backfill(tick_store, time.time())
+    price_snapshot.start()
+    if settings.warmup_on_startup:
+        warmup.start()
+    try:
+        yield
+    finally:
+        await warmup.stop()
+        await price_snapshot.stop()
+        await candle_store.stop()
+        await close_http_clients()
+        history_store.close()
+        tick_store.close()
+
+
+app = FastAPI(title="Lattice Trade Builder API", lifespan=lifespan)
+
+# Per-request time budgets (innermost, so a 504 still gets CORS headers,
+# a request ID and metrics)
+app.add_middleware(DeadlineMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -37,17 +102,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Request logging middleware
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logger.info(f"📨 {request.method} {request.url.path}")
-    try:
-        response = await call_next(request)
-        logger.info(f"✅ {request.method} {request.url.path} - Status: {response.status_code}")
-        return response
-    except Exception as e:
-        logger.error(f"❌ {request.method} {request.url.path} - Error: {e}", exc_info=True)
-        raise
+# Request IDs, per-route log sampling and the access log line
+app.add_middleware(RequestContextMiddleware)
+# Per-route latency histograms and the in-flight gauge (outermost, so the
+# time spent in the middlewares above is included)
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/health")
@@ -55,6 +114,35 @@ async def health() -> Dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def ready(response: Response) -> Dict[str, Any]:
+    """
+    Readiness: 200 once the startup warm-up has finished (or is disabled),
+    503 while it is running or after it failed. Includes per-phase timings.
+    """
+    if not settings.warmup_on_startup:
+        return {"status": "ready", "phases_ms": {}}
+    status = warmup.status()
+    if not warmup.ready:
+        response.status_code = 503
+    return status
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    """Prometheus text exposition of the in-process metrics."""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _set_cache_headers(response: Optional[Response], status: str, age: Optional[float] = None) -> None:
+    """Report how a cached read was served (HIT, MISS or STALE) and its age."""
+    if response is None:
+        return
+    response.headers["X-Cache"] = status
+    if age is not None:
+        response.headers["Age"] = str(int(age))
+
+
 def _normalize_tx(tx: Any) -> BuildTxResponse:
     """Best-effort normalization of SDK tx into fields usable by wallets.
 
@@ -86,67 +174,77 @@ def _normalize_tx(tx: Any) -> BuildTxResponse:
 
 
 @app.get("/pairs")
-async def get_pairs(pidx: int = None) -> Any:
-    logger.info(f"📥 Fetching pairs{f' (pidx={pidx})' if pidx is not None else ''}")
-    trader_client = get_trader_client()
-    result = await trader_client.pairs_cache.get_pairs_info()
+async def get_pairs(request: Request, pidx: int = None) -> Any:
+    """
+    All pairs info, or one pair with `pidx`. Bodies are pre-encoded once per
+    pairs-info version and carry a strong ETag; `If-None-Match` gets a 304.
+    """
+    logger.info("📥 Fetching pairs (pidx=%s)", pidx)
+    result = await within_deadline(pair_metadata.pairs_info())
+    pairs_payload.sync(result, pair_metadata.version)
     
     if pidx is not None:
-        # Defensive: keys might be int or str; allow both, else raise 404
-        str_pidx = str(pidx)
-        if str_pidx in result:
-            logger.info(f"✅ Found pair with index {pidx}")
-            return result[str_pidx]
-        elif pidx in result:
-            logger.info(f"✅ Found pair with index {pidx}")
-            return result[pidx]
-        else:
-            logger.error(f"❌ Pair index '{pidx}' not found")
+        encoded = pairs_payload.by_pair.get(pidx)
+        if encoded is None:
+            logger.error("❌ Pair index '%s' not found", pidx)
             raise HTTPException(status_code=404, detail=f"Pair index '{pidx}' not found.")
-    logger.info(f"✅ Returning all pairs: {len(result)} pairs")
-    return result
+        logger.info("✅ Found pair with index %s", pidx)
+        return conditional_response(request, {"identity": encoded})
+    logger.info("✅ Returning all pairs: %s pairs", len(result))
+    return conditional_response(request, pairs_payload.variants)
+
+
+@app.get("/pairs/search")
+async def search_pairs(q: str, limit: int = 10):
+    """
+    Pairs matching `q` by base/quote symbol or alias ("ETH", "eth-usd",
+    "ETHUSD"): exact, then prefix, substring and fuzzy matches.
+    """
+    await within_deadline(pair_metadata.pairs_info())
+    hits = pair_search.search(q, min(max(limit, 1), settings.pair_search_max_results))
+    logger.info("🔎 Pair search %r: %s results", q, len(hits))
+    return {"query": q, "results": [hit.to_dict() for hit in hits]}
 
 
 @app.get("/trades")
-async def get_trades(trader_address: str):
-    logger.info(f"📥 Fetching trades for trader: {trader_address}")
+async def get_trades(trader_address: str, request: Request):
+    logger.info("📥 Fetching trades for trader: %s", trader_address)
     try:
-        api_url = f"https://core.avantisfi.com/user-data?trader={trader_address}"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_url)
-            response.raise_for_status()
-            data = response.json()
-        logger.info(f"✅ Successfully fetched trades: {len(data.get('positions', []))} positions, {len(data.get('limitOrders', []))} limit orders")
-        return data
+        user_data, cache_status = await within_deadline(user_data_cache.lookup(trader_address, allow_stale=True))
+        data = user_data.data
+        logger.info("✅ Successfully fetched trades: %s positions, %s limit orders", len(data.get('positions', [])), len(data.get('limitOrders', [])))
+        # Send the upstream body on unchanged instead of re-encoding `data`
+        response = passthrough_response(user_data.raw, request) if user_data.raw is not None else JSONResponse(data)
+        _set_cache_headers(response, cache_status, user_data.age)
+        return response
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        logger.error("❌ Trades unavailable: %s", e)
+        raise HTTPException(status_code=503, detail=str(e)) from e
     except httpx.HTTPError as e:
-        logger.error(f"❌ HTTP error fetching trades: {e}", exc_info=True)
+        logger.error("❌ HTTP error fetching trades: %s", e, exc_info=True)
         raise HTTPException(status_code=400, detail=f"Failed to fetch trades from API: {e}") from e
     except Exception as e:
-        logger.error(f"❌ Failed to get trades: {e}", exc_info=True)
+        logger.error("❌ Failed to get trades: %s", e, exc_info=True)
         raise HTTPException(status_code=400, detail=f"Failed to get trades: {e}") from e
 
 
 @app.post("/trades/open", response_model=BuildTxResponse)
 async def build_open_trade_tx(req: OpenTradeRequest) -> BuildTxResponse:
-    import logging
-    logger = logging.getLogger(__name__)
-    
-    trader_client = get_trader_client()
+    return await _build_open_trade_tx(req, TxBuildContext(get_trader_client()))
+
+
+async def _build_open_trade_tx(req: OpenTradeRequest, ctx: TxBuildContext) -> BuildTxResponse:
+    trader_client = ctx.trader_client
     
     # Log incoming request
-    logger.info(f"📥 Received open trade request: trader={req.trader_address}, pair={req.pair}, pair_index={req.pair_index}, collateral={req.collateral_in_trade}, leverage={req.leverage}, is_long={req.is_long}, tp={req.tp}, sl={req.sl}, order_type={req.order_type}")
+    logger.info("📥 Received open trade request: trader=%s, pair=%s, pair_index=%s, collateral=%s, leverage=%s, is_long=%s, tp=%s, sl=%s, order_type=%s", req.trader_address, req.pair, req.pair_index, req.collateral_in_trade, req.leverage, req.is_long, req.tp, req.sl, req.order_type)
 
     try:
         # Resolve pair index
-        if req.pair_index is not None:
-            pair_index = req.pair_index
-            logger.info(f"✅ Using provided pair_index: {pair_index}")
-        elif req.pair:
-            pair_index = await trader_client.pairs_cache.get_pair_index(req.pair)
-            logger.info(f"✅ Resolved pair '{req.pair}' to pair_index: {pair_index}")
-        else:
-            logger.error("❌ Neither pair nor pair_index provided")
-            raise HTTPException(status_code=400, detail="Provide either pair or pair_index")
+        pair_index = await within_deadline(ctx.resolve_pair_index(req.pair, req.pair_index))
+        logger.info("✅ Using pair_index: %s", pair_index)
 
         # Import types lazily
         from avantis_trader_sdk.types import TradeInput, TradeInputOrderType
@@ -164,42 +262,41 @@ async def build_open_trade_tx(req: OpenTradeRequest) -> BuildTxResponse:
             timestamp=0,
         )
         
-        logger.info(f"🔧 Created TradeInput: {trade_input}")
+        logger.debug("🔧 Created TradeInput: %s", trade_input)
 
         order_type = getattr(TradeInputOrderType, req.order_type)
-        logger.info(f"📊 Order type: {order_type}")
+        logger.debug("📊 Order type: %s", order_type)
 
-        open_tx = await trader_client.trade.build_trade_open_tx(
-            trade_input, order_type, req.slippage_percentage
-        )
+        with sdk_call("build_trade_open_tx"):
+            open_tx = await within_deadline(
+                trader_client.trade.build_trade_open_tx(trade_input, order_type, req.slippage_percentage)
+            )
         
-        logger.info(f"✅ Successfully built trade open tx: to={getattr(open_tx, 'to', None)}")
+        logger.info("✅ Successfully built trade open tx: to=%s", getattr(open_tx, 'to', None))
 
         return _normalize_tx(open_tx)
     except HTTPException:
         raise
     except Exception as e:
         # Provide readable error for frontend
-        logger.error(f"❌ Failed to build open trade tx: {e}", exc_info=True)
+        logger.error("❌ Failed to build open trade tx: %s", e, exc_info=True)
         raise HTTPException(status_code=400, detail=f"Failed to build open trade tx: {e}") from e
 
 
 @app.post("/trades/close", response_model=BuildTxResponse)
 async def build_close_trade_tx(req: CloseTradeRequest) -> BuildTxResponse:
-    import logging
-    logger = logging.getLogger(__name__)
-    
-    trader_client = get_trader_client()
+    close_tx = await _build_close_trade_tx(req, TxBuildContext(get_trader_client()))
+    user_data_cache.invalidate(req.trader_address)
+    return close_tx
+
+
+async def _build_close_trade_tx(req: CloseTradeRequest, ctx: TxBuildContext) -> BuildTxResponse:
+    trader_client = ctx.trader_client
     
-    logger.info(f"📥 Received close trade request: trader={req.trader_address}, pair={req.pair}, pair_index={req.pair_index}, index={req.index}, close_percent={req.close_percent}, collateral_to_close={req.collateral_to_close}")
+    logger.info("📥 Received close trade request: trader=%s, pair=%s, pair_index=%s, index=%s, close_percent=%s, collateral_to_close=%s", req.trader_address, req.pair, req.pair_index, req.index, req.close_percent, req.collateral_to_close)
 
     try:
-        if req.pair_index is not None:
-            pair_index = req.pair_index
-        elif req.pair:
-            pair_index = await trader_client.pairs_cache.get_pair_index(req.pair)
-        else:
-            raise HTTPException(status_code=400, detail="Provide either pair or pair_index")
+        pair_index = await within_deadline(ctx.resolve_pair_index(req.pair, req.pair_index))
 
         # Many SDKs expose a builder for close trade transactions.
         # Referenced in docs: https://sdk.avantisfi.com/trade.html (Closing a Trade)
@@ -218,23 +315,12 @@ async def build_close_trade_tx(req: CloseTradeRequest) -> BuildTxResponse:
             # Percent is 0-100; default 100 if missing
             percent = req.close_percent or 100.0
             try:
-                # Fetch data from the Avantis REST API
-                api_url = f"https://core.avantisfi.com/user-data?trader={req.trader_address}"
-                
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(api_url)
-                    response.raise_for_status()
-                    data = response.json()
-                
-                positions = data.get("positions", [])
-                
+                # Fetch (cached) data from the Avantis REST API
+                user_data = await within_deadline(user_data_cache.get(req.trader_address))
+
                 # Find the specific trade by pair and index
-                target = None
-                for pos in positions:
-                    if pos.get("pairIndex") == pair_index and pos.get("index") == trade_index:
-                        target = pos
-                        break
-                
+                target = user_data.position(pair_index, trade_index)
+
                 if target is None:
                     raise HTTPException(status_code=404, detail="Trade not found to compute collateral_to_close")
                 
@@ -248,292 +334,369 @@ async def build_close_trade_tx(req: CloseTradeRequest) -> BuildTxResponse:
             except Exception as e:
                 raise HTTPException(status_code=400, detail=f"Failed to compute collateral_to_close: {e}") from e
 
-        logger.info(f"🔧 Calling build_trade_close_tx with pair_index={pair_index}, trade_index={trade_index}, collateral_to_close={collateral_to_close}")
+        logger.info("🔧 Calling build_trade_close_tx with pair_index=%s, trade_index=%s, collateral_to_close=%s", pair_index, trade_index, collateral_to_close)
         
-        close_tx = await build_close(
-            pair_index=pair_index,
-            trade_index=trade_index,
-            collateral_to_close=collateral_to_close,
-            trader=req.trader_address,
-        )
+        with sdk_call("build_trade_close_tx"):
+            close_tx = await within_deadline(build_close(
+                pair_index=pair_index,
+                trade_index=trade_index,
+                collateral_to_close=collateral_to_close,
+                trader=req.trader_address,
+            ))
         
-        logger.info(f"✅ Successfully built trade close tx")
+        logger.info("✅ Successfully built trade close tx")
 
         return _normalize_tx(close_tx)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Failed to build close trade tx: {e}", exc_info=True)
+        logger.error("❌ Failed to build close trade tx: %s", e, exc_info=True)
         raise HTTPException(status_code=400, detail=f"Failed to build close trade tx: {e}") from e
 
 
 @app.post("/orders/cancel", response_model=BuildTxResponse)
 async def build_order_cancel_tx(req: CancelOrderRequest) -> BuildTxResponse:
-    import logging
-    logger = logging.getLogger(__name__)
-    
-    trader_client = get_trader_client()
+    cancel_tx = await _build_order_cancel_tx(req, TxBuildContext(get_trader_client()))
+    user_data_cache.invalidate(req.trader_address)
+    return cancel_tx
+
+
+async def _build_order_cancel_tx(req: CancelOrderRequest, ctx: TxBuildContext) -> BuildTxResponse:
+    trader_client = ctx.trader_client
     
-    logger.info(f"📥 Received cancel order request: trader={req.trader_address}, pair_index={req.pair_index}, trade_index={req.trade_index}")
+    logger.info("📥 Received cancel order request: trader=%s, pair_index=%s, trade_index=%s", req.trader_address, req.pair_index, req.trade_index)
 
     try:
         # Some SDK versions accept trader as optional. Pass it for compatibility.
-        cancel_tx = await trader_client.trade.build_order_cancel_tx(
-            pair_index=req.pair_index,
-            trade_index=req.trade_index,
-            trader=req.trader_address,
-        )
+        with sdk_call("build_order_cancel_tx"):
+            cancel_tx = await within_deadline(trader_client.trade.build_order_cancel_tx(
+                pair_index=req.pair_index,
+                trade_index=req.trade_index,
+                trader=req.trader_address,
+            ))
         
-        logger.info(f"✅ Successfully built cancel order tx")
+        logger.info("✅ Successfully built cancel order tx")
 
         return _normalize_tx(cancel_tx)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"❌ Failed to build cancel order tx: {e}", exc_info=True)
+        logger.error("❌ Failed to build cancel order tx: %s", e, exc_info=True)
         raise HTTPException(status_code=400, detail=f"Failed to build cancel order tx: {e}") from e
 
 
 @app.post("/trades/tp-sl", response_model=BuildTxResponse)
 async def build_trade_tp_sl_update_tx(req: UpdateTpSlRequest) -> BuildTxResponse:
-    import logging
-    logger = logging.getLogger(__name__)
-    
-    trader_client = get_trader_client()
+    return await _build_trade_tp_sl_update_tx(req, TxBuildContext(get_trader_client()))
+
+
+async def _build_trade_tp_sl_update_tx(req: UpdateTpSlRequest, ctx: TxBuildContext) -> BuildTxResponse:
+    trader_client = ctx.trader_client
     
-    logger.info(f"📥 Received TP/SL update request: trader={req.trader_address}, pair_index={req.pair_index}, trade_index={req.trade_index}, tp={req.tp}, sl={req.sl}")
+    logger.info("📥 Received TP/SL update request: trader=%s, pair_index=%s, trade_index=%s, tp=%s, sl=%s", req.trader_address, req.pair_index, req.trade_index, req.tp, req.sl)
 
     try:
-        update_tx = await trader_client.trade.build_trade_tp_sl_update_tx(
-            pair_index=req.pair_index,
-            trade_index=req.trade_index,
-            take_profit_price=req.tp / 1e10 or 0,
-            stop_loss_price=req.sl / 1e10 or 0,
-            trader=req.trader_address,
-        )
+        with sdk_call("build_trade_tp_sl_update_tx"):
+            update_tx = await within_deadline(trader_client.trade.build_trade_tp_sl_update_tx(
+                pair_index=req.pair_index,
+                trade_index=req.trade_index,
+                take_profit_price=req.tp / 1e10 or 0,
+                stop_loss_price=req.sl / 1e10 or 0,
+                trader=req.trader_address,
+            ))
         
-        logger.info(f"✅ Successfully built TP/SL update tx")
+        logger.info("✅ Successfully built TP/SL update tx")
 
         return _normalize_tx(update_tx)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"❌ Failed to build TP/SL update tx: {e}", exc_info=True)
+        logger.error("❌ Failed to build TP/SL update tx: %s", e, exc_info=True)
         raise HTTPException(status_code=400, detail=f"Failed to build TP/SL update tx: {e}") from e
 
 
+_BATCH_BUILDERS = {
+    "open": _build_open_trade_tx,
+    "close": _build_close_trade_tx,
+    "cancel": _build_order_cancel_tx,
+    "tp_sl": _build_trade_tp_sl_update_tx,
+}
+
+
+@app.post("/tx/batch", response_model=BatchTxResponse)
+async def build_tx_batch(req: BatchTxRequest) -> BatchTxResponse:
+    """
+    Build a mixed list of open/close/cancel/TP-SL txs concurrently.
+    Results (tx or error) are returned in input order; pair-name resolution
+    and trader user-data lookups are shared across the batch.
+    """
+    if len(req.items) > settings.tx_batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch exceeds the maximum of {settings.tx_batch_max_items} items",
+        )
+    logger.info("📥 Received tx batch with %s items", len(req.items))
+
+    ctx = TxBuildContext(get_trader_client())
+    results = await run_batch(
+        req.items,
+        lambda item: _BATCH_BUILDERS[item.type](item.params, ctx),
+        concurrency=settings.tx_batch_concurrency,
+    )
+
+    # Invalidate once the whole batch is built so its items share one lookup
+    for item, result in zip(req.items, results):
+        if result.ok and item.type in ("close", "cancel"):
+            user_data_cache.invalidate(item.params.trader_address)
+
+    logger.info("✅ Built tx batch: %s/%s succeeded", sum(r.ok for r in results), len(results))
+    return BatchTxResponse(results=results)
+
+
+def _set_snapshot_age_header(response: Response) -> None:
+    age = price_snapshot.age
+    if age is not None:
+        response.headers["X-Price-Snapshot-Age"] = f"{age:.3f}"
+        status = "STALE" if price_snapshot.is_stale() else "HIT"
+        record_cache("price_snapshot", status)
+        _set_cache_headers(response, status, age)
+
+
 @app.get("/api/price-feeds/last-price")
-async def get_last_prices():
+async def get_last_prices(request: Request):
     """
-    Proxy endpoint to fetch latest prices from Avantis feed API.
-    Returns array of price data for all pairs.
+    Latest prices for all pairs, served from the in-memory price snapshot.
+    Returns array of price data for all pairs (the feed body as received);
+    the snapshot age in seconds is reported in the X-Price-Snapshot-Age header.
     """
-    logger.info("📊 Fetching latest prices from Avantis feed")
+    logger.info("📊 Fetching latest prices from price snapshot")
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                "https://feed-v3.avantisfi.com/v1/price-feeds/last-price",
-                timeout=10.0
-            )
-            response.raise_for_status()
-            prices = response.json()
-            
-            logger.info(f"✅ Successfully fetched prices for {len(prices)} pairs")
-            return prices
+        snapshot = await within_deadline(price_snapshot.get())
+        prices, raw = snapshot.prices, snapshot.raw
+        response = passthrough_response(raw, request) if raw is not None else JSONResponse(prices)
+        _set_snapshot_age_header(response)
+
+        logger.info("✅ Successfully fetched prices for %s pairs", len(prices))
+        return response
             
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        logger.error("❌ Price feed unavailable: %s", e)
+        raise HTTPException(status_code=503, detail=str(e)) from e
     except httpx.HTTPError as e:
-        logger.error(f"❌ Failed to fetch prices from Avantis feed: {e}", exc_info=True)
+        logger.error("❌ Failed to fetch prices from Avantis feed: %s", e, exc_info=True)
         raise HTTPException(status_code=502, detail=f"Failed to fetch prices: {e}") from e
     except Exception as e:
-        logger.error(f"❌ Unexpected error fetching prices: {e}", exc_info=True)
+        logger.error("❌ Unexpected error fetching prices: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}") from e
 
 
 @app.get("/api/price-feeds/last-price/{pair_index}")
-async def get_last_price_by_pair(pair_index: int):
+async def get_last_price_by_pair(pair_index: int, response: Response):
     """
-    Proxy endpoint to fetch latest price for a specific pair from Avantis feed API.
+    Latest price for a specific pair, served from the in-memory price snapshot.
     Returns price data for the requested pair index.
     """
-    logger.info(f"📊 Fetching latest price for pair {pair_index} from Avantis feed")
+    logger.info("📊 Fetching latest price for pair %s from price snapshot", pair_index)
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                "https://feed-v3.avantisfi.com/v1/price-feeds/last-price",
-                timeout=10.0
-            )
-            response.raise_for_status()
-            prices = response.json()
-            
-            # Find the price for the requested pair
-            pair_price = next((p for p in prices if p.get("pairIndex") == pair_index), None)
-            
-            if pair_price is None:
-                logger.warning(f"⚠️ Price not found for pair {pair_index}")
-                raise HTTPException(status_code=404, detail=f"Price not found for pair {pair_index}")
-            
-            logger.info(f"✅ Successfully fetched price for pair {pair_index}: ${pair_price.get('c')}")
-            return pair_price
+        snapshot = await within_deadline(price_snapshot.get())
+        pair_price = snapshot.by_pair.get(pair_index)
+        _set_snapshot_age_header(response)
+
+        if pair_price is None:
+            logger.warning("⚠️ Price not found for pair %s", pair_index)
+            raise HTTPException(status_code=404, detail=f"Price not found for pair {pair_index}")
+
+        logger.info("✅ Successfully fetched price for pair %s: $%s", pair_index, pair_price.get('c'))
+        return pair_price
             
     except HTTPException:
         raise
+    except CircuitOpenError as e:
+        logger.error("❌ Price feed unavailable: %s", e)
+        raise HTTPException(status_code=503, detail=str(e)) from e
     except httpx.HTTPError as e:
-        logger.error(f"❌ Failed to fetch price from Avantis feed: {e}", exc_info=True)
+        logger.error("❌ Failed to fetch price from Avantis feed: %s", e, exc_info=True)
         raise HTTPException(status_code=502, detail=f"Failed to fetch price: {e}") from e
     except Exception as e:
-        logger.error(f"❌ Unexpected error fetching price: {e}", exc_info=True)
+        logger.error("❌ Unexpected error fetching price: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}") from e
 
 
+@app.get("/api/price-feeds/stream")
+async def stream_last_prices(pairs: Optional[str] = None):
+    """
+    Server-sent events stream of price updates fanned out from the shared
+    price snapshot. `pairs` is an optional comma-separated list of pair
+    indices; updates are coalesced so slow clients only get the latest
+    price per pair.
+    """
+    try:
+        pair_indices = parse_pair_indices(pairs)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="pairs must be a comma-separated list of pair indices")
+
+    try:
+        await within_deadline(price_snapshot.get())
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("❌ Failed to load price snapshot for stream: %s", e, exc_info=True)
+        raise HTTPException(status_code=502, detail=f"Failed to fetch prices: {e}") from e
+
+    subscription = price_broadcaster.subscribe(pair_indices)
+    logger.info("📡 Price stream opened (%s subscribers)", price_broadcaster.subscriber_count)
+    return StreamingResponse(
+        stream_prices(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# --- Candles Route ---
+@app.get("/api/candles/{pair_index}")
+async def get_candles(
+    pair_index: int,
+    resolution: str = "1m",
+    from_: Optional[int] = Query(None, alias="from"),
+    to: Optional[int] = None,
+):
+    """
+    OHLC candles for a pair built in memory from the price feed, in the
+    TradingView UDF history shape (`s`, `t`, `o`, `h`, `l`, `c`, `v`; `v` is
+    the number of feed ticks). `from`/`to` are unix seconds bounding the
+    candle open times.
+    """
+    if resolution not in candle_store.rings:
+        raise HTTPException(
+            status_code=400,
+            detail=f"resolution must be one of {', '.join(r for r in RESOLUTIONS if r in candle_store.rings)}",
+        )
+    candles = candle_store.candles(pair_index, resolution, from_, to)
+    if not candles or not candles["t"]:
+        return {"s": "no_data"}
+    logger.info("🕯️ Serving %s %s candles for pair %s", len(candles["t"]), resolution, pair_index)
+    return {"s": "ok", **candles}
 
-# --- Top Trades Proxy Route ---
+
+# --- Top Trades Route ---
 @app.get("/api/portfolio/top-trades/{address}")
-async def get_top_trades(address: str):
+async def get_top_trades(address: str, response: Response = None):
     """
-    Proxy endpoint to fetch top trades for a user from Avantis API.
+    Top trades (by net PnL) for a user, served from the local closed-trade
+    store after an incremental sync with the Avantis API.
     Enriches each trade with 'from' and 'to' info from pair metadata.
     """
-    logger.info(f"🏆 Fetching top trades for address: {address}")
+    logger.info("🏆 Fetching top trades for address: %s", address)
 
     try:
-        # Step 1: Fetch top trades from Avantis API
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                f"https://api.avantisfi.com/v2/history/portfolio/top/{address}",
-                timeout=10.0,
-            )
-            resp.raise_for_status()
-            data = resp.json()
-
-        portfolio = data.get("portfolio", []) or []
-        logger.info(f"✅ Got {len(portfolio)} top trades for {address}")
+        # Step 1: Sync new closed trades, then rank locally
+        fresh = await within_deadline(history_store.sync_or_stale(address))
+        _set_cache_headers(response, "HIT" if fresh else "STALE")
+        portfolio = await history_store.top(address, settings.history_top_trades_limit)
+        logger.info("✅ Got %s top trades for %s", len(portfolio), address)
 
-        # Step 2: Extract all unique pair indices
-        unique_pair_indices: Set[int] = set()
-        for t in portfolio:
-            try:
-                pidx = t.get("event", {}).get("args", {}).get("t", {}).get("pairIndex")
-                if pidx is not None:
-                    unique_pair_indices.add(int(pidx))
-            except Exception:
-                continue
-
-        logger.info(f"📊 Found {len(unique_pair_indices)} unique pair indices: {unique_pair_indices}")
-
-        # Step 3: Fetch all pairs once, then filter for only the ones we need
-        all_pairs = await get_pairs()  # returns dict[str|int, PairInfoWithData]
-        pair_map: Dict[str, Any] = {}
-        for idx in unique_pair_indices:
-            key = str(idx)
-            pair_info = all_pairs.get(key) or all_pairs.get(idx)
-            if pair_info:
-                pair_map[key] = pair_info
-
-        # Step 4: Enrich each trade with its pair's from/to
-        enriched_portfolio = []
-        for trade in portfolio:
-            pidx = trade.get("event", {}).get("args", {}).get("t", {}).get("pairIndex")
-            if pidx is not None:
-                key = str(int(pidx))
-                info = pair_map.get(key)
-                if info:
-                    # Convert PairInfoWithData (Pydantic model) safely to dict
-                    info_dict = (
-                        info.model_dump() if hasattr(info, "model_dump")
-                        else info.dict() if hasattr(info, "dict")
-                        else dict(info)
-                    )
-                trade["pairInfo"] = {
-        "from": info_dict.get("from") or info_dict.get("from_"),
-        "to": info_dict.get("to") or info_dict.get("to_"),
-    }
-
-            enriched_portfolio.append(trade)
+        # Step 2: Enrich each trade with its pair's from/to
+        index = await within_deadline(pair_metadata.refresh())
+        enriched_portfolio = index.enrich_trades(portfolio)
 
-        logger.info(f"✅ Enriched {len(enriched_portfolio)} trades with pair info")
+        logger.info("✅ Enriched %s trades with pair info", len(enriched_portfolio))
 
         return enriched_portfolio
 
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        logger.error("❌ Avantis API unavailable: %s", e)
+        raise HTTPException(status_code=503, detail=str(e)) from e
     except httpx.HTTPStatusError as e:
-        logger.error(f"❌ Avantis API error: {e}")
+        logger.error("❌ Avantis API error: %s", e)
         raise HTTPException(status_code=e.response.status_code, detail=str(e))
     except Exception as e:
         logger.exception("💥 Unexpected error while fetching top trades")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
-# --- Portfolio History Proxy Route ---
+# --- Portfolio History Routes ---
+@app.get("/api/portfolio/history/{address}/stream")
+async def stream_portfolio_history(address: str):
+    """
+    Stream a user's full portfolio history as NDJSON (one enriched trade per
+    line), served from the local closed-trade store after an incremental sync.
+    Trades still being backfilled are streamed as they are stored.
+    """
+    logger.info("📜 Streaming portfolio history for address: %s", address)
+
+    pages = history_store.iter_pages(address, settings.history_page_size)
+    try:
+        # Sync and load the first page up front so upstream errors map to a status code
+        fresh = await within_deadline(history_store.sync_or_stale(address))
+        index = await within_deadline(pair_metadata.refresh())
+        first = await within_deadline(pages.__anext__())
+    except StopAsyncIteration:
+        first = []
+    except HTTPException:
+        await pages.aclose()
+        raise
+    except CircuitOpenError as e:
+        await pages.aclose()
+        logger.error("❌ Avantis API unavailable: %s", e)
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    except httpx.HTTPStatusError as e:
+        await pages.aclose()
+        logger.error("❌ Avantis API error: %s", e)
+        raise HTTPException(status_code=e.response.status_code, detail=str(e))
+    except Exception as e:
+        await pages.aclose()
+        logger.exception("💥 Unexpected error while streaming portfolio history")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    response = StreamingResponse(
+        stream_history_ndjson(first, pages, index.enrich_trades),
+        media_type="application/x-ndjson",
+    )
+    _set_cache_headers(response, "HIT" if fresh else "STALE")
+    return response
+
+
 @app.get("/api/portfolio/history/{address}/{page_number}")
-async def get_portfolio_history(address: str, page_number: int):
+async def get_portfolio_history(address: str, page_number: int, response: Response = None):
     """
-    Proxy endpoint to fetch portfolio history for a user from Avantis API with pagination.
+    Paginated portfolio history for a user, served from the local closed-trade
+    store after an incremental sync with the Avantis API.
     Enriches each trade with 'from' and 'to' info from pair metadata.
     """
-    logger.info(f"📜 Fetching portfolio history for address: {address}, page: {page_number}")
+    logger.info("📜 Fetching portfolio history for address: %s, page: %s", address, page_number)
 
     try:
-        # Step 1: Fetch portfolio history from Avantis API
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                f"https://api.avantisfi.com/v2/history/portfolio/history/{address}/{page_number}",
-                timeout=10.0,
-            )
-            resp.raise_for_status()
-            data = resp.json()
+        # Step 1: Sync new closed trades, then page locally
+        fresh = await within_deadline(history_store.sync_or_stale(address))
+        _set_cache_headers(response, "HIT" if fresh else "STALE")
+        portfolio, has_more = await history_store.page(address, page_number, settings.history_page_size)
+        logger.info("✅ Got %s trades for %s on page %s", len(portfolio), address, page_number)
 
-        portfolio = data.get("portfolio", []) or []
-        logger.info(f"✅ Got {len(portfolio)} trades for {address} on page {page_number}")
+        # Step 2: Enrich each trade with its pair's from/to
+        index = await within_deadline(pair_metadata.refresh())
+        enriched_portfolio = index.enrich_trades(portfolio)
 
-        # Step 2: Extract all unique pair indices
-        unique_pair_indices: Set[int] = set()
-        for t in portfolio:
-            try:
-                pidx = t.get("event", {}).get("args", {}).get("t", {}).get("pairIndex")
-                if pidx is not None:
-                    unique_pair_indices.add(int(pidx))
-            except Exception:
-                continue
-
-        logger.info(f"📊 Found {len(unique_pair_indices)} unique pair indices: {unique_pair_indices}")
-
-        # Step 3: Fetch all pairs once, then filter for only the ones we need
-        all_pairs = await get_pairs()  # returns dict[str|int, PairInfoWithData]
-        pair_map: Dict[str, Any] = {}
-        for idx in unique_pair_indices:
-            key = str(idx)
-            pair_info = all_pairs.get(key) or all_pairs.get(idx)
-            if pair_info:
-                pair_map[key] = pair_info
-
-        # Step 4: Enrich each trade with its pair's from/to
-        enriched_portfolio = []
-        for trade in portfolio:
-            pidx = trade.get("event", {}).get("args", {}).get("t", {}).get("pairIndex")
-            if pidx is not None:
-                key = str(int(pidx))
-                info = pair_map.get(key)
-                if info:
-                    # Convert PairInfoWithData (Pydantic model) safely to dict
-                    info_dict = (
-                        info.model_dump() if hasattr(info, "model_dump")
-                        else info.dict() if hasattr(info, "dict")
-                        else dict(info)
-                    )
-                    trade["pairInfo"] = {
-                        "from": info_dict.get("from") or info_dict.get("from_"),
-                        "to": info_dict.get("to") or info_dict.get("to_"),
-                    }
-
-            enriched_portfolio.append(trade)
-
-        logger.info(f"✅ Enriched {len(enriched_portfolio)} trades with pair info")
+        logger.info("✅ Enriched %s trades with pair info", len(enriched_portfolio))
 
         return {
             "portfolio": enriched_portfolio,
             "page": page_number,
-            "hasMore": len(portfolio) > 0  # Simple heuristic: if we got data, there might be more
+            "hasMore": has_more,
         }
 
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        logger.error("❌ Avantis API unavailable: %s", e)
+        raise HTTPException(status_code=503, detail=str(e)) from e
     except httpx.HTTPStatusError as e:
-        logger.error(f"❌ Avantis API error: {e}")
+        logger.error("❌ Avantis API error: %s", e)
         raise HTTPException(status_code=e.response.status_code, detail=str(e))
     except Exception as e:
         logger.exception("💥 Unexpected error while fetching portfolio history")
@@ -541,27 +704,40 @@ async def get_portfolio_history(address: str, page_number: int):
 
 
 # --- Portfolio Stats Proxy Routes ---
+async def _cached_history_api(route: str, address: str, ttl: float) -> CachedResult:
+    """Raw Avantis API portfolio document, cached stale-while-revalidate."""
+    async def _fetch() -> RawPayload:
+        return await fetch_raw(get_http_client(HISTORY), f"/v1/history/portfolio/{route}/{address}")
+
+    return await within_deadline(
+        history_api_cache.get((route, address), _fetch, ttl=ttl, stale_ttl=settings.cache_stale_ttl)
+    )
+
+
 @app.get("/api/portfolio/profit-loss/{address}")
-async def get_portfolio_profit_loss(address: str):
+async def get_portfolio_profit_loss(address: str, request: Request):
     """
     Proxy endpoint to fetch portfolio profit/loss data for a user from Avantis API.
+    Served stale-while-revalidate from the Avantis API cache; the upstream
+    body is passed through unparsed.
     """
-    logger.info(f"📊 Fetching profit/loss data for address: {address}")
+    logger.info("📊 Fetching profit/loss data for address: %s", address)
 
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                f"https://api.avantisfi.com/v1/history/portfolio/profit-loss/{address}",
-                timeout=10.0,
-            )
-            resp.raise_for_status()
-            data = resp.json()
+        cached = await _cached_history_api("profit-loss", address, settings.cache_ttl_profit_loss)
+        response = passthrough_response(cached.value, request)
+        _set_cache_headers(response, cached.status, cached.age)
 
-        logger.info(f"✅ Successfully fetched profit/loss data for {address}")
-        return data
+        logger.info("✅ Successfully fetched profit/loss data for %s (%s)", address, cached.status)
+        return response
 
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        logger.error("❌ Avantis API unavailable: %s", e)
+        raise HTTPException(status_code=503, detail=str(e)) from e
     except httpx.HTTPStatusError as e:
-        logger.error(f"❌ Avantis API error: {e}")
+        logger.error("❌ Avantis API error: %s", e)
         raise HTTPException(status_code=e.response.status_code, detail=str(e))
     except Exception as e:
         logger.exception("💥 Unexpected error while fetching profit/loss data")
@@ -569,27 +745,223 @@ async def get_portfolio_profit_loss(address: str):
 
 
 @app.get("/api/portfolio/win-rate/{address}")
-async def get_portfolio_win_rate(address: str):
+async def get_portfolio_win_rate(address: str, request: Request):
     """
     Proxy endpoint to fetch portfolio win rate data for a user from Avantis API.
+    Served stale-while-revalidate from the Avantis API cache; the upstream
+    body is passed through unparsed.
     """
-    logger.info(f"🎯 Fetching win rate data for address: {address}")
+    logger.info("🎯 Fetching win rate data for address: %s", address)
 
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                f"https://api.avantisfi.com/v1/history/portfolio/win-rate/{address}",
-                timeout=10.0,
-            )
-            resp.raise_for_status()
-            data = resp.json()
+        cached = await _cached_history_api("win-rate", address, settings.cache_ttl_win_rate)
+        response = passthrough_response(cached.value, request)
+        _set_cache_headers(response, cached.status, cached.age)
 
-        logger.info(f"✅ Successfully fetched win rate data for {address}")
-        return data
+        logger.info("✅ Successfully fetched win rate data for %s (%s)", address, cached.status)
+        return response
 
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        logger.error("❌ Avantis API unavailable: %s", e)
+        raise HTTPException(status_code=503, detail=str(e)) from e
     except httpx.HTTPStatusError as e:
-        logger.error(f"❌ Avantis API error: {e}")
+        logger.error("❌ Avantis API error: %s", e)
         raise HTTPException(status_code=e.response.status_code, detail=str(e))
     except Exception as e:
         logger.exception("💥 Unexpected error while fetching win rate data")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+# --- Portfolio Overview Route ---
+async def _overview_source(name: str, coro: Awaitable[Any], errors: Dict[str, Any]) -> Any:
+    try:
+        return await asyncio.wait_for(coro, timeout=deadline_timeout(settings.overview_source_timeout))
+    except asyncio.TimeoutError:
+        errors[name] = {"status_code": 504, "detail": "Upstream timed out"}
+    except CircuitOpenError as e:
+        errors[name] = {"status_code": 503, "detail": str(e)}
+    except HTTPException as e:
+        errors[name] = {"status_code": e.status_code, "detail": e.detail}
+    except httpx.HTTPStatusError as e:
+        errors[name] = {"status_code": e.response.status_code, "detail": str(e)}
+    except Exception as e:
+        errors[name] = {"status_code": 502, "detail": str(e)}
+    return None
+
+
+async def _overview_history_api(name: str, route: str, address: str, ttl: float, stale: List[str]) -> Any:
+    cached = await _cached_history_api(route, address, ttl)
+    if cached.status == "STALE":
+        stale.append(name)
+    return cached.value.json()
+
+
+async def _overview_user_data(address: str, stale: List[str]) -> Dict[str, Any]:
+    user_data, cache_status = await user_data_cache.lookup(address, allow_stale=True)
+    if cache_status == "STALE":
+        stale.append("userData")
+    return user_data.data
+
+
+@app.get("/api/portfolio/overview/{address}")
+async def get_portfolio_overview(address: str):
+    """
+    Combined portfolio document: profit/loss, win rate, top trades and user
+    data fetched concurrently. Sources that fail or time out are returned as
+    null with an entry in `errors` instead of failing the whole response;
+    sources served from an expired cache entry are listed in `stale`.
+    """
+    logger.info("🗂️ Fetching portfolio overview for address: %s", address)
+
+    errors: Dict[str, Any] = {}
+    stale: List[str] = []
+    profit_loss, win_rate, top_trades, user_data = await asyncio.gather(
+        _overview_source(
+            "profitLoss",
+            _overview_history_api("profitLoss", "profit-loss", address, settings.cache_ttl_profit_loss, stale),
+            errors,
+        ),
+        _overview_source(
+            "winRate",
+            _overview_history_api("winRate", "win-rate", address, settings.cache_ttl_win_rate, stale),
+            errors,
+        ),
+        _overview_source("topTrades", get_top_trades(address), errors),
+        _overview_source("userData", _overview_user_data(address, stale), errors),
+    )
+
+    if errors:
+        logger.warning("⚠️ Portfolio overview for %s is partial: %s", address, sorted(errors))
+    else:
+        logger.info("✅ Successfully fetched portfolio overview for %s", address)
+
+    return {
+        "address": address,
+        "profitLoss": profit_loss,
+        "winRate": win_rate,
+        "topTrades": top_trades,
+        "userData": user_data,
+        "errors": errors,
+        "stale": sorted(stale),
+    }
+
+
+# --- Portfolio PnL Routes ---
+@app.post("/api/portfolio/pnl/batch")
+async def get_portfolio_pnl_batch(req: PnlBatchRequest):
+    """
+    PnL and exposure for many traders at once plus a leaderboard ranked by
+    net PnL. User data is fetched with bounded concurrency, then every
+    position is priced against one snapshot in a single vectorized pass.
+    Addresses priced from expired user data are listed in `stale`.
+    """
+    addresses = list(dict.fromkeys(req.addresses))
+    if len(addresses) > settings.pnl_batch_max_addresses:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch exceeds the maximum of {settings.pnl_batch_max_addresses} addresses",
+        )
+    logger.info("💹 Computing batch PnL for %s addresses", len(addresses))
+
+    semaphore = asyncio.Semaphore(max(1, settings.pnl_batch_concurrency))
+    errors: Dict[str, Any] = {}
+    stale: List[str] = []
+
+    async def _positions(address: str):
+        async with semaphore:
+            try:
+                user_data, cache_status = await within_deadline(user_data_cache.lookup(address, allow_stale=True))
+                if cache_status == "STALE":
+                    stale.append(address)
+                return user_data.data.get("positions", []) or []
+            except HTTPException:
+                raise
+            except CircuitOpenError as e:
+                errors[address] = {"status_code": 503, "detail": str(e)}
+            except httpx.HTTPStatusError as e:
+                errors[address] = {"status_code": e.response.status_code, "detail": str(e)}
+            except Exception as e:
+                errors[address] = {"status_code": 502, "detail": str(e)}
+            return None
+
+    try:
+        snapshot, *positions_by_address = await within_deadline(asyncio.gather(
+            price_snapshot.get(), *(_positions(address) for address in addresses)
+        ))
+    except CircuitOpenError as e:
+        logger.error("❌ Price feed unavailable: %s", e)
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    except httpx.HTTPError as e:
+        logger.error("❌ Failed to fetch prices for batch PnL: %s", e, exc_info=True)
+        raise HTTPException(status_code=502, detail=f"Failed to fetch prices: {e}") from e
+
+    ok = [(a, p) for a, p in zip(addresses, positions_by_address) if p is not None]
+    arrays, owner = stack_positions([p for _, p in ok])
+    result = compute_pnl(arrays, prices_for(arrays, snapshot.by_pair))
+    totals = {key: value.tolist() for key, value in owner_totals(arrays, owner, len(ok), result).items()}
+
+    results = {
+        address: {
+            "totalNetPnl": totals["totalNetPnl"][i],
+            "portfolioValue": totals["portfolioValue"][i],
+            "exposure": totals["exposure"][i],
+            "positionCount": int(totals["positionCount"][i]),
+            "pricedPositionCount": int(totals["pricedPositionCount"][i]),
+        }
+        for i, (address, _) in enumerate(ok)
+    }
+    ranked = sorted(results.items(), key=lambda item: item[1]["totalNetPnl"], reverse=True)
+    leaderboard = [
+        {"rank": rank, "address": address, **totals_}
+        for rank, (address, totals_) in enumerate(ranked, start=1)
+    ]
+
+    logger.info("✅ Computed batch PnL over %s positions (%s failed addresses)", len(arrays), len(errors))
+    return {
+        "results": results,
+        "leaderboard": leaderboard,
+        "errors": errors,
+        "stale": [address for address in addresses if address in stale],
+        "priceSnapshotAge": snapshot.age,
+    }
+
+
+@app.get("/api/portfolio/pnl/{address}")
+async def get_portfolio_pnl(address: str, response: Response = None):
+    """
+    Gross/net PnL, fees and liquidation price for every open position of a
+    trader, computed server-side from cached user data and the price snapshot.
+    X-Cache reports how the user data was served (STALE while the core API
+    is failing) and `userDataAge` its age in seconds.
+    """
+    logger.info("💹 Computing PnL for address: %s", address)
+
+    try:
+        (user_data, cache_status), snapshot = await within_deadline(asyncio.gather(
+            user_data_cache.lookup(address, allow_stale=True), price_snapshot.get()
+        ))
+    except CircuitOpenError as e:
+        logger.error("❌ PnL inputs unavailable: %s", e)
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    except httpx.HTTPStatusError as e:
+        logger.error("❌ Avantis API error: %s", e)
+        raise HTTPException(status_code=e.response.status_code, detail=str(e))
+    except httpx.HTTPError as e:
+        logger.error("❌ Failed to fetch PnL inputs: %s", e, exc_info=True)
+        raise HTTPException(status_code=502, detail=f"Failed to fetch PnL inputs: {e}") from e
+
+    arrays = positions_to_arrays(user_data.data.get("positions", []) or [])
+    prices = prices_for(arrays, snapshot.by_pair)
+    result = compute_pnl(arrays, prices)
+
+    logger.info("✅ Computed PnL for %s positions of %s", len(arrays), address)
+    _set_cache_headers(response, cache_status, user_data.age)
+    return {
+        "address": address,
+        "positions": pnl_rows(arrays, prices, result),
+        **pnl_totals(arrays, result),
+        "userDataAge": user_data.age,
+        "priceSnapshotAge": snapshot.age,
+    }
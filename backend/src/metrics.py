@@ -0,0 +1,281 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Deliberately small: counters, gauges and fixed-bucket histograms kept in
+plain dicts keyed by label values. Everything is updated from the event
+loop, so no locking is needed.
+"""
+import asyncio
+import re
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+
+
+# Seconds; covers in-memory hits through slow RPC-backed builds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+            for labels, value in sorted(self.values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        self.values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help_text: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (non-cumulative) ..., +Inf], sum
+        self.series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total[0]!r}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+http_request_duration = Histogram(
+    "lattice_http_request_duration_seconds", "Request latency by route and status.", ("method", "route", "status")
+)
+http_requests_in_flight = Gauge("lattice_http_requests_in_flight", "Requests currently being served.")
+upstream_request_duration = Histogram(
+    "lattice_upstream_request_duration_seconds",
+    "Upstream HTTP latency (to response headers) by host and endpoint.",
+    ("host", "endpoint", "status"),
+)
+sdk_call_duration = Histogram(
+    "lattice_sdk_call_duration_seconds", "Avantis SDK tx builder latency.", ("builder", "outcome")
+)
+cache_requests = Counter(
+    "lattice_cache_requests_total", "Cache lookups by cache and result (hit, miss, stale).", ("cache", "result")
+)
+rpc_endpoint_latency = Gauge(
+    "lattice_rpc_endpoint_latency_seconds", "EWMA latency per pooled JSON-RPC endpoint (by pool position).", ("endpoint",)
+)
+rpc_endpoint_error_rate = Gauge(
+    "lattice_rpc_endpoint_error_rate", "EWMA error rate per pooled JSON-RPC endpoint.", ("endpoint",)
+)
+rpc_extra_requests = Counter(
+    "lattice_rpc_extra_requests_total",
+    "JSON-RPC requests beyond the first endpoint (hedge, failover) and which of them answered.",
+    ("kind",),
+)
+upstream_hedges = Counter(
+    "lattice_upstream_hedges_total", "Hedged upstream GETs sent, and how many of them answered first.", ("host", "kind")
+)
+candle_buffer_bytes = Gauge(
+    "lattice_candle_buffer_bytes", "Memory held by the candle ring buffers per resolution.", ("resolution",)
+)
+cache_hit_ratio = Gauge("lattice_cache_hit_ratio", "Share of cache lookups served without an upstream wait.", ("cache",))
+
+REGISTRY: List[_Metric] = [
+    http_request_duration,
+    http_requests_in_flight,
+    upstream_request_duration,
+    sdk_call_duration,
+    rpc_endpoint_latency,
+    rpc_endpoint_error_rate,
+    rpc_extra_requests,
+    upstream_hedges,
+    candle_buffer_bytes,
+    cache_requests,
+    cache_hit_ratio,
+]
+
+
+def record_cache(cache: str, result: str) -> None:
+    cache_requests.inc(cache, result.lower())
+
+
+def _update_hit_ratios() -> None:
+    totals: Dict[str, float] = {}
+    hits: Dict[str, float] = {}
+    for (cache, result), count in cache_requests.values.items():
+        totals[cache] = totals.get(cache, 0.0) + count
+        if result != "miss":
+            hits[cache] = hits.get(cache, 0.0) + count
+    for cache, total in totals.items():
+        cache_hit_ratio.set(cache, value=hits.get(cache, 0.0) / total)
+
+
+def render() -> str:
+    _update_hit_ratios()
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    for metric in REGISTRY:
+        if isinstance(metric, Histogram):
+            metric.series.clear()
+        else:
+            metric.values.clear()
+
+
+@contextmanager
+def sdk_call(builder: str) -> Iterator[None]:
+    """Time one SDK tx-builder call."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        sdk_call_duration.observe(time.perf_counter() - started, builder, outcome)
+
+
+# Addresses, hashes and numbers in upstream paths would make one series per
+# trader or page; collapse them into placeholders
+_PATH_PARAM = re.compile(r"/(0x[0-9a-fA-F]+|\d+)(?=/|$)")
+
+
+def endpoint_template(path: str) -> str:
+    return _PATH_PARAM.sub(lambda m: "/{address}" if m.group(1).startswith("0x") else "/{n}", path)
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Wraps an httpx transport and records upstream latency per endpoint.
+
+    `endpoint` fixes the endpoint label, for hosts whose URL path is not
+    worth (or safe) exposing, such as an RPC URL carrying an API key.
+    """
+
+    def __init__(self, host: str, transport: httpx.AsyncBaseTransport, endpoint: Optional[str] = None):
+        self.host = host
+        self.transport = transport
+        self.endpoint = endpoint
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = await self.transport.handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        except asyncio.CancelledError:
+            # Deadline passed or lost a hedge race
+            status = "cancelled"
+            raise
+        finally:
+            upstream_request_duration.observe(
+                time.perf_counter() - started,
+                self.host,
+                self.endpoint or endpoint_template(request.url.path),
+                status,
+            )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route latency and in-flight requests."""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500  # if the app fails before starting a response
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            # The router stores the matched route in the scope; use its
+            # template so path parameters do not create new series
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(time.perf_counter() - started, scope["method"], route_path, str(status))
@@ -1,4 +1,4 @@
-from typing import Optional, Literal, Any, Dict, List, Tuple
+from typing import Annotated, Optional, Literal, Any, Dict, List, Tuple, Union
 
 from pydantic import BaseModel, Field
 
@@ -87,3 +87,48 @@ class UpdateTpSlRequest(BaseModel):
     sl: float = Field(0)
 
 
+
+
+class OpenTradeBatchItem(BaseModel):
+    type: Literal["open"]
+    params: OpenTradeRequest
+
+
+class CloseTradeBatchItem(BaseModel):
+    type: Literal["close"]
+    params: CloseTradeRequest
+
+
+class CancelOrderBatchItem(BaseModel):
+    type: Literal["cancel"]
+    params: CancelOrderRequest
+
+
+class UpdateTpSlBatchItem(BaseModel):
+    type: Literal["tp_sl"]
+    params: UpdateTpSlRequest
+
+
+BatchTxItem = Annotated[
+    Union[OpenTradeBatchItem, CloseTradeBatchItem, CancelOrderBatchItem, UpdateTpSlBatchItem],
+    Field(discriminator="type"),
+]
+
+
+class BatchTxRequest(BaseModel):
+    items: List[BatchTxItem] = Field(..., min_length=1)
+
+
+class BatchTxResult(BaseModel):
+    ok: bool
+    tx: Optional[BuildTxResponse] = None
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BatchTxResponse(BaseModel):
+    results: List[BatchTxResult]
+
+
+class PnlBatchRequest(BaseModel):
+    addresses: List[str] = Field(..., min_length=1, description="Trader addresses to rank")
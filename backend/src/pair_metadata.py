@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from .avantis_client import get_trader_client
+from .pairs_snapshot import read_snapshot
+
+
+logger = logging.getLogger(__name__)
+
+
+class PairMeta(NamedTuple):
+    """Compact per-pair record used for trade enrichment."""
+
+    pair_index: int
+    from_: Optional[str]
+    to: Optional[str]
+    feed_id: Optional[str]
+
+    @property
+    def name(self) -> str:
+        return f"{self.from_}/{self.to}"
+
+
+def _field(obj: Any, *names: str) -> Any:
+    """Read the first present attribute/key, for SDK models and plain dicts alike."""
+    for name in names:
+        value = obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+        if value is not None:
+            return value
+    return None
+
+
+def build_pair_meta(pair_index: int, info: Any) -> PairMeta:
+    feed = _field(info, "feed")
+    return PairMeta(
+        pair_index=pair_index,
+        from_=_field(info, "from_", "from"),
+        to=_field(info, "to_", "to"),
+        feed_id=_field(feed, "feed_id", "feedId") if feed is not None else None,
+    )
+
+
+class PairMetadataIndex:
+    """Integer pair index -> PairMeta, rebuilt only when pairs info changes.
+
+    The SDK's pairs cache hands back the same dict object until it reloads,
+    so identity (plus size, in case it is filled in place) is enough to tell
+    whether the index is still current.
+
+    On a cold start the index can be seeded from a pairs snapshot file; it
+    is then served as is while the SDK cache loads in the background.
+    """
+
+    def __init__(self):
+        self.by_index: Dict[int, PairMeta] = {}
+        self.version = 0
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self.live = False
+        self._source: Optional[Dict[Any, Any]] = None
+        self._source_len = 0
+        self._live_task: Optional[asyncio.Task] = None
+
+    def rebuild(self, pairs_info: Dict[Any, Any]) -> None:
+        self.by_index = {
+            int(key): build_pair_meta(int(key), info) for key, info in pairs_info.items()
+        }
+        self._source = pairs_info
+        self._source_len = len(pairs_info)
+        self.version += 1
+
+    def sync(self, pairs_info: Dict[Any, Any]) -> None:
+        if pairs_info is not self._source or len(pairs_info) != self._source_len:
+            self.rebuild(pairs_info)
+
+    def load_snapshot(self, path: str) -> bool:
+        """Seed the index from a pairs snapshot file, if one exists."""
+        pairs = read_snapshot(path)
+        if pairs is None:
+            return False
+        self.snapshot = pairs
+        self.sync(pairs)
+        logger.info("📦 Loaded %s pairs from snapshot %s", len(pairs), path)
+        return True
+
+    async def load_live(self) -> Dict[Any, Any]:
+        """Pairs info from the SDK pairs cache (over RPC until it is filled)."""
+        trader_client = get_trader_client()
+        pairs_info = await trader_client.pairs_cache.get_pairs_info()
+        self.live = True
+        self.sync(pairs_info)
+        return pairs_info
+
+    async def _load_live_in_background(self) -> None:
+        try:
+            await self.load_live()
+        except Exception as e:
+            logger.warning("⚠️ Background pairs refresh failed, still serving snapshot: %s", e)
+
+    async def pairs_info(self) -> Dict[Any, Any]:
+        """Current pairs info, from the snapshot while the SDK cache is cold."""
+        if self.live or self.snapshot is None:
+            return await self.load_live()
+        if self._live_task is None or self._live_task.done():
+            self._live_task = asyncio.ensure_future(self._load_live_in_background())
+        return self.snapshot
+
+    async def refresh(self) -> "PairMetadataIndex":
+        await self.pairs_info()
+        return self
+
+    def get(self, pair_index: int) -> Optional[PairMeta]:
+        return self.by_index.get(pair_index)
+
+    def enrich_trades(self, trades: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Attach `pairInfo: {from, to}` to history/top-trade entries in place."""
+        enriched = []
+        for trade in trades:
+            pidx = ((trade.get("event") or {}).get("args") or {}).get("t", {}).get("pairIndex")
+            if pidx is not None:
+                meta = self.by_index.get(int(pidx))
+                if meta is not None:
+                    trade["pairInfo"] = {"from": meta.from_, "to": meta.to}
+            enriched.append(trade)
+        return enriched
+
+
+pair_metadata = PairMetadataIndex()
@@ -0,0 +1,164 @@
+import re
+from bisect import bisect_left
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from .pair_metadata import PairMeta, PairMetadataIndex, pair_metadata
+
+
+# Longer queries are cut, which bounds the work per search
+MAX_QUERY_LENGTH = 32
+
+# Quote assumed when only a base symbol is given ("ETH" -> ETH/USD)
+DEFAULT_QUOTE = "USD"
+
+# Match kinds, best first
+EXACT, PREFIX, SUBSTRING, FUZZY = "exact", "prefix", "substring", "fuzzy"
+_RANK = {EXACT: 0, PREFIX: 1, SUBSTRING: 2, FUZZY: 3}
+
+_SEPARATORS = re.compile(r"[^A-Z0-9]")
+
+
+def normalize(name: str) -> str:
+    """Upper-case symbol text without separators: "eth-usd", "ETH/USD" -> "ETHUSD"."""
+    return _SEPARATORS.sub("", name.upper())[:MAX_QUERY_LENGTH]
+
+
+def _max_distance(length: int) -> int:
+    # Short symbols are too close to each other for typo tolerance
+    if length < 3:
+        return 0
+    return 1 if length < 6 else 2
+
+
+def _within_distance(a: str, b: str, limit: int) -> Optional[int]:
+    """Levenshtein distance of a and b if it is at most `limit`, else None."""
+    if abs(len(a) - len(b)) > limit:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= limit else None
+
+
+class SearchHit(NamedTuple):
+    meta: PairMeta
+    match: str
+    distance: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "pairIndex": self.meta.pair_index,
+            "name": self.meta.name,
+            "from": self.meta.from_,
+            "to": self.meta.to,
+            "match": self.match,
+        }
+
+
+class PairSearchIndex:
+    """Normalized pair names and aliases over the pair metadata index.
+
+    Each pair is known by its full name without separators ("ETHUSD", which
+    also covers "ETH/USD", "eth-usd" and "ETH_USD") and its base symbol
+    ("ETH"). Several pairs can share a name (e.g. a relisted market); all of
+    them are kept and searched. Aliases are kept sorted so prefix matches are a bisect; fuzzy
+    matching is a bounded edit distance over the aliases and only runs when
+    the cheaper matches leave room in the results. The index is rebuilt
+    whenever the metadata index is, i.e. once per pairs-info version.
+    """
+
+    def __init__(self, metadata: PairMetadataIndex):
+        self.metadata = metadata
+        self._by_index: Optional[Dict[int, PairMeta]] = None
+        self.full: Dict[str, List[int]] = {}
+        self.bases: Dict[str, List[int]] = {}
+        self.aliases: List[Tuple[str, int]] = []
+
+    def _sync(self) -> None:
+        # pair_metadata replaces `by_index` on every rebuild
+        if self._by_index is self.metadata.by_index:
+            return
+        self._by_index = self.metadata.by_index
+        self.full, self.bases = {}, {}
+        for pidx, meta in sorted(self._by_index.items()):
+            if meta.from_ is None:
+                continue
+            base = normalize(meta.from_)
+            self.full.setdefault(base + normalize(meta.to or ""), []).append(pidx)
+            self.bases.setdefault(base, []).append(pidx)
+        self.aliases = sorted(
+            [(alias, pidx) for alias, pidxs in self.full.items() for pidx in pidxs]
+            + [(base, pidx) for base, pidxs in self.bases.items() for pidx in pidxs]
+        )
+
+    def matches(self, pair: str) -> List[int]:
+        """Every pair index a lenient pair name ("ETH/USD", "eth-usd", "ETHUSD",
+        or "ETH" when that base has a single or a USD pair) stands for.
+
+        Never guesses past a typo: a tx must not be built for another pair.
+        """
+        self._sync()
+        key = normalize(pair)
+        if key in self.full:
+            return list(self.full[key])
+        candidates = self.bases.get(key, [])
+        if len(candidates) == 1:
+            return list(candidates)
+        return list(self.full.get(key + DEFAULT_QUOTE, []))
+
+    def resolve(self, pair: str) -> Optional[int]:
+        """The pair index for a lenient pair name, if it names exactly one pair."""
+        found = self.matches(pair)
+        return found[0] if len(found) == 1 else None
+
+    def search(self, query: str, limit: int) -> List[SearchHit]:
+        """Up to `limit` pairs matching `query`, best matches first."""
+        self._sync()
+        key = normalize(query)
+        if not key or limit <= 0:
+            return []
+
+        best: Dict[int, Tuple[str, int]] = {}
+
+        def consider(pidx: int, match: str, distance: int = 0) -> None:
+            current = best.get(pidx)
+            if current is None or (_RANK[match], distance) < (_RANK[current[0]], current[1]):
+                best[pidx] = (match, distance)
+
+        start = bisect_left(self.aliases, (key, -1))
+        for alias, pidx in self.aliases[start:]:
+            if not alias.startswith(key):
+                break
+            consider(pidx, EXACT if alias == key else PREFIX)
+
+        if len(best) < limit:
+            for alias, pidx in self.aliases:
+                if key in alias[1:]:
+                    consider(pidx, SUBSTRING)
+
+        limit_distance = _max_distance(len(key))
+        if len(best) < limit and limit_distance:
+            for alias, pidx in self.aliases:
+                if pidx in best:
+                    continue
+                # Also match a typo in what has been typed so far of a longer name
+                distance = _within_distance(key, alias[:len(key)], limit_distance)
+                full_distance = _within_distance(key, alias, limit_distance)
+                if full_distance is not None:
+                    distance = full_distance if distance is None else min(distance, full_distance)
+                if distance is not None:
+                    consider(pidx, FUZZY, distance)
+
+        ranked = sorted(
+            best.items(),
+            key=lambda item: (_RANK[item[1][0]], item[1][1], len(self._by_index[item[0]].name), item[0]),
+        )
+        return [SearchHit(self._by_index[pidx], match, distance) for pidx, (match, distance) in ranked[:limit]]
+
+
+pair_search = PairSearchIndex(pair_metadata)
@@ -0,0 +1,99 @@
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, NamedTuple, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from .passthrough import accepts_encoding
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+# Preferred first when the client accepts several
+_ENCODINGS = ("br", "gzip")
+
+
+class EncodedBody(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def _dumps(value: Any) -> bytes:
+    # Same settings as FastAPI's JSONResponse, so bodies are byte-identical
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def _etag(body: bytes, suffix: str = "") -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}{suffix}"'
+
+
+def _if_none_match(request: Optional[Request]) -> set:
+    if request is None:
+        return set()
+    tags = set()
+    for tag in request.headers.get("if-none-match", "").split(","):
+        tag = tag.strip()
+        # If-None-Match uses weak comparison
+        tags.add(tag[2:] if tag.startswith("W/") else tag)
+    tags.discard("")
+    return tags
+
+
+def conditional_response(request: Optional[Request], variants: Dict[str, EncodedBody]) -> Response:
+    """Serve the best pre-encoded variant, or 304 if the client already has it."""
+    encoding = next((e for e in _ENCODINGS if e in variants and accepts_encoding(request, e)), "identity")
+    chosen = variants[encoding]
+    headers = {"ETag": chosen.etag, "Cache-Control": "no-cache"}
+    if len(variants) > 1:
+        headers["Vary"] = "Accept-Encoding"
+
+    tags = _if_none_match(request)
+    if "*" in tags or any(v.etag in tags for v in variants.values()):
+        return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=chosen.body, media_type="application/json", headers=headers)
+
+
+class PairsPayload:
+    """Encoded /pairs bodies, built once per pairs-info version.
+
+    Each pair is encoded once; the full body is assembled from those slices
+    and precompressed (gzip, plus brotli when installed). Every variant has
+    a strong ETag.
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.variants: Dict[str, EncodedBody] = {}
+        self.by_pair: Dict[int, EncodedBody] = {}
+
+    def rebuild(self, pairs_info: Dict[Any, Any], version: int) -> None:
+        slices = []
+        by_pair: Dict[int, EncodedBody] = {}
+        for key, info in pairs_info.items():
+            encoded = _dumps(jsonable_encoder(info))
+            by_pair[int(key)] = EncodedBody(encoded, _etag(encoded))
+            slices.append(_dumps(str(key)) + b":" + encoded)
+        body = b"{" + b",".join(slices) + b"}"
+
+        variants = {"identity": EncodedBody(body, _etag(body))}
+        tag = variants["identity"].etag.strip('"')
+        variants["gzip"] = EncodedBody(gzip.compress(body, compresslevel=9, mtime=0), f'"{tag}-gzip"')
+        if brotli is not None:
+            variants["br"] = EncodedBody(brotli.compress(body), f'"{tag}-br"')
+
+        self.variants, self.by_pair, self.version = variants, by_pair, version
+
+    def sync(self, pairs_info: Dict[Any, Any], version: int) -> None:
+        if version != self.version:
+            self.rebuild(pairs_info, version)
+
+
+pairs_payload = PairsPayload()
@@ -0,0 +1,84 @@
+"""Versioned on-disk snapshot of pairs info for cold starts.
+
+Written ahead of time (at build/deploy time, or by hand) with
+
+    python -m backend.src.pairs_snapshot [--output PATH]
+
+and loaded by new instances at startup, so /pairs and pair-name resolution
+work before the SDK pairs cache has been filled over RPC.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from .avantis_client import get_trader_client
+from .config import settings
+
+
+SNAPSHOT_FORMAT = 1
+
+
+class SnapshotError(Exception):
+    """The snapshot file is missing fields or has an unsupported format."""
+
+
+def dumps_snapshot(pairs_info: Dict[Any, Any]) -> bytes:
+    document = {
+        "format": SNAPSHOT_FORMAT,
+        "created_at": int(time.time()),
+        "pairs": {str(key): jsonable_encoder(info) for key, info in pairs_info.items()},
+    }
+    return json.dumps(document, separators=(",", ":")).encode("utf-8")
+
+
+def write_snapshot(path: str, pairs_info: Dict[Any, Any]) -> None:
+    """Write atomically, so a reader never sees a half-written file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".pairs-snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(dumps_snapshot(pairs_info))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_snapshot(path: str) -> Optional[Dict[str, Any]]:
+    """Pairs info from a snapshot file, or None if there is no file."""
+    try:
+        with open(path, "rb") as f:
+            document = json.loads(f.read())
+    except FileNotFoundError:
+        return None
+    if not isinstance(document, dict) or document.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"Unsupported pairs snapshot format in {path}")
+    pairs = document.get("pairs")
+    if not isinstance(pairs, dict):
+        raise SnapshotError(f"Pairs snapshot {path} has no pairs")
+    return pairs
+
+
+async def _fetch_pairs_info() -> Dict[Any, Any]:
+    return await get_trader_client().pairs_cache.get_pairs_info()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write the pairs info snapshot loaded at startup.")
+    parser.add_argument("--output", default=settings.pairs_snapshot_path, help="snapshot file to write")
+    args = parser.parse_args()
+
+    pairs_info = asyncio.run(_fetch_pairs_info())
+    write_snapshot(args.output, pairs_info)
+    print(f"Wrote {len(pairs_info)} pairs to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
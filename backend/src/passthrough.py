@@ -0,0 +1,115 @@
+import json
+import zlib
+from typing import Any, AsyncIterator, Dict, NamedTuple, Optional
+
+import httpx
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+from .config import settings
+
+
+# Encodings we can undo ourselves for clients that do not accept them
+UPSTREAM_ACCEPT_ENCODING = "gzip, deflate"
+
+_DEFAULT_MEDIA_TYPE = "application/json"
+
+
+def _decompress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            # Some servers send raw deflate without the zlib header
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    raise ValueError(f"Unsupported content-encoding: {encoding}")
+
+
+class RawPayload(NamedTuple):
+    """An upstream response body kept as bytes, exactly as it went over the wire."""
+
+    body: bytes
+    media_type: str = _DEFAULT_MEDIA_TYPE
+    content_encoding: Optional[str] = None
+
+    @classmethod
+    def from_response(cls, response: httpx.Response) -> "RawPayload":
+        """Wrap an already-read (decoded) httpx response."""
+        return cls(response.content, response.headers.get("content-type", _DEFAULT_MEDIA_TYPE))
+
+    def decoded(self) -> bytes:
+        body = self.body
+        if self.content_encoding:
+            for encoding in reversed([e.strip() for e in self.content_encoding.split(",")]):
+                body = _decompress(body, encoding)
+        return body
+
+    def json(self) -> Any:
+        return json.loads(self.decoded())
+
+
+async def fetch_raw(client: httpx.AsyncClient, path: str, params: Optional[Dict[str, Any]] = None) -> RawPayload:
+    """GET `path` and keep the body undecoded, together with its content headers."""
+    request = client.build_request("GET", path, params=params, headers={"Accept-Encoding": UPSTREAM_ACCEPT_ENCODING})
+    response = await client.send(request, stream=True)
+    try:
+        response.raise_for_status()
+        body = b"".join([chunk async for chunk in response.aiter_raw()])
+    finally:
+        await response.aclose()
+    encoding = response.headers.get("content-encoding")
+    if encoding and encoding.strip().lower() == "identity":
+        encoding = None
+    return RawPayload(body, response.headers.get("content-type", _DEFAULT_MEDIA_TYPE), encoding)
+
+
+def accepts_encoding(request: Optional[Request], encoding: str) -> bool:
+    """Whether the client's Accept-Encoding allows `encoding` (q=0 excluded)."""
+    if request is None:
+        return False
+    accepted = {}
+    for token in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = token.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                pass
+        if name:
+            accepted[name.strip().lower()] = q
+    q = accepted.get(encoding.lower(), accepted.get("*", 0.0))
+    return q > 0
+
+
+async def _chunks(body: bytes) -> AsyncIterator[memoryview]:
+    # Async so Starlette does not hop to a worker thread for every chunk
+    view = memoryview(body)
+    size = settings.passthrough_chunk_size
+    for start in range(0, len(view), size):
+        yield view[start:start + size]
+
+
+def passthrough_response(
+    payload: RawPayload, request: Optional[Request], headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Send an upstream body to the client without parsing it.
+
+    The upstream encoding is kept when the client accepts it (and undone
+    otherwise). Bodies of `passthrough_stream_threshold` bytes or more are
+    sent with chunked transfer encoding instead of one buffer.
+    """
+    headers = dict(headers or {})
+    body = payload.body
+    if payload.content_encoding:
+        headers["Vary"] = "Accept-Encoding"
+        if accepts_encoding(request, payload.content_encoding):
+            headers["Content-Encoding"] = payload.content_encoding
+        else:
+            body = payload.decoded()
+
+    if len(body) >= settings.passthrough_stream_threshold:
+        return StreamingResponse(_chunks(body), media_type=payload.media_type, headers=headers)
+    return Response(content=body, media_type=payload.media_type, headers=headers)
@@ -0,0 +1,249 @@
+"""Vectorized PnL over open positions.
+
+Mirrors `frontend/src/utils/pnlCalculations.ts` (and the liquidation price
+from `MarketDetail.tsx`) operation for operation, so float results are
+bit-identical to the browser and the BigInt PnL-fee path is exact.
+"""
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+import math
+
+import numpy as np
+
+
+CLOSE_FEE_P = 450000000
+OPEN_FEE_BPS = 0.00045
+LIQ_THRESHOLD = 85
+PNL_FEES_P = np.array(
+    [
+        800000000000, 500000000000, 450000000000, 375000000000, 275000000000,
+        250000000000, 250000000000, 225000000000, 150000000000, 25000000000,
+    ],
+    dtype=np.int64,
+)
+PNL_TIERS_P = np.array(
+    [
+        10000000000, 50000000000, 250000000000, 500000000000, 1000000000000,
+        2500000000000, 5000000000000, 15000000000000, 25000000000000,
+        30000000000000,
+    ],
+    dtype=np.int64,
+)
+
+_SPLIT = 10**6
+
+
+class PositionArrays(NamedTuple):
+    """Columnar view of core user-data positions (raw on-chain precision)."""
+
+    pair_index: np.ndarray
+    trade_index: np.ndarray
+    open_price: np.ndarray
+    collateral: np.ndarray
+    leverage: np.ndarray
+    rollover_fee: np.ndarray
+    buy: np.ndarray
+    is_pnl: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.pair_index)
+
+
+def positions_to_arrays(positions: Iterable[Mapping[str, Any]]) -> PositionArrays:
+    positions = list(positions)
+
+    def column(key: str, dtype: Any, default: Any = 0) -> np.ndarray:
+        return np.array([p.get(key) or default for p in positions], dtype=dtype)
+
+    return PositionArrays(
+        pair_index=column("pairIndex", np.int64),
+        trade_index=column("index", np.int64),
+        open_price=column("openPrice", np.float64),
+        collateral=column("collateral", np.float64),
+        leverage=column("leverage", np.float64),
+        rollover_fee=column("rolloverFee", np.float64),
+        buy=column("buy", bool, False),
+        is_pnl=column("isPnl", bool, False),
+    )
+
+
+def _floor_mul_div_1e12(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Exact floor(a * b / 1e12) for non-negative int64 arrays.
+
+    The product overflows int64 for realistic positions, so both factors are
+    split into 1e6 limbs and the quotient is assembled from partial products.
+    Exact whenever the result itself fits in int64.
+    """
+    a_hi, a_lo = np.divmod(a, _SPLIT)
+    b_hi, b_lo = np.divmod(b, _SPLIT)
+    mid = a_hi * b_lo + a_lo * b_hi
+    mid_hi, mid_lo = np.divmod(mid, _SPLIT)
+    return a_hi * b_hi + mid_hi + (mid_lo * _SPLIT + a_lo * b_lo) // (_SPLIT * _SPLIT)
+
+
+def pnl_based_fee(collateral: np.ndarray, percent_profit: np.ndarray) -> np.ndarray:
+    """Vectorized `getPnlBasedFee`: tiered fee on profit, 0 for losses."""
+    percent_profit = np.asarray(percent_profit, dtype=np.int64)
+    tier = np.searchsorted(PNL_TIERS_P, percent_profit, side="right")
+    tier = np.minimum(tier, len(PNL_TIERS_P) - 1)
+    profit = np.maximum(percent_profit, 0)
+    # (coll * perc) / 1e10 / 100 then (feesP * pnl) / 1e10 / 100, in BigInt
+    pnl = _floor_mul_div_1e12(np.asarray(collateral).astype(np.int64), profit)
+    fee = _floor_mul_div_1e12(PNL_FEES_P[tier], pnl)
+    return np.where(percent_profit < 0, 0, fee).astype(np.float64)
+
+
+def liquidation_prices(arrays: PositionArrays) -> np.ndarray:
+    """Vectorized `fullLossLiquidationPrice` in human price units."""
+    open_price = arrays.open_price / 1e10
+    collateral = arrays.collateral / 1e6
+    leverage = arrays.leverage / 1e10
+    rollover_fee = arrays.rollover_fee / 1e6
+    opening_fee_bps = np.where(arrays.is_pnl, 0.0, OPEN_FEE_BPS)
+    position_size = collateral * leverage
+    opening_fee = position_size * opening_fee_bps
+    adjusted_collateral = collateral - opening_fee
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distance = (open_price * ((adjusted_collateral * LIQ_THRESHOLD) / 100 - rollover_fee)) / (
+            adjusted_collateral * leverage
+        )
+    liq_price = np.where(arrays.buy, open_price - distance, open_price + distance)
+    return np.where(liq_price > 0, liq_price, 0.0)
+
+
+def compute_pnl(arrays: PositionArrays, prices: np.ndarray) -> Dict[str, np.ndarray]:
+    """Gross/net PnL and fees for every position at `prices` (human units).
+
+    Returns one array per output field; fields that do not apply to a
+    position's fee type are NaN, and `has_price` marks rows with a price.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    has_price = np.isfinite(prices) & (prices != 0)
+    current_price = prices * 1e10
+    open_price = arrays.open_price
+    collateral = arrays.collateral
+    leverage = arrays.leverage
+    direction = np.where(arrays.buy, current_price - open_price, open_price - current_price)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = (leverage * collateral / open_price) / 1e6
+
+        # getPnlForNonzeroPercentProfit
+        closing_fee = ((CLOSE_FEE_P / 1e10) * collateral * leverage) / 1e18
+        rollover_fee = arrays.rollover_fee / 1e6
+        gross_pnl_percent = (direction * shares) / collateral / 100
+        gross_pnl = (direction / 1e10) * shares
+        net_pnl = gross_pnl - closing_fee - rollover_fee
+        net_pnl_percent = (net_pnl / (collateral / 1e6)) * 100
+
+        # calculatePercentProfit + getPnlBasedFee (zero-fee perps)
+        percent_profit = np.floor(((direction * shares) / collateral) * 1e8)
+        percent_profit = np.where(
+            arrays.is_pnl & has_price & np.isfinite(percent_profit), percent_profit, 0
+        ).astype(np.int64)
+        fee = pnl_based_fee(collateral, percent_profit)
+        zf_gross_pnl = (percent_profit / 1e12) * collateral
+        zf_net_pnl = (percent_profit / 1e12) * collateral - fee
+        zf_net_pnl_percent = (zf_net_pnl / (collateral / 1e6)) * 100
+
+    is_pnl = arrays.is_pnl
+    nan = np.nan
+    return {
+        "has_price": has_price,
+        "is_pnl": is_pnl,
+        # nonZeroFeePerp fields
+        "grossPnlPercent": np.where(is_pnl, percent_profit / 1e10, gross_pnl_percent),
+        "grossPnl": np.where(is_pnl, zf_gross_pnl / 1e6, gross_pnl),
+        "closingFee": np.where(is_pnl, nan, closing_fee),
+        "rolloverFee": np.where(is_pnl, nan, rollover_fee),
+        "netPnlPercent": np.where(is_pnl, nan, net_pnl_percent),
+        "netPnl": np.where(is_pnl, nan, net_pnl),
+        # zeroFeePerp fields
+        "pnlPercent": np.where(is_pnl, zf_net_pnl_percent / 1e6, nan),
+        "fee": np.where(is_pnl, fee / 1e6, nan),
+        "pnl": np.where(is_pnl, zf_net_pnl / 1e6, nan),
+        # net PnL regardless of fee type, as summed by the Portfolio page
+        "net": np.where(is_pnl, zf_net_pnl / 1e6, net_pnl),
+    }
+
+
+def prices_for(arrays: PositionArrays, by_pair: Mapping[int, Mapping[str, Any]]) -> np.ndarray:
+    """Look up each position's current price (`c`) in a price snapshot."""
+    unique_pairs, inverse = np.unique(arrays.pair_index, return_inverse=True)
+    unique_prices = np.array(
+        [float((by_pair.get(int(p)) or {}).get("c") or np.nan) for p in unique_pairs],
+        dtype=np.float64,
+    )
+    return unique_prices[inverse] if len(arrays) else np.zeros(0)
+
+
+def _finite(value: float) -> Optional[float]:
+    # Degenerate positions (zero collateral/price) would otherwise emit NaN/inf
+    return value if math.isfinite(value) else None
+
+
+_NONZERO_FEE_FIELDS = ("grossPnlPercent", "grossPnl", "closingFee", "rolloverFee", "netPnlPercent", "netPnl")
+_ZERO_FEE_FIELDS = ("grossPnl", "grossPnlPercent", "pnlPercent", "fee", "pnl")
+
+
+def pnl_rows(
+    arrays: PositionArrays, prices: np.ndarray, result: Dict[str, np.ndarray]
+) -> List[Dict[str, Any]]:
+    """Per-position documents shaped like the frontend `calculatePnL` output."""
+    liq = liquidation_prices(arrays)
+    columns = {key: value.tolist() for key, value in result.items()}
+    rows = []
+    for i in range(len(arrays)):
+        row: Dict[str, Any] = {
+            "pairIndex": int(arrays.pair_index[i]),
+            "index": int(arrays.trade_index[i]),
+            "currentPrice": float(prices[i]) if columns["has_price"][i] else None,
+            "liquidationPrice": _finite(float(liq[i])),
+        }
+        if not columns["has_price"][i]:
+            row["type"] = None
+        elif columns["is_pnl"][i]:
+            row["type"] = "zeroFeePerp"
+            row.update({key: _finite(columns[key][i]) for key in _ZERO_FEE_FIELDS})
+        else:
+            row["type"] = "nonZeroFeePerp"
+            row.update({key: _finite(columns[key][i]) for key in _NONZERO_FEE_FIELDS})
+        rows.append(row)
+    return rows
+
+
+def pnl_totals(arrays: PositionArrays, result: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    priced = result["has_price"] & np.isfinite(result["net"])
+    return {
+        "totalNetPnl": float(result["net"][priced].sum()),
+        "portfolioValue": float((arrays.collateral / 1e6).sum()),
+        "positionCount": int(len(arrays)),
+        "pricedPositionCount": int(priced.sum()),
+    }
+
+
+def stack_positions(
+    positions_by_owner: List[Iterable[Mapping[str, Any]]],
+) -> Tuple[PositionArrays, np.ndarray]:
+    """Stack many traders' positions into one column set plus an owner column."""
+    positions_by_owner = [list(positions) for positions in positions_by_owner]
+    counts = [len(positions) for positions in positions_by_owner]
+    owner = np.repeat(np.arange(len(counts), dtype=np.int64), counts)
+    # One conversion over the flattened list is much cheaper than per-owner arrays
+    flat = [position for positions in positions_by_owner for position in positions]
+    return positions_to_arrays(flat), owner
+
+
+def owner_totals(
+    arrays: PositionArrays, owner: np.ndarray, n_owners: int, result: Dict[str, np.ndarray]
+) -> Dict[str, np.ndarray]:
+    """Per-owner sums of net PnL, collateral and exposure (position size, USDC)."""
+    priced = result["has_price"] & np.isfinite(result["net"])
+    collateral = arrays.collateral / 1e6
+    return {
+        "totalNetPnl": np.bincount(owner, weights=np.where(priced, result["net"], 0.0), minlength=n_owners),
+        "portfolioValue": np.bincount(owner, weights=collateral, minlength=n_owners),
+        "exposure": np.bincount(owner, weights=collateral * (arrays.leverage / 1e10), minlength=n_owners),
+        "positionCount": np.bincount(owner, minlength=n_owners),
+        "pricedPositionCount": np.bincount(owner, weights=priced, minlength=n_owners),
+    }
@@ -0,0 +1,66 @@
+import asyncio
+import json
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List
+
+from .http_clients import HISTORY, get_http_client
+
+
+async def fetch_history_page(address: str, page_number: int) -> List[Dict[str, Any]]:
+    """Fetch one page of closed-trade history from the Avantis API."""
+    client = get_http_client(HISTORY)
+    resp = await client.get(f"/v2/history/portfolio/history/{address}/{page_number}")
+    resp.raise_for_status()
+    return resp.json().get("portfolio", []) or []
+
+
+async def iter_history_pages(
+    fetch_page: Callable[[int], Awaitable[List[Dict[str, Any]]]],
+    window: int,
+    max_pages: int,
+    first_page: int = 1,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yield history pages in order while prefetching up to `window` ahead.
+
+    Stops at the first empty page (or `max_pages`); pages fetched past the
+    end are cancelled. At most `window` pages are ever held in memory.
+    """
+    pending: Deque[asyncio.Future] = deque()
+    next_page = first_page
+    last_page = first_page + max_pages - 1
+    try:
+        while True:
+            while len(pending) < max(1, window) and next_page <= last_page:
+                pending.append(asyncio.ensure_future(fetch_page(next_page)))
+                next_page += 1
+            if not pending:
+                return
+            trades = await pending.popleft()
+            if not trades:
+                return
+            yield trades
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+async def stream_history_ndjson(
+    first: List[Dict[str, Any]],
+    pages: AsyncIterator[List[Dict[str, Any]]],
+    enrich: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+) -> AsyncIterator[str]:
+    """Emit enriched trades as NDJSON, one line per trade.
+
+    A failure after the response has started is reported as a final
+    `{"error": ...}` line since the status code is already sent.
+    """
+    try:
+        for trade in enrich(first):
+            yield json.dumps(trade, separators=(",", ":")) + "\n"
+        async for trades in pages:
+            for trade in enrich(trades):
+                yield json.dumps(trade, separators=(",", ":")) + "\n"
+    except Exception as e:
+        yield json.dumps({"error": str(e)}) + "\n"
+    finally:
+        await pages.aclose()
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from .circuit_breaker import get_breaker, is_upstream_failure
+from .config import settings
+from .http_clients import PRICE_FEED, get_http_client
+from .passthrough import RawPayload
+
+
+logger = logging.getLogger(__name__)
+
+LAST_PRICE_PATH = "/v1/price-feeds/last-price"
+
+
+class PriceSnapshot:
+    """Latest feed-v3 price array kept in memory, with a pairIndex lookup.
+
+    A background task refreshes the snapshot every `refresh_interval`
+    seconds. Readers call `get()`, which only goes upstream itself when the
+    snapshot is missing or older than `max_staleness` (e.g. the background
+    task is not running or the feed is failing). `raw` is the feed body the
+    prices were parsed from, served as is by the all-prices route.
+    """
+
+    def __init__(self, refresh_interval: float, max_staleness: float):
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.prices: List[Dict[str, Any]] = []
+        self.by_pair: Dict[int, Dict[str, Any]] = {}
+        self.raw: Optional[RawPayload] = None
+        self.updated_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+
+    def add_listener(self, listener: Callable[[List[Dict[str, Any]]], None]) -> None:
+        """Register a callback that receives the entries changed by each refresh."""
+        self._listeners.append(listener)
+
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the last successful refresh, or None if never loaded."""
+        if self.updated_at is None:
+            return None
+        return time.monotonic() - self.updated_at
+
+    def is_stale(self) -> bool:
+        age = self.age
+        return age is None or age > self.max_staleness
+
+    def update(self, prices: List[Dict[str, Any]], raw: Optional[RawPayload] = None) -> None:
+        previous = self.by_pair
+        by_pair: Dict[int, Dict[str, Any]] = {}
+        changed: List[Dict[str, Any]] = []
+        for entry in prices:
+            pidx = entry.get("pairIndex") if isinstance(entry, dict) else None
+            if pidx is not None:
+                pidx = int(pidx)
+                by_pair[pidx] = entry
+                if previous.get(pidx) != entry:
+                    changed.append(entry)
+        # Swap both references together so readers never see a mixed state
+        self.prices, self.by_pair, self.raw = prices, by_pair, raw
+        self.updated_at = time.monotonic()
+        if changed:
+            for listener in self._listeners:
+                try:
+                    listener(changed)
+                except Exception:
+                    # One failing consumer must not fail the refresh or starve the others
+                    logger.exception("⚠️ Price snapshot listener %r failed", listener)
+
+    async def refresh(self) -> None:
+        started_at = time.monotonic()
+        async with self._lock:
+            # Another caller refreshed while we were waiting for the lock
+            if self.updated_at is not None and self.updated_at >= started_at:
+                return
+            response = await get_breaker(PRICE_FEED).call(self._fetch)
+            self.update(response.json(), RawPayload.from_response(response))
+
+    async def _fetch(self) -> httpx.Response:
+        client = get_http_client(PRICE_FEED)
+        response = await client.get(LAST_PRICE_PATH)
+        response.raise_for_status()
+        return response
+
+    async def get(self) -> "PriceSnapshot":
+        if self.is_stale():
+            try:
+                await self.refresh()
+            except Exception as e:
+                # Keep serving the last good snapshot while the feed is down
+                if self.updated_at is None or not is_upstream_failure(e):
+                    raise
+                logger.warning("⚠️ Serving stale price snapshot (%.0fs old): %s", self.age, e)
+        return self
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("⚠️ Price snapshot refresh failed: %s", e)
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+price_snapshot = PriceSnapshot(
+    refresh_interval=settings.price_snapshot_refresh_interval,
+    max_staleness=settings.price_snapshot_max_staleness,
+)
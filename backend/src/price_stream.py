@@ -0,0 +1,102 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set
+
+from .config import settings
+from .price_snapshot import price_snapshot
+
+
+class PriceSubscription:
+    """One stream client's view of the price feed.
+
+    Updates are coalesced per pair: if the client falls behind, newer ticks
+    overwrite older unsent ones, so the buffer never holds more than one
+    entry per subscribed pair.
+    """
+
+    def __init__(self, pair_indices: Optional[Set[int]] = None):
+        self.pair_indices = pair_indices
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._event = asyncio.Event()
+
+    def wants(self, pair_index: int) -> bool:
+        return self.pair_indices is None or pair_index in self.pair_indices
+
+    def push(self, pair_index: int, entry: Dict[str, Any]) -> None:
+        self._pending[pair_index] = entry
+        self._event.set()
+
+    async def next_batch(self) -> List[Dict[str, Any]]:
+        """Wait for updates and return the latest entry of every changed pair."""
+        await self._event.wait()
+        self._event.clear()
+        batch, self._pending = self._pending, {}
+        return list(batch.values())
+
+
+class PriceBroadcaster:
+    """Fans out price snapshot changes to every stream subscriber."""
+
+    def __init__(self):
+        self._subscriptions: Set[PriceSubscription] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(self, pair_indices: Optional[Set[int]] = None) -> PriceSubscription:
+        subscription = PriceSubscription(pair_indices)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: PriceSubscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    def publish(self, entries: Iterable[Dict[str, Any]]) -> None:
+        if not self._subscriptions:
+            return
+        for entry in entries:
+            pidx = entry.get("pairIndex")
+            if pidx is None:
+                continue
+            pidx = int(pidx)
+            for subscription in self._subscriptions:
+                if subscription.wants(pidx):
+                    subscription.push(pidx, entry)
+
+
+def _sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def parse_pair_indices(pairs: Optional[str]) -> Optional[Set[int]]:
+    """Parse a comma-separated `pairs` query value; None subscribes to every pair."""
+    if not pairs:
+        return None
+    return {int(p) for p in pairs.split(",") if p.strip()}
+
+
+async def stream_prices(subscription: PriceSubscription) -> AsyncIterator[str]:
+    """Yield SSE frames: the current snapshot first, then coalesced updates."""
+    try:
+        initial = [
+            entry for pidx, entry in price_snapshot.by_pair.items()
+            if subscription.wants(pidx)
+        ]
+        yield _sse_event("snapshot", initial)
+        while True:
+            try:
+                batch = await asyncio.wait_for(
+                    subscription.next_batch(), timeout=settings.price_stream_keepalive
+                )
+            except asyncio.TimeoutError:
+                # Comment frame keeps idle connections open through proxies
+                yield ": keepalive\n\n"
+                continue
+            yield _sse_event("prices", batch)
+    finally:
+        price_broadcaster.unsubscribe(subscription)
+
+
+price_broadcaster = PriceBroadcaster()
+price_snapshot.add_listener(price_broadcaster.publish)
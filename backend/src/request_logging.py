@@ -0,0 +1,162 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, TextIO
+
+from .config import settings
+
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Set per request by RequestContextMiddleware; read by the log filter and
+# the upstream HTTP clients
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+log_sampled_var: ContextVar[bool] = ContextVar("log_sampled", default=True)
+
+_TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def get_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+def sample_rate(path: str) -> float:
+    """Share of requests to `path` whose INFO logs are kept (longest prefix wins)."""
+    best, rate = -1, 1.0
+    for prefix, prefix_rate in settings.log_sample_rates.items():
+        if path.startswith(prefix) and len(prefix) > best:
+            best, rate = len(prefix), prefix_rate
+    return rate
+
+
+class RequestContextFilter(logging.Filter):
+    """Tags records with the request ID and drops sub-WARNING records of
+    unsampled requests. Runs in the calling task, before anything is
+    formatted."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING and not log_sampled_var.get():
+            return False
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    # The stdlib handler formats the message before queueing it; the queue
+    # never leaves the process, so hand the record over as is and let the
+    # listener thread do all formatting
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(stream: Optional[TextIO] = None) -> None:
+    """Route all logging through a queue drained by a background thread."""
+    global _listener
+    stop_logging()
+
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter() if settings.log_format == "json" else logging.Formatter(_TEXT_FORMAT))
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(log_queue)
+    handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(settings.log_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+atexit.register(stop_logging)
+
+
+class RequestContextMiddleware:
+    """Pure ASGI middleware: request IDs, log sampling and one access line.
+
+    The request ID comes from the incoming X-Request-ID header (or is
+    generated), is echoed on the response and forwarded to upstream calls.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+        self.logger = logging.getLogger("backend.src.access")
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+                break
+        if not request_id:
+            request_id = uuid.uuid4().hex
+        path = scope["path"]
+        rate = sample_rate(path)
+        id_token = request_id_var.set(request_id)
+        sampled_token = log_sampled_var.set(rate >= 1.0 or (rate > 0.0 and random.random() < rate))
+
+        started = time.perf_counter()
+        status = 500  # if the app fails before starting a response
+
+        async def send_with_request_id(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        except Exception:
+            self.logger.error("❌ %s %s - Error", scope["method"], path, exc_info=True)
+            raise
+        else:
+            self.logger.log(
+                logging.WARNING if status >= 500 else logging.INFO,
+                "%s %s %s - Status: %d (%.1fms)",
+                "❌" if status >= 500 else "✅", scope["method"], path, status, (time.perf_counter() - started) * 1e3,
+            )
+        finally:
+            request_id_var.reset(id_token)
+            log_sampled_var.reset(sampled_token)
@@ -0,0 +1,242 @@
+import asyncio
+import inspect
+import itertools
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Set, Tuple
+
+from .config import settings
+from .deadline import detached
+from .metrics import record_cache
+from .rpc_pool import rpc_pool
+
+
+logger = logging.getLogger(__name__)
+
+# Results that cannot change on a given chain
+CHAIN_INVARIANT_METHODS = {"eth_chainId", "net_version"}
+
+# Read-only methods whose result holds for the current block. Value is the
+# position of the block parameter, if the method takes one: with an explicit
+# block number the result is final and is cached like a chain invariant.
+PER_BLOCK_METHODS: Dict[str, Optional[int]] = {
+    "eth_blockNumber": None,
+    "eth_gasPrice": None,
+    "eth_maxPriorityFeePerGas": None,
+    "eth_blobBaseFee": None,
+    "eth_feeHistory": 1,
+    "eth_call": 1,
+    "eth_estimateGas": 1,
+    "eth_getBalance": 1,
+    "eth_getTransactionCount": 1,
+    "eth_getCode": 1,
+    "eth_getStorageAt": 2,
+    "eth_getBlockByNumber": 0,
+}
+
+# Calls without side effects, which the pool may send to two endpoints
+READ_METHODS = CHAIN_INVARIANT_METHODS | set(PER_BLOCK_METHODS) | {
+    "eth_getBlockByHash",
+    "eth_getLogs",
+    "eth_getTransactionByHash",
+    "eth_getTransactionReceipt",
+}
+
+PERMANENT = "permanent"
+PER_BLOCK = "block"
+
+
+def cache_policy(method: str, params: Any) -> Optional[str]:
+    """PERMANENT, PER_BLOCK or None (not cacheable) for one call."""
+    if method in CHAIN_INVARIANT_METHODS:
+        return PERMANENT
+    if method not in PER_BLOCK_METHODS:
+        return None
+    position = PER_BLOCK_METHODS[method]
+    block = params[position] if position is not None and isinstance(params, (list, tuple)) and len(params) > position else "latest"
+    if block == "pending":
+        # Changes with the mempool, not with blocks
+        return None
+    if isinstance(block, int) or (isinstance(block, str) and block.startswith("0x")):
+        return PERMANENT
+    return PER_BLOCK
+
+
+def _json_default(value: Any) -> Any:
+    # web3 hands HexBytes (a bytes subclass) through in some params
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _cache_key(method: str, params: Any) -> Hashable:
+    return method, json.dumps(params, sort_keys=True, separators=(",", ":"), default=_json_default)
+
+
+class _Entry(NamedTuple):
+    result: Any
+    expires_at: float  # inf for permanent entries
+
+
+class JsonRpcClient:
+    """JSON-RPC to the RPC pool with caching, coalescing and batching.
+
+    `request` returns the JSON-RPC response object (with `result` or
+    `error`), which is what a web3 provider's `make_request` returns.
+    Successful results of cacheable calls are kept for good (chain
+    invariants and reads at an explicit block) or for one block time (reads
+    at the latest block). Identical cacheable calls in flight share one
+    upstream call, and calls issued within `batch_window` seconds of each
+    other are sent as one JSON-RPC batch.
+    """
+
+    def __init__(self, block_time: float, batch_window: float, max_batch_size: int, max_entries: int):
+        self.block_time = block_time
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._sending: Set[asyncio.Task] = set()
+        self._ids = itertools.count(1)
+
+    async def request(self, method: str, params: Any = None) -> Dict[str, Any]:
+        params = [] if params is None else params
+        policy = cache_policy(method, params)
+        if policy is None:
+            return await self._enqueue(method, params)
+
+        key = _cache_key(method, params)
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > time.monotonic():
+            self._entries.move_to_end(key)
+            record_cache("rpc", "hit")
+            return self._response(entry.result)
+
+        future = self._inflight.get(key)
+        if future is not None:
+            record_cache("rpc", "coalesced")
+            return await asyncio.shield(future)
+
+        record_cache("rpc", "miss")
+        future = asyncio.ensure_future(self._fetch(key, policy, method, params))
+        self._inflight[key] = future
+        future.add_done_callback(lambda f: self._release(key, f))
+        return await asyncio.shield(future)
+
+    async def make_request(self, method: str, params: Any) -> Dict[str, Any]:
+        """web3 provider `make_request` signature."""
+        return await self.request(method, params)
+
+    def _release(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    async def _fetch(self, key: Hashable, policy: str, method: str, params: Any) -> Dict[str, Any]:
+        response = await self._enqueue(method, params)
+        if "error" not in response and response.get("result") is not None:
+            expires_at = float("inf") if policy == PERMANENT else time.monotonic() + self.block_time
+            self._entries[key] = _Entry(response["result"], expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return response
+
+    def _response(self, result: Any) -> Dict[str, Any]:
+        return {"jsonrpc": "2.0", "id": next(self._ids), "result": result}
+
+    # --- batching ---
+
+    def _enqueue(self, method: str, params: Any) -> "asyncio.Future[Dict[str, Any]]":
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        payload = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+        self._pending.append((payload, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # A batch carries calls from many requests; none of their deadlines applies
+            task = asyncio.ensure_future(detached(self._send(batch)))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        # A single call goes out as a plain request, not a batch of one
+        body = [payload for payload, _ in batch] if len(batch) > 1 else batch[0][0]
+        read_only = all(payload["method"] in READ_METHODS for payload, _ in batch)
+        try:
+            decoded = await rpc_pool.post(
+                json.dumps(body, separators=(",", ":"), default=_json_default).encode(), read_only
+            )
+        except Exception as e:
+            logger.warning("⚠️ JSON-RPC request of %s call(s) failed: %s", len(batch), e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_id = {item.get("id"): item for item in (decoded if isinstance(decoded, list) else [decoded])}
+        for payload, future in batch:
+            if future.done():
+                continue
+            item = by_id.get(payload["id"])
+            if item is None:
+                item = {
+                    "jsonrpc": "2.0",
+                    "id": payload["id"],
+                    "error": {"code": -32603, "message": "No response for this call in the JSON-RPC batch"},
+                }
+            future.set_result(item)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._inflight.clear()
+
+
+rpc_client = JsonRpcClient(
+    block_time=settings.rpc_block_time,
+    batch_window=settings.rpc_batch_window,
+    max_batch_size=settings.rpc_batch_max_size,
+    max_entries=settings.rpc_cache_max_entries,
+)
+
+
+def install(trader_client: Any) -> int:
+    """Route the TraderClient's async web3 providers for `settings.provider_url`
+    through `rpc_client`; returns how many providers were switched.
+
+    The providers are found on the client's attributes rather than by name,
+    so this does not depend on how a given SDK version stores them. Only
+    async providers are switched: the SDK also keeps a sync `Web3` on the
+    same URL, whose callers cannot await `rpc_client`. web3 binds
+    `make_request` when it first builds its request pipeline, so this has
+    to run before the client makes any call.
+    """
+    installed = 0
+    for value in list(vars(trader_client).values()):
+        provider = getattr(value, "provider", None)
+        if (
+            provider is not None
+            and getattr(provider, "endpoint_uri", None) == settings.provider_url
+            and inspect.iscoroutinefunction(getattr(provider, "make_request", None))
+        ):
+            provider.make_request = rpc_client.make_request
+            installed += 1
+    if installed:
+        logger.info("🔌 Routed %s web3 provider(s) through the JSON-RPC cache", installed)
+    else:
+        logger.warning("⚠️ No web3 provider for the RPC URL found on the TraderClient; JSON-RPC cache not installed")
+    return installed
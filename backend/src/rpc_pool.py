@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+import httpx
+
+from .config import settings
+from .http_clients import RPC, get_http_client
+from .metrics import rpc_endpoint_error_rate, rpc_endpoint_latency, rpc_extra_requests
+
+
+logger = logging.getLogger(__name__)
+
+# Latency samples kept per endpoint for its p95
+_WINDOW = 64
+_MIN_SAMPLES = 8
+
+
+class RpcEndpoint:
+    """One JSON-RPC URL with its EWMA latency and error rate.
+
+    Endpoints are labelled by pool position; the URLs usually carry API keys.
+    """
+
+    def __init__(self, label: str, url: str, alpha: float):
+        self.label = label
+        self.url = url
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self.samples: Deque[float] = deque(maxlen=_WINDOW)
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def score(self) -> float:
+        # Unmeasured endpoints score 0 so each gets tried early on
+        return (self.latency or 0.0) * (1.0 + 4.0 * self.error_rate)
+
+    def p95(self) -> Optional[float]:
+        if len(self.samples) < _MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def record_latency(self, elapsed: float) -> None:
+        self.samples.append(elapsed)
+        self.latency = elapsed if self.latency is None else self.latency + self.alpha * (elapsed - self.latency)
+        rpc_endpoint_latency.set(self.label, value=self.latency)
+
+    def record_success(self, elapsed: float) -> None:
+        self.record_latency(elapsed)
+        self.failures = 0
+        self.error_rate *= 1.0 - self.alpha
+        rpc_endpoint_error_rate.set(self.label, value=self.error_rate)
+
+    def record_failure(self, elapsed: float, cooldown: float) -> None:
+        self.record_latency(elapsed)
+        self.failures += 1
+        self.error_rate += self.alpha * (1.0 - self.error_rate)
+        # Back off longer while it keeps failing
+        self.cooldown_until = time.monotonic() + cooldown * min(self.failures, 6)
+        rpc_endpoint_error_rate.set(self.label, value=self.error_rate)
+
+
+def _endpoint_failure(exc: BaseException) -> bool:
+    """True for errors that say the endpoint is unhealthy or limiting us."""
+    if isinstance(exc, httpx.TransportError):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status in (408, 429) or status >= 500
+    return False
+
+
+def _not_delivered(exc: BaseException) -> bool:
+    """True when the endpoint certainly did not act on the request."""
+    if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 429
+
+
+class RpcPool:
+    """Latency-aware routing over several JSON-RPC endpoints of one chain.
+
+    Each request goes to the healthy endpoint with the best score. Reads
+    that are still pending after that endpoint's p95 latency are hedged to
+    the next endpoint, and reads that fail are retried there at once; the
+    first answer wins and the other request is cancelled. Writes are only
+    retried elsewhere when the first endpoint cannot have received them.
+    """
+
+    def __init__(
+        self, urls: Sequence[str], alpha: float, hedge_min_delay: float, hedge_max_delay: float, cooldown: float
+    ):
+        self.endpoints = [RpcEndpoint(str(i), url, alpha) for i, url in enumerate(dict.fromkeys(urls))]
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self.cooldown = cooldown
+
+    def ranked(self) -> List[RpcEndpoint]:
+        now = time.monotonic()
+        healthy = sorted((e for e in self.endpoints if e.healthy(now)), key=RpcEndpoint.score)
+        # Cooling-down endpoints are still tried as a last resort
+        cooling = sorted((e for e in self.endpoints if not e.healthy(now)), key=lambda e: e.cooldown_until)
+        return healthy + cooling
+
+    def hedge_delay(self, endpoint: RpcEndpoint) -> float:
+        p95 = endpoint.p95()
+        if p95 is None:
+            return self.hedge_max_delay
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, p95))
+
+    async def _attempt(self, endpoint: RpcEndpoint, content: bytes) -> Any:
+        started = time.perf_counter()
+        try:
+            response = await get_http_client(RPC).post(
+                endpoint.url, content=content, headers={"Content-Type": "application/json"}
+            )
+            response.raise_for_status()
+            decoded = response.json()
+        except asyncio.CancelledError:
+            # Lost a hedge race: it was at least this slow
+            endpoint.record_latency(time.perf_counter() - started)
+            raise
+        except Exception as e:
+            if _endpoint_failure(e):
+                endpoint.record_failure(time.perf_counter() - started, self.cooldown)
+            else:
+                endpoint.record_latency(time.perf_counter() - started)
+            raise
+        endpoint.record_success(time.perf_counter() - started)
+        return decoded
+
+    async def post(self, content: bytes, read_only: bool) -> Any:
+        """Send one JSON-RPC body and return the decoded response."""
+        ranked = self.ranked()
+        first = ranked[0]
+        untried = iter(ranked)
+        running: Dict[asyncio.Future, RpcEndpoint] = {}
+        last_error: Optional[BaseException] = None
+        hedging = read_only
+
+        def launch(kind: str) -> bool:
+            endpoint = next(untried, None)
+            if endpoint is None:
+                return False
+            if endpoint is not first:
+                rpc_extra_requests.inc(kind)
+            running[asyncio.ensure_future(self._attempt(endpoint, content))] = endpoint
+            return True
+
+        launch("first")
+        try:
+            while running:
+                hedge_after = None
+                if hedging and len(running) == 1:
+                    hedge_after = self.hedge_delay(next(iter(running.values())))
+                done, _ = await asyncio.wait(running, timeout=hedge_after, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedging = launch("hedge")
+                    continue
+                for task in done:
+                    endpoint = running.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if endpoint is not first:
+                            rpc_extra_requests.inc("hedge_won" if first in running.values() else "failover_ok")
+                        return task.result()
+                    last_error = error
+                    logger.warning("⚠️ JSON-RPC endpoint %s failed: %s", endpoint.label, error)
+                if not running and (read_only or _not_delivered(last_error)):
+                    launch("failover")
+            raise last_error
+        finally:
+            for task in running:
+                task.cancel()
+
+
+rpc_pool = RpcPool(
+    [settings.provider_url, *settings.rpc_urls],
+    alpha=settings.rpc_ewma_alpha,
+    hedge_min_delay=settings.rpc_hedge_min_delay,
+    hedge_max_delay=settings.rpc_hedge_max_delay,
+    cooldown=settings.rpc_error_cooldown,
+)
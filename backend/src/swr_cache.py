@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Set
+
+from .circuit_breaker import CircuitBreaker, get_breaker, is_upstream_failure
+from .config import settings
+from .deadline import detached
+from .http_clients import HISTORY
+from .metrics import record_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResult(NamedTuple):
+    value: Any
+    age: float
+    status: str  # "HIT", "MISS" or "STALE"
+
+
+class _Entry(NamedTuple):
+    value: Any
+    fetched_at: float
+
+
+class SWRCache:
+    """Stale-while-revalidate cache in front of one upstream host.
+
+    Within `ttl` a value is served as is. Up to `stale_ttl` past that it is
+    served immediately while one background refresh runs. Older or missing
+    values are fetched inline; if that fetch fails because the upstream is
+    unhealthy (or its circuit is open), the last good value is served
+    regardless of age.
+    """
+
+    def __init__(self, breaker: CircuitBreaker, max_entries: int, name: str = "swr"):
+        self.breaker = breaker
+        self.max_entries = max_entries
+        self.name = name  # label for the cache metrics
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = _Entry(value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        future = self._inflight.get(key)
+        if future is None:
+            async def _run() -> Any:
+                try:
+                    value = await self.breaker.call(fetch)
+                    self._store(key, value)
+                    return value
+                finally:
+                    self._inflight.pop(key, None)
+
+            # Shared by every caller, so not bound to the first one's deadline
+            future = asyncio.ensure_future(detached(_run()))
+            self._inflight[key] = future
+        return future
+
+    def _revalidate(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> None:
+        if key in self._inflight:
+            return
+
+        async def _run() -> None:
+            try:
+                await self._fetch(key, fetch)
+            except Exception as e:
+                logger.warning("⚠️ Background refresh of %r failed: %s", key, e)
+
+        task = asyncio.ensure_future(_run())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def get(
+        self, key: Hashable, fetch: Callable[[], Awaitable[Any]], ttl: float, stale_ttl: float
+    ) -> CachedResult:
+        result = await self._get(key, fetch, ttl, stale_ttl)
+        record_cache(self.name, result.status)
+        return result
+
+    async def _get(
+        self, key: Hashable, fetch: Callable[[], Awaitable[Any]], ttl: float, stale_ttl: float
+    ) -> CachedResult:
+        entry: Optional[_Entry] = self._entries.get(key)
+        age = time.monotonic() - entry.fetched_at if entry is not None else 0.0
+        if entry is not None and age < ttl:
+            return CachedResult(entry.value, age, "HIT")
+        if entry is not None and age < ttl + stale_ttl:
+            self._revalidate(key, fetch)
+            return CachedResult(entry.value, age, "STALE")
+
+        try:
+            value = await asyncio.shield(self._fetch(key, fetch))
+        except Exception as e:
+            if entry is None or not is_upstream_failure(e):
+                raise
+            logger.warning("⚠️ Serving stale %r (%.0fs old): %s", key, age, e)
+            return CachedResult(entry.value, age, "STALE")
+        return CachedResult(value, 0.0, "MISS")
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._inflight.clear()
+
+
+history_api_cache = SWRCache(get_breaker(HISTORY), max_entries=settings.cache_max_entries, name="history_api")
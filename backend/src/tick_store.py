@@ -0,0 +1,450 @@
+"""Append-only on-disk store of price feed ticks, read through mmap.
+
+Ticks go into fixed-size segment files, each a small header followed by
+three fixed-width columns of `capacity` values: timestamp (float64 unix
+seconds), price (float64) and pair index (uint32). A segment is created
+at full size (sparse on most filesystems) and filled in time order, so its
+timestamp column is sorted and time ranges are a binary search. Readers get
+NumPy arrays over the mapped file itself; nothing is copied into the heap
+unless a query has to filter by pair or join several segments. Only the
+segment being written stays mapped; others are mapped for a query and
+unmapped once it (and any view it returned) is done.
+
+A new segment is started when the current one is full, older than
+`segment_seconds`, or the process restarts. When a segment is started,
+segments whose last tick is older than `retention` seconds are deleted,
+then the oldest ones until the store is within `max_bytes` and
+`max_segments` (sizes count full segment capacity, as allocated).
+
+A directory has one writer: the process holding an exclusive lock on its
+`writer.lock` file. Other processes sharing the directory (several
+workers fed the same prices) only read it, and retry the lock every
+`LOCK_RETRY_SECONDS` so one of them takes over when the writer exits.
+Only the writer deletes segments.
+"""
+import fcntl
+import itertools
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from .config import settings
+from .price_snapshot import price_snapshot
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"LTKS"
+VERSION = 1
+SUFFIX = ".ticks"
+# magic, version, capacity, count, last timestamp; padded to keep columns aligned
+_HEADER = struct.Struct("<4sIQQd")
+HEADER_SIZE = 64
+BYTES_PER_TICK = 8 + 8 + 4
+LOCK_NAME = "writer.lock"
+LOCK_RETRY_SECONDS = 60.0
+
+
+class TickStoreError(Exception):
+    """A segment file is not a tick segment of a supported version."""
+
+
+class Ticks(NamedTuple):
+    """Columns of a run of ticks, oldest first."""
+
+    t: np.ndarray
+    pair_index: np.ndarray
+    price: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    @classmethod
+    def empty(cls) -> "Ticks":
+        return cls(np.zeros(0), np.zeros(0, dtype=np.uint32), np.zeros(0))
+
+
+class SegmentInfo(NamedTuple):
+    """A segment's header, read without mapping the file."""
+
+    path: str
+    capacity: int
+    count: int
+    first_t: Optional[float]
+    last_t: float
+
+    @property
+    def nbytes(self) -> int:
+        return HEADER_SIZE + BYTES_PER_TICK * self.capacity
+
+
+def _between(ticks: Ticks, start: float, end: float) -> Ticks:
+    """Views of the ticks with start <= t < end (ticks sorted by time)."""
+    lo = int(np.searchsorted(ticks.t, start, side="left"))
+    hi = int(np.searchsorted(ticks.t, end, side="left"))
+    return Ticks(*(column[lo:hi] for column in ticks))
+
+
+class Segment:
+    """One memory-mapped segment file."""
+
+    def __init__(self, path: str, mm: mmap.mmap, capacity: int, writable: bool):
+        self.path = path
+        self.mm = mm
+        self.capacity = capacity
+        self.writable = writable
+        self._t = np.frombuffer(mm, dtype="<f8", count=capacity, offset=HEADER_SIZE)
+        self._price = np.frombuffer(mm, dtype="<f8", count=capacity, offset=HEADER_SIZE + 8 * capacity)
+        self._pair = np.frombuffer(mm, dtype="<u4", count=capacity, offset=HEADER_SIZE + 16 * capacity)
+
+    @classmethod
+    def create(cls, path: str, capacity: int) -> "Segment":
+        with open(path, "w+b") as f:
+            f.truncate(HEADER_SIZE + BYTES_PER_TICK * capacity)
+            mm = mmap.mmap(f.fileno(), 0)
+        _HEADER.pack_into(mm, 0, MAGIC, VERSION, capacity, 0, 0.0)
+        return cls(path, mm, capacity, writable=True)
+
+    @classmethod
+    def open(cls, path: str) -> "Segment":
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, capacity, _, _ = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION or len(mm) < HEADER_SIZE + BYTES_PER_TICK * capacity:
+            mm.close()
+            raise TickStoreError(f"{path} is not a version {VERSION} tick segment")
+        return cls(path, mm, capacity, writable=False)
+
+    @staticmethod
+    def read_info(path: str) -> SegmentInfo:
+        with open(path, "rb") as f:
+            head = f.read(HEADER_SIZE + 8)
+            size = os.fstat(f.fileno()).st_size
+        if len(head) < HEADER_SIZE + 8:
+            raise TickStoreError(f"{path} is not a version {VERSION} tick segment")
+        magic, version, capacity, count, last_t = _HEADER.unpack_from(head, 0)
+        if magic != MAGIC or version != VERSION or size < HEADER_SIZE + BYTES_PER_TICK * capacity:
+            raise TickStoreError(f"{path} is not a version {VERSION} tick segment")
+        first_t = struct.unpack_from("<d", head, HEADER_SIZE)[0] if count else None
+        return SegmentInfo(path, capacity, count, first_t, last_t)
+
+    @property
+    def count(self) -> int:
+        return _HEADER.unpack_from(self.mm, 0)[3]
+
+    @property
+    def last_t(self) -> float:
+        return _HEADER.unpack_from(self.mm, 0)[4]
+
+    @property
+    def first_t(self) -> Optional[float]:
+        return float(self._t[0]) if self.count else None
+
+    def append(self, t: np.ndarray, pair_index: np.ndarray, price: np.ndarray) -> None:
+        start = self.count
+        end = start + len(t)
+        self._t[start:end] = t
+        self._price[start:end] = price
+        self._pair[start:end] = pair_index
+        # Count last, so a reader never sees unwritten rows
+        _HEADER.pack_into(self.mm, 0, MAGIC, VERSION, self.capacity, end, float(t[-1]))
+
+    def ticks(self, start: Optional[float] = None, end: Optional[float] = None) -> Ticks:
+        """Zero-copy views of the ticks with start <= t < end."""
+        count = self.count
+        t = self._t[:count]
+        lo = 0 if start is None else int(np.searchsorted(t, start, side="left"))
+        hi = count if end is None else int(np.searchsorted(t, end, side="left"))
+        return Ticks(t[lo:hi], self._pair[lo:hi], self._price[lo:hi])
+
+    def close(self) -> None:
+        del self._t, self._price, self._pair
+        if self.writable:
+            self.mm.flush()
+        try:
+            self.mm.close()
+        except BufferError:
+            # A reader still holds a view; the map goes when that does
+            pass
+
+
+class TickStore:
+    """Segments in one directory, with the newest one open for appends by its writer."""
+
+    def __init__(
+        self,
+        path: str,
+        segment_capacity: int,
+        segment_seconds: float,
+        retention: float,
+        max_bytes: Optional[int] = None,
+        max_segments: Optional[int] = None,
+    ):
+        self.path = path
+        self.segment_capacity = segment_capacity
+        self.segment_seconds = segment_seconds
+        self.retention = retention
+        self.max_bytes = max_bytes
+        self.max_segments = max_segments
+        self._active: Optional[Segment] = None
+        self._active_started = 0.0
+        self._sequence = itertools.count()
+        self._lock_fd: Optional[int] = None
+        self._lock_retry_at = 0.0
+        self.late_ticks = 0
+        # Dropped while another process holds the writer lock
+        self.unwritten_ticks = 0
+
+    def open(self, path: str) -> None:
+        """Switch to another directory (closing the current segments)."""
+        self.close()
+        self.path = path
+
+    def close(self) -> None:
+        if self._active is not None:
+            self._active.close()
+        self._active = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # releases the writer lock
+            self._lock_fd = None
+        self._lock_retry_at = 0.0
+
+    def _lock(self, now: float) -> bool:
+        """Take the directory's writer lock; False while another process holds it."""
+        if self._lock_fd is not None:
+            return True
+        if now < self._lock_retry_at:
+            return False
+        os.makedirs(self.path, exist_ok=True)
+        fd = os.open(os.path.join(self.path, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            if not self._lock_retry_at:
+                logger.info("🔒 Tick store %s has another writer, not storing ticks", self.path)
+            self._lock_retry_at = now + LOCK_RETRY_SECONDS
+            return False
+        self._lock_fd = fd
+        logger.info("🔓 Writing ticks to %s", self.path)
+        return True
+
+    def _paths(self) -> List[str]:
+        if not os.path.isdir(self.path):
+            return []
+        # Names start with the zero-padded first tick time, so this is time order
+        return sorted(os.path.join(self.path, n) for n in os.listdir(self.path) if n.endswith(SUFFIX))
+
+    def segments(self) -> List[SegmentInfo]:
+        """Headers of all readable segments, oldest first."""
+        segments = []
+        for path in self._paths():
+            try:
+                segments.append(Segment.read_info(path))
+            except (OSError, ValueError, TickStoreError) as e:
+                logger.warning("⚠️ Skipping unreadable tick segment %s: %s", path, e)
+        return segments
+
+    def _map(self, info: SegmentInfo) -> Segment:
+        if self._active is not None and self._active.path == info.path:
+            return self._active
+        return Segment.open(info.path)
+
+    def _unmap(self, segment: Segment) -> None:
+        if segment is not self._active:
+            # Views still held by a caller keep the map alive until they go
+            segment.close()
+
+    def _start_segment(self, first_t: float) -> Segment:
+        if self._active is not None:
+            self._active.mm.flush()
+            self._active = None
+        # pid keeps the names of successive writers apart, the sequence those
+        # of segments started at the same instant
+        name = f"{int(first_t * 1000):015d}-{os.getpid()}-{next(self._sequence):06d}{SUFFIX}"
+        path = os.path.join(self.path, name)
+        self._active = Segment.create(path, self.segment_capacity)
+        self._active_started = first_t
+        logger.info("🗃️ Started tick segment %s", name)
+        # After creating, so the limits also hold with the new segment
+        self.enforce_retention(first_t)
+        return self._active
+
+    def append(self, timestamp: float, pair_indices: Any, prices: Any) -> None:
+        """Store one tick per pair, all at `timestamp`."""
+        pair_indices = np.asarray(pair_indices, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        valid = (pair_indices >= 0) & np.isfinite(prices)
+        pair_indices, prices = pair_indices[valid].astype(np.uint32), prices[valid]
+        if not self._lock(timestamp):
+            self.unwritten_ticks += len(prices)
+            return
+        active = self._active
+        if active is not None and timestamp < active.last_t:
+            # Keep each segment sorted by time
+            self.late_ticks += len(prices)
+            return
+        written = 0
+        while written < len(prices):
+            if (
+                active is None
+                or active.count >= active.capacity
+                or timestamp - self._active_started >= self.segment_seconds
+            ):
+                active = self._start_segment(timestamp)
+            n = min(len(prices) - written, active.capacity - active.count)
+            active.append(
+                np.full(n, timestamp), pair_indices[written:written + n], prices[written:written + n]
+            )
+            written += n
+
+    def on_prices(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """price_snapshot listener: stores the changed feed entries as ticks."""
+        pair_indices, prices = [], []
+        for entry in entries:
+            try:
+                pidx, price = int(entry["pairIndex"]), float(entry["c"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            pair_indices.append(pidx)
+            prices.append(price)
+        if not pair_indices:
+            return
+        try:
+            self.append(time.time(), pair_indices, prices)
+        except OSError as e:
+            logger.warning("⚠️ Failed to store %s ticks: %s", len(prices), e)
+
+    def _overlapping(self, start: Optional[float], end: Optional[float]) -> List[SegmentInfo]:
+        return [
+            info for info in self.segments()
+            if info.count
+            and (end is None or info.first_t < end)
+            and (start is None or info.last_t >= start)
+        ]
+
+    def iter_ticks(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Ticks]:
+        """Zero-copy tick views per segment with start <= t < end, oldest segment first."""
+        for info in self._overlapping(start, end):
+            try:
+                segment = self._map(info)
+            except (OSError, ValueError, TickStoreError) as e:
+                logger.warning("⚠️ Skipping unreadable tick segment %s: %s", info.path, e)
+                continue
+            try:
+                ticks = segment.ticks(start, end)
+                if len(ticks):
+                    yield ticks
+            finally:
+                self._unmap(segment)
+
+    def iter_merged(self, start: Optional[float], end: Optional[float], step: float) -> Iterator[Ticks]:
+        """Ticks with start <= t < end in time order across all segments.
+
+        Segments of successive writers (a worker taking over the writer lock
+        while the previous one's last segment is still open in time) can
+        overlap; their ticks are merged `step` seconds at a time (a copy per
+        slice). Segments that follow one another are yielded as views.
+        """
+        segments: List[Segment] = []
+        try:
+            for info in self._overlapping(start, end):
+                try:
+                    segments.append(self._map(info))
+                except (OSError, ValueError, TickStoreError) as e:
+                    logger.warning("⚠️ Skipping unreadable tick segment %s: %s", info.path, e)
+            views = [ticks for ticks in (segment.ticks(start, end) for segment in segments) if len(ticks)]
+            if all(a.t[-1] <= b.t[0] for a, b in zip(views, views[1:])):
+                yield from views
+                return
+            lo = min(float(ticks.t[0]) for ticks in views)
+            last = max(float(ticks.t[-1]) for ticks in views)
+            while lo <= last:
+                parts = [ticks for ticks in (_between(view, lo, lo + step) for view in views) if len(ticks)]
+                if len(parts) == 1:
+                    yield parts[0]
+                elif parts:
+                    merged = Ticks(*(np.concatenate(columns) for columns in zip(*parts)))
+                    order = np.argsort(merged.t, kind="stable")
+                    yield Ticks(*(column[order] for column in merged))
+                lo += step
+        finally:
+            for segment in segments:
+                self._unmap(segment)
+
+    def range(
+        self, start: Optional[float] = None, end: Optional[float] = None, pair_index: Optional[int] = None
+    ) -> Ticks:
+        """Ticks with start <= t < end, for one pair or all, in time order.
+
+        A view into the file when one segment covers the range and no pair
+        is given; otherwise the matching ticks are copied out.
+        """
+        chunks = []
+        for ticks in self.iter_ticks(start, end):
+            if pair_index is not None:
+                ticks = Ticks(*(column[ticks.pair_index == pair_index] for column in ticks))
+            chunks.append(ticks)
+        if not chunks:
+            return Ticks.empty()
+        if len(chunks) == 1:
+            return chunks[0]
+        ticks = Ticks(*(np.concatenate(columns) for columns in zip(*chunks)))
+        if (np.diff(ticks.t) < 0).any():
+            # Segments of successive writers overlap in time
+            order = np.argsort(ticks.t, kind="stable")
+            ticks = Ticks(*(column[order] for column in ticks))
+        return ticks
+
+    def enforce_retention(self, now: float) -> int:
+        """Delete segments past the retention, then the oldest past the size
+        limits (never the active one); returns how many. Only the writer does."""
+        if self._lock_fd is None:
+            return 0
+        segments = self.segments()
+        kept_bytes = sum(info.nbytes for info in segments)
+        kept_segments = len(segments)
+        active = self._active.path if self._active is not None else None
+        removed = 0
+        for info in segments:  # oldest first
+            over_limits = (self.max_bytes is not None and kept_bytes > self.max_bytes) or (
+                self.max_segments is not None and kept_segments > self.max_segments
+            )
+            if info.path == active or (not over_limits and info.last_t >= now - self.retention):
+                continue
+            try:
+                os.remove(info.path)
+            except OSError as e:
+                logger.warning("⚠️ Failed to delete expired tick segment %s: %s", info.path, e)
+                continue
+            removed += 1
+            kept_bytes -= info.nbytes
+            kept_segments -= 1
+        if removed:
+            logger.info("🧹 Deleted %s expired tick segment(s)", removed)
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        segments = self.segments()
+        return {
+            "segments": len(segments),
+            "ticks": sum(s.count for s in segments),
+            "bytes": sum(info.nbytes for info in segments),
+        }
+
+
+tick_store = TickStore(
+    settings.tick_store_path,
+    segment_capacity=settings.tick_segment_capacity,
+    segment_seconds=settings.tick_segment_seconds,
+    retention=settings.tick_retention_days * 86400,
+    max_bytes=settings.tick_store_max_bytes,
+    max_segments=settings.tick_store_max_segments,
+)
+if settings.tick_store_enabled:
+    price_snapshot.add_listener(tick_store.on_prices)
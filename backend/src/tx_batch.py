@@ -0,0 +1,69 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, TypeVar
+
+from fastapi import HTTPException
+
+from .deadline import detached
+from .models import BatchTxResult, BuildTxResponse
+from .pair_search import pair_search
+
+
+T = TypeVar("T")
+
+
+class TxBuildContext:
+    """Lookups shared by the tx builders of one request or batch.
+
+    Pair names are looked up leniently ("ETH/USD", "eth-usd", "ETHUSD",
+    "ETH") in the pair search index first (over the pair metadata loaded
+    from the pairs snapshot or the SDK). Misses fall back to the SDK and are
+    memoized per context, so a batch resolves each distinct pair name once
+    no matter how many items reference it.
+    """
+
+    def __init__(self, trader_client: Any):
+        self.trader_client = trader_client
+        self._pair_indices: Dict[str, asyncio.Future] = {}
+
+    async def resolve_pair_index(self, pair: Optional[str], pair_index: Optional[int]) -> int:
+        if pair_index is not None:
+            return pair_index
+        if not pair:
+            raise HTTPException(status_code=400, detail="Provide either pair or pair_index")
+        known = pair_search.matches(pair)
+        if len(known) == 1:
+            return known[0]
+        if known:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Pair name {pair!r} matches several pairs {known}; use pair_index",
+            )
+        future = self._pair_indices.get(pair)
+        if future is None:
+            future = asyncio.ensure_future(detached(self.trader_client.pairs_cache.get_pair_index(pair)))
+            self._pair_indices[pair] = future
+        return await asyncio.shield(future)
+
+
+async def run_batch(
+    items: Sequence[T],
+    build: Callable[[T], Awaitable[BuildTxResponse]],
+    concurrency: int,
+) -> List[BatchTxResult]:
+    """Build every item concurrently (at most `concurrency` at a time).
+
+    Results are returned in input order; a failing item yields an error
+    result instead of failing the whole batch.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _run(item: T) -> BatchTxResult:
+        async with semaphore:
+            try:
+                return BatchTxResult(ok=True, tx=await build(item))
+            except HTTPException as e:
+                return BatchTxResult(ok=False, status_code=e.status_code, error=str(e.detail))
+            except Exception as e:
+                return BatchTxResult(ok=False, status_code=400, error=str(e))
+
+    return list(await asyncio.gather(*(_run(item) for item in items)))
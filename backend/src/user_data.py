@@ -0,0 +1,155 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from .circuit_breaker import get_breaker, is_upstream_failure
+from .config import settings
+from .deadline import detached
+from .http_clients import CORE, get_http_client
+from .metrics import record_cache
+from .passthrough import RawPayload
+
+try:
+    # Ships with web3, which the Avantis SDK depends on
+    from eth_utils import to_checksum_address
+except ImportError:  # pragma: no cover
+    to_checksum_address = None
+
+
+def normalize_address(address: str) -> str:
+    """Cache key for a trader address: checksummed when possible."""
+    if to_checksum_address is not None:
+        try:
+            return to_checksum_address(address)
+        except ValueError:
+            pass
+    return address.lower()
+
+
+class UserData:
+    """core.avantisfi.com user-data payload plus a (pairIndex, index) position lookup.
+
+    `raw` keeps the upstream body so /trades can send it on unchanged.
+    """
+
+    def __init__(self, data: Dict[str, Any], raw: Optional[RawPayload] = None):
+        self.data = data
+        self.raw = raw
+        self.fetched_at = time.monotonic()
+        self.positions_by_key: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        for pos in data.get("positions", []) or []:
+            try:
+                key = (int(pos.get("pairIndex")), int(pos.get("index")))
+            except (TypeError, ValueError):
+                continue
+            self.positions_by_key[key] = pos
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+    def position(self, pair_index: int, trade_index: int) -> Optional[Dict[str, Any]]:
+        return self.positions_by_key.get((pair_index, trade_index))
+
+
+class UserDataCache:
+    """Short-TTL per-trader cache with single-flight upstream fetches.
+
+    Concurrent misses for the same trader share one in-flight request.
+    Entries are kept `stale_ttl` past the TTL as a fallback while core is
+    failing; at most `max_entries` traders are kept, least recently used
+    evicted first.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, UserData]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def _store(self, key: str, user_data: UserData) -> None:
+        # Oldest first (roughly), so stop at the first entry still usable
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if oldest.age < self.ttl + self.stale_ttl:
+                break
+            self._entries.popitem(last=False)
+        self._entries[key] = user_data
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _fetch(self, key: str, address: str) -> UserData:
+        async def _get() -> httpx.Response:
+            client = get_http_client(CORE)
+            response = await client.get("/user-data", params={"trader": address})
+            response.raise_for_status()
+            return response
+
+        response = await get_breaker(CORE).call(_get)
+        user_data = UserData(response.json(), RawPayload.from_response(response))
+        # Skip storing if the entry was invalidated while we were fetching
+        if self._inflight.get(key) is asyncio.current_task():
+            self._store(key, user_data)
+        return user_data
+
+    async def get(self, address: str, allow_stale: bool = False) -> UserData:
+        """Return user data for a trader.
+
+        With `allow_stale`, an expired entry is returned instead of raising
+        when core.avantisfi.com is failing (read-only views only; tx building
+        needs current positions).
+        """
+        user_data, _ = await self.lookup(address, allow_stale)
+        return user_data
+
+    async def lookup(self, address: str, allow_stale: bool = False) -> Tuple[UserData, str]:
+        """`get`, plus how it was served: "HIT", "MISS" (fetched for this call) or "STALE"."""
+        key = normalize_address(address)
+        cached = self._entries.get(key)
+        if cached is not None and cached.age < self.ttl:
+            self._entries.move_to_end(key)
+            record_cache("user_data", "hit")
+            return cached, "HIT"
+        if cached is not None and cached.age >= self.ttl + self.stale_ttl:
+            cached = None
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(detached(self._fetch(key, address)))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._release(key, t))
+        try:
+            # Shield so one cancelled caller does not cancel the shared fetch
+            user_data = await asyncio.shield(task)
+        except Exception as e:
+            if allow_stale and cached is not None and is_upstream_failure(e):
+                record_cache("user_data", "stale")
+                return cached, "STALE"
+            raise
+        record_cache("user_data", "miss")
+        return user_data, "MISS"
+
+    def _release(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def invalidate(self, address: str) -> None:
+        key = normalize_address(address)
+        self._entries.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._inflight.clear()
+
+
+user_data_cache = UserDataCache(
+    ttl=settings.user_data_cache_ttl,
+    stale_ttl=settings.user_data_stale_ttl,
+    max_entries=settings.user_data_cache_max_entries,
+)
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+from importlib import import_module
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .avantis_client import get_trader_client
+from .pair_metadata import pair_metadata
+from .pairs_payload import pairs_payload
+
+
+logger = logging.getLogger(__name__)
+
+# Imported by the tx builders on their first call
+SDK_MODULES = ("avantis_trader_sdk.types",)
+
+
+class Warmup:
+    """Startup warm-up of the SDK client and pairs data, with per-phase timings.
+
+    Phases run in order in a background task so the server accepts
+    connections (and answers /health) right away; /ready reports ready once
+    every phase has finished.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.finished_at is not None and self.error is None
+
+    async def _phase(self, name: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        result = await fn()
+        self.phases[name] = time.perf_counter() - started
+        logger.info("🔥 Warm-up phase '%s' took %.0fms", name, self.phases[name] * 1e3)
+        return result
+
+    async def run(self) -> None:
+        self.phases, self.error, self.finished_at = {}, None, None
+        self.started_at = time.perf_counter()
+        try:
+            # TraderClient construction and module imports are blocking
+            await self._phase("trader_client", lambda: asyncio.to_thread(get_trader_client))
+            await self._phase(
+                "sdk_types", lambda: asyncio.to_thread(lambda: [import_module(m) for m in SDK_MODULES])
+            )
+            pairs_info = await self._phase("pairs_info", pair_metadata.load_live)
+
+            async def _encode() -> None:
+                pairs_payload.sync(pairs_info, pair_metadata.version)
+
+            await self._phase("pairs_payload", _encode)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            logger.error("❌ Warm-up failed: %s", self.error, exc_info=True)
+        finally:
+            self.finished_at = time.perf_counter()
+        if self.ready:
+            logger.info("✅ Warm-up finished in %.0fms", (self.finished_at - self.started_at) * 1e3)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def status(self) -> Dict[str, Any]:
+        if self.ready:
+            state = "ready"
+        elif self.error is not None:
+            state = "failed"
+        else:
+            state = "warming_up"
+        status: Dict[str, Any] = {
+            "status": state,
+            "phases_ms": {name: round(seconds * 1e3, 1) for name, seconds in self.phases.items()},
+        }
+        if self.started_at is not None:
+            end = self.finished_at if self.finished_at is not None else time.perf_counter()
+            status["total_ms"] = round((end - self.started_at) * 1e3, 1)
+        if self.error is not None:
+            status["error"] = self.error
+        return status
+
+
+warmup = Warmup()
@@ -0,0 +1,91 @@
+"""
+Candle aggregation benchmark
+
+Feeds simulated price-feed updates (every pair ticks once per update, one
+update per `--interval` seconds of feed time) through candles.CandleStore
+at all five resolutions, and compares with a per-pair, per-resolution
+pure-Python aggregation over dicts. Reports ticks/s on one core, the
+latency of /api/candles range queries and buffer memory.
+
+    python -m tests.backend.benchmarks.bench_candles [--pairs 100] [--updates 20000] [--interval 0.5]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from backend.src.candles import RESOLUTIONS, CandleStore
+
+
+def scalar_ingest(candles, timestamp, pair_indices, prices):
+    # Per-pair dict updates, as a straightforward aggregator would do it
+    for resolution, seconds in RESOLUTIONS.items():
+        bucket = int(timestamp) // seconds * seconds
+        for pidx, price in zip(pair_indices, prices):
+            series = candles.setdefault((pidx, resolution), [])
+            if series and series[-1][0] == bucket:
+                candle = series[-1]
+                candle[2] = max(candle[2], price)
+                candle[3] = min(candle[3], price)
+                candle[4] = price
+                candle[5] += 1
+            else:
+                series.append([bucket, price, price, price, price, 1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=100)
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--interval", type=float, default=0.5, help="feed seconds between updates")
+    parser.add_argument("--capacity", type=int, default=1440)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    pair_indices = np.arange(args.pairs)
+    prices = rng.uniform(1, 90000, size=args.pairs)
+    paths = prices * np.exp(np.cumsum(rng.normal(0, 1e-4, size=(args.updates, args.pairs)), axis=0))
+    timestamps = 1_700_000_000 + np.arange(args.updates) * args.interval
+    ticks = args.updates * args.pairs
+
+    store = CandleStore(list(RESOLUTIONS), capacity=args.capacity, max_pairs=max(args.pairs, 1))
+    started = time.perf_counter()
+    for timestamp, row in zip(timestamps.tolist(), paths):
+        store.ingest(timestamp, pair_indices, row)
+    vectorized = time.perf_counter() - started
+
+    scalar_updates = min(args.updates, 2000)
+    candles = {}
+    index_list = pair_indices.tolist()
+    started = time.perf_counter()
+    for timestamp, row in zip(timestamps[:scalar_updates].tolist(), paths[:scalar_updates]):
+        scalar_ingest(candles, timestamp, index_list, row.tolist())
+    scalar = (time.perf_counter() - started) * args.updates / scalar_updates
+
+    print(f"{args.updates} updates x {args.pairs} pairs = {ticks} ticks, {len(RESOLUTIONS)} resolutions")
+    print(f"{'variant':<11} {'seconds':>8} {'ticks/s':>12} {'updates/s':>10}")
+    for name, elapsed in (("vectorized", vectorized), ("scalar", scalar)):
+        print(f"{name:<11} {elapsed:>8.2f} {ticks / elapsed:>12,.0f} {args.updates / elapsed:>10,.0f}")
+    print(f"speedup: {scalar / vectorized:.1f}x")
+
+    query_times = []
+    for i in range(1000):
+        pidx = i % args.pairs
+        started = time.perf_counter()
+        store.candles(pidx, "1m", int(timestamps[-1]) - 3600 * 6, None)
+        query_times.append(time.perf_counter() - started)
+    query_times.sort()
+    print(f"range query (6h of 1m): p50 {query_times[500] * 1e6:.0f} us, p99 {query_times[990] * 1e6:.0f} us")
+
+    total = 0
+    for resolution, memory in store.memory().items():
+        total += memory["bytes"]
+        print(
+            f"{resolution:>4}: {memory['candles']:>5} candles, {memory['bytesPerPair'] / 1024:.1f} KiB per pair, "
+            f"{memory['bytes'] / 2**20:.1f} MiB"
+        )
+    print(f"total: {total / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
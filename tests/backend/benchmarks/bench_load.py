@@ -0,0 +1,385 @@
+"""
+Load test against local upstream stand-ins
+
+Drives the FastAPI app in-process (ASGI, no sockets) with a closed-loop
+request mix while core.avantisfi.com, api.avantisfi.com, feed-v3 and the
+SDK TraderClient are replaced by the stand-ins in standins.py, with
+configurable latency and jitter. Reports requests, errors, throughput and
+p50/p95/p99 latency per endpoint, plus upstream calls per request.
+
+Mixes:
+
+- prices: polling all prices, single-pair prices and /pairs
+- portfolio: loading a portfolio (overview, PnL, win rate, trades, history)
+- trading: building close/cancel/TP-SL txs (and open when the SDK is
+  installed, since that route imports its types) around /trades and /pairs
+- mixed: 60% prices, 30% portfolio, 10% trading
+
+Results can be written as a JSON baseline and later runs compared to it;
+the comparison exits non-zero when an endpoint's p95 or throughput is worse
+than the baseline by more than the tolerance. Baselines are only comparable
+on the same machine with the same options.
+
+    python -m tests.backend.benchmarks.bench_load [--mix mixed] [--requests 2000]
+        [--concurrency 32] [--latency-ms 20] [--jitter-ms 10] [--sdk-latency-ms 80]
+        [--save baseline.json] [--compare baseline.json] [--tolerance 0.15] [--min-delta-ms 1]
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+
+from backend.src import metrics
+from backend.src.circuit_breaker import reset_breakers
+from backend.src.history_store import history_store
+from backend.src.index import app
+from backend.src.pair_metadata import pair_metadata
+from backend.src.pairs_payload import pairs_payload
+from backend.src.price_snapshot import price_snapshot
+from backend.src.request_logging import setup_logging, stop_logging
+from backend.src.swr_cache import history_api_cache
+from backend.src.user_data import user_data_cache
+
+from .standins import FakeTraderClient, UpstreamStandIns, installed, pair_name
+
+
+BASELINE_FORMAT = 1
+
+
+class Call(NamedTuple):
+    endpoint: str  # route template, the key results are reported under
+    method: str
+    url: str
+    body: Optional[Dict[str, Any]] = None
+
+
+class Scenario:
+    """Random request generator over a pool of trader addresses."""
+
+    def __init__(self, upstreams: UpstreamStandIns, n_traders: int, rng: random.Random):
+        self.upstreams = upstreams
+        self.rng = rng
+        self.traders = [f"0x{rng.getrandbits(160):040x}" for _ in range(n_traders)]
+
+    def trader(self) -> str:
+        return self.rng.choice(self.traders)
+
+    def position(self) -> Tuple[str, Dict[str, Any]]:
+        address = self.trader()
+        return address, self.rng.choice(self.upstreams.positions(address))
+
+    # --- prices ---
+
+    def last_prices(self) -> Call:
+        return Call("GET /api/price-feeds/last-price", "GET", "/api/price-feeds/last-price")
+
+    def last_price(self) -> Call:
+        pidx = self.rng.randrange(self.upstreams.n_pairs)
+        return Call("GET /api/price-feeds/last-price/{pair_index}", "GET", f"/api/price-feeds/last-price/{pidx}")
+
+    def pairs(self) -> Call:
+        return Call("GET /pairs", "GET", "/pairs")
+
+    # --- portfolio ---
+
+    def overview(self) -> Call:
+        return Call("GET /api/portfolio/overview/{address}", "GET", f"/api/portfolio/overview/{self.trader()}")
+
+    def profit_loss(self) -> Call:
+        return Call("GET /api/portfolio/profit-loss/{address}", "GET", f"/api/portfolio/profit-loss/{self.trader()}")
+
+    def win_rate(self) -> Call:
+        return Call("GET /api/portfolio/win-rate/{address}", "GET", f"/api/portfolio/win-rate/{self.trader()}")
+
+    def trades(self) -> Call:
+        return Call("GET /trades", "GET", f"/trades?trader_address={self.trader()}")
+
+    def top_trades(self) -> Call:
+        return Call("GET /api/portfolio/top-trades/{address}", "GET", f"/api/portfolio/top-trades/{self.trader()}")
+
+    def history(self) -> Call:
+        page = self.rng.randint(1, 3)
+        return Call(
+            "GET /api/portfolio/history/{address}/{page_number}", "GET",
+            f"/api/portfolio/history/{self.trader()}/{page}",
+        )
+
+    def pnl(self) -> Call:
+        return Call("GET /api/portfolio/pnl/{address}", "GET", f"/api/portfolio/pnl/{self.trader()}")
+
+    # --- trading ---
+
+    def open_trade(self) -> Call:
+        return Call("POST /trades/open", "POST", "/trades/open", {
+            "trader_address": self.trader(),
+            "pair": pair_name(self.rng.randrange(8)),
+            "collateral_in_trade": self.rng.randint(10, 500),
+            "is_long": self.rng.random() < 0.5,
+            "leverage": self.rng.choice([5, 10, 25]),
+        })
+
+    def close_trade(self) -> Call:
+        address, position = self.position()
+        return Call("POST /trades/close", "POST", "/trades/close", {
+            "trader_address": address,
+            "pair_index": position["pairIndex"],
+            "index": position["index"],
+            "close_percent": self.rng.choice([25, 50, 100]),
+        })
+
+    def cancel_order(self) -> Call:
+        address, position = self.position()
+        return Call("POST /orders/cancel", "POST", "/orders/cancel", {
+            "trader_address": address, "pair_index": position["pairIndex"], "trade_index": position["index"],
+        })
+
+    def update_tp_sl(self) -> Call:
+        address, position = self.position()
+        return Call("POST /trades/tp-sl", "POST", "/trades/tp-sl", {
+            "trader_address": address,
+            "pair_index": position["pairIndex"],
+            "trade_index": position["index"],
+            "tp": position["openPrice"] * 1.1,
+            "sl": position["openPrice"] * 0.9,
+        })
+
+
+Mix = List[Tuple[float, Callable[[Scenario], Call]]]
+
+
+def _trading_mix() -> Mix:
+    mix: Mix = [
+        (30, Scenario.close_trade),
+        (20, Scenario.cancel_order),
+        (20, Scenario.update_tp_sl),
+        (20, Scenario.trades),
+        (10, Scenario.pairs),
+    ]
+    if importlib.util.find_spec("avantis_trader_sdk") is not None:
+        mix.append((30, Scenario.open_trade))
+    return mix
+
+
+def _scaled(mix: Mix, share: float) -> Mix:
+    total = sum(weight for weight, _ in mix)
+    return [(weight / total * share, call) for weight, call in mix]
+
+
+MIXES: Dict[str, Callable[[], Mix]] = {
+    "prices": lambda: [
+        (70, Scenario.last_prices),
+        (25, Scenario.last_price),
+        (5, Scenario.pairs),
+    ],
+    "portfolio": lambda: [
+        (30, Scenario.overview),
+        (15, Scenario.profit_loss),
+        (15, Scenario.win_rate),
+        (15, Scenario.trades),
+        (10, Scenario.top_trades),
+        (5, Scenario.history),
+        (10, Scenario.pnl),
+    ],
+    "trading": _trading_mix,
+}
+MIXES["mixed"] = lambda: (
+    _scaled(MIXES["prices"](), 60) + _scaled(MIXES["portfolio"](), 30) + _scaled(MIXES["trading"](), 10)
+)
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(q / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples: List[Tuple[float, bool]], elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(latency for latency, _ in samples)
+    return {
+        "requests": len(samples),
+        "errors": sum(not ok for _, ok in samples),
+        "rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1e3, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1e3, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1e3, 2),
+    }
+
+
+def _reset_state(db_dir: str) -> None:
+    user_data_cache.clear()
+    history_api_cache.clear()
+    reset_breakers()
+    pair_metadata.__init__()
+    pairs_payload.__init__()
+    price_snapshot.__init__(price_snapshot.refresh_interval, price_snapshot.max_staleness)
+    history_store.open(os.path.join(db_dir, "history.sqlite3"))
+    metrics.reset()
+
+
+async def run_load(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    upstreams = UpstreamStandIns(args.latency_ms, args.jitter_ms, seed=args.seed)
+    trader_client = FakeTraderClient(args.sdk_latency_ms, args.sdk_jitter_ms, seed=args.seed)
+    scenario = Scenario(upstreams, args.traders, rng)
+    mix = MIXES[args.mix]()
+    weights = [weight for weight, _ in mix]
+    calls = [call for _, call in mix]
+
+    _reset_state(tempfile.mkdtemp())
+    samples: Dict[str, List[Tuple[float, bool]]] = {}
+
+    async with installed(upstreams, trader_client):
+        price_snapshot.start()  # as the app lifespan does
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+
+            async def one(record: bool) -> None:
+                call = rng.choices(calls, weights)[0](scenario)
+                started = time.perf_counter()
+                response = await client.request(call.method, call.url, json=call.body)
+                latency = time.perf_counter() - started
+                if record:
+                    ok = response.status_code < 400
+                    samples.setdefault(call.endpoint, []).append((latency, ok))
+
+            async def worker(count: int, record: bool) -> None:
+                for _ in range(count):
+                    await one(record)
+
+            per_worker = max(1, args.warmup // args.concurrency)
+            await asyncio.gather(*(worker(per_worker, False) for _ in range(args.concurrency)))
+            upstreams.calls.clear()
+            trader_client.calls.clear()
+
+            per_worker = max(1, args.requests // args.concurrency)
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(per_worker, True) for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+        await price_snapshot.stop()
+    history_store.close()
+
+    total = sum(len(s) for s in samples.values())
+    results = {endpoint: summarize(s, elapsed) for endpoint, s in sorted(samples.items())}
+    results["ALL"] = summarize([sample for s in samples.values() for sample in s], elapsed)
+    return {
+        "format": BASELINE_FORMAT,
+        "mix": args.mix,
+        "config": {
+            name: getattr(args, name)
+            for name in ("requests", "warmup", "concurrency", "traders", "latency_ms", "jitter_ms",
+                         "sdk_latency_ms", "sdk_jitter_ms", "seed")
+        },
+        "environment": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "elapsed_s": round(elapsed, 3),
+        "results": results,
+        "upstream_calls_per_request": {
+            name: round(count / total, 3)
+            for name, count in sorted({**upstreams.calls, **trader_client.calls}.items())
+        },
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"mix={report['mix']} " + " ".join(f"{k}={v}" for k, v in report["config"].items()))
+    print(f"{'endpoint':<52} {'n':>6} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, r in report["results"].items():
+        print(
+            f"{endpoint:<52} {r['requests']:>6} {r['errors']:>5} {r['rps']:>8.1f} "
+            f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f}"
+        )
+    calls = ", ".join(f"{name}={count}" for name, count in report["upstream_calls_per_request"].items())
+    print(f"upstream calls per request: {calls or 'none'}")
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta_ms: float) -> List[str]:
+    """Print per-endpoint changes against a baseline; return the regressions."""
+    if baseline.get("config") != report["config"] or baseline.get("mix") != report["mix"]:
+        print("warning: baseline was recorded with different options")
+    regressions = []
+    print(f"\n{'vs baseline ' + str(baseline['environment'].get('commit')):<52} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for endpoint, r in report["results"].items():
+        base = baseline["results"].get(endpoint)
+        if base is None:
+            continue
+        change = {key: (r[key] / base[key] - 1.0) if base[key] else 0.0 for key in ("rps", "p50_ms", "p95_ms", "p99_ms")}
+        print(
+            f"{endpoint:<52} {change['rps']:>+8.0%} {change['p50_ms']:>+8.0%} "
+            f"{change['p95_ms']:>+8.0%} {change['p99_ms']:>+8.0%}"
+        )
+        # Sub-millisecond endpoints move by more than any sane ratio from noise
+        if change["p95_ms"] > tolerance and r["p95_ms"] - base["p95_ms"] > min_delta_ms:
+            regressions.append(f"{endpoint}: p95 {base['p95_ms']} -> {r['p95_ms']} ms")
+        if change["rps"] < -tolerance:
+            regressions.append(f"{endpoint}: {base['rps']} -> {r['rps']} req/s")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--traders", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="upstream HTTP base latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="mean of the exponential upstream jitter")
+    parser.add_argument("--sdk-latency-ms", type=float, default=80.0, help="TraderClient call base latency")
+    parser.add_argument("--sdk-jitter-ms", type=float, default=40.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="FILE", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p95/throughput regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore smaller p95 increases")
+    args = parser.parse_args()
+
+    # Keep the access log off the terminal but still pay for writing it
+    log_path = os.path.join(tempfile.mkdtemp(), "bench.log")
+    setup_logging(open(log_path, "a"))
+    try:
+        report = asyncio.run(run_load(args))
+    finally:
+        stop_logging()
+
+    print_report(report)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("\nregressions beyond tolerance:\n  " + "\n  ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Request-path logging benchmark
+
+Requests per second on /health and /api/price-feeds/last-price (served from
+a preloaded price snapshot) driven in-process through ASGI, for:
+
+- legacy: an @app.middleware("http") logger plus f-string handler logs,
+  written synchronously by a StreamHandler on the event loop
+- queued: the app's RequestContextMiddleware and QueueHandler/QueueListener
+  logging with every request logged (sample rate 1.0)
+- sampled: the same with the default per-route sample rates
+
+Log output goes to a temporary file in every case.
+
+    python -m tests.backend.benchmarks.bench_logging [--requests 3000]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+
+from backend.src.config import settings
+from backend.src.index import app
+from backend.src.passthrough import RawPayload, passthrough_response
+from backend.src.price_snapshot import price_snapshot
+from backend.src.request_logging import setup_logging, stop_logging
+
+
+def legacy_app() -> FastAPI:
+    legacy = FastAPI()
+    legacy.add_middleware(CORSMiddleware, allow_origins=settings.allowed_origins, allow_credentials=True)
+    logger = logging.getLogger("bench.legacy")
+
+    @legacy.middleware("http")
+    async def log_requests(request: Request, call_next):
+        logger.info(f"📨 {request.method} {request.url.path}")
+        response = await call_next(request)
+        logger.info(f"✅ {request.method} {request.url.path} - Status: {response.status_code}")
+        return response
+
+    @legacy.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @legacy.get("/api/price-feeds/last-price")
+    async def get_last_prices(request: Request):
+        logger.info("📊 Fetching latest prices from price snapshot")
+        snapshot = await price_snapshot.get()
+        response = passthrough_response(snapshot.raw, request)
+        logger.info(f"✅ Successfully fetched prices for {len(snapshot.prices)} pairs")
+        return response
+
+    return legacy
+
+
+def use_sync_logging(path):
+    stop_logging()
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
+
+def use_queued_logging(path):
+    setup_logging(open(path, "a"))
+
+
+async def throughput(asgi_app, path, n_requests, concurrency=16):
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(path)  # warm up routing and the snapshot
+
+        async def worker(count):
+            for _ in range(count):
+                response = await client.get(path)
+                assert response.status_code == 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n_requests // concurrency) for _ in range(concurrency)))
+        return (n_requests // concurrency * concurrency) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    args = parser.parse_args()
+
+    prices = [{"pairIndex": i, "c": 1000.0 + i, "t": 1_700_000_000} for i in range(80)]
+    price_snapshot.max_staleness = float("inf")
+    price_snapshot.update(prices, RawPayload(json.dumps(prices).encode()))
+
+    log_path = os.path.join(tempfile.mkdtemp(), "bench.log")
+    variants = [
+        ("legacy", legacy_app(), use_sync_logging, settings.log_sample_rates),
+        ("queued", app, use_queued_logging, {}),
+        ("sampled", app, use_queued_logging, settings.log_sample_rates),
+    ]
+
+    print(f"{'path':<30} {'variant':>8} {'req/s':>9} {'vs legacy':>10}")
+    for path in ("/health", "/api/price-feeds/last-price"):
+        baseline = None
+        for name, asgi_app, configure, rates in variants:
+            configure(log_path)
+            with patch.object(settings, "log_sample_rates", rates):
+                rps = asyncio.run(throughput(asgi_app, path, args.requests))
+            baseline = baseline or rps
+            print(f"{path:<30} {name:>8} {rps:>9.0f} {rps / baseline:>9.2f}x")
+    stop_logging()
+    print(f"log output: {os.path.getsize(log_path) / 1024:.0f} KB in {log_path}")
+
+
+if __name__ == "__main__":
+    main()
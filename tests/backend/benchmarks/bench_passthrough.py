@@ -0,0 +1,113 @@
+"""
+Pass-through proxy benchmark
+
+Compares CPU time per request and peak Python memory of the two ways a proxy
+route can answer from an upstream body:
+
+- reserialize: decode the body, json.loads it, and let FastAPI encode the
+  result again (jsonable_encoder + JSONResponse), as the routes did before
+- passthrough: hand the upstream bytes to passthrough_response unchanged
+
+Each size is measured with an uncompressed and a gzip-encoded upstream body
+(the client accepts gzip).
+
+    python -m tests.backend.benchmarks.bench_passthrough [--requests 200]
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import time
+import tracemalloc
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from starlette.requests import Request
+
+from backend.src.passthrough import RawPayload, passthrough_response
+
+
+def make_body(n_rows, rng):
+    # Shaped like a user-data / history document: a list of flat trade records
+    rows = [
+        {
+            "pairIndex": rng.randrange(80),
+            "index": i,
+            "openPrice": str(int(rng.uniform(1, 90000) * 1e10)),
+            "collateral": rng.randint(10, 10000) * 10**6,
+            "leverage": rng.choice([5, 10, 25, 75]) * 10**10,
+            "buy": rng.random() < 0.5,
+            "timestamp": 1_700_000_000 + i,
+            "txHash": f"0x{rng.getrandbits(256):064x}",
+        }
+        for i in range(n_rows)
+    ]
+    return json.dumps({"positions": rows, "limitOrders": []}).encode()
+
+
+def reserialize(payload, request):
+    data = json.loads(payload.decoded())
+    return JSONResponse(jsonable_encoder(data))
+
+
+_loop = asyncio.new_event_loop()
+
+
+async def _drain(body_iterator):
+    async for _ in body_iterator:
+        pass
+
+
+def passthrough(payload, request):
+    response = passthrough_response(payload, request)
+    # Drain streamed bodies so both paths produce every byte
+    if hasattr(response, "body_iterator"):
+        _loop.run_until_complete(_drain(response.body_iterator))
+    return response
+
+
+def cpu_per_request(fn, payload, request, n_requests):
+    started = time.process_time()
+    for _ in range(n_requests):
+        fn(payload, request)
+    return (time.process_time() - started) / n_requests
+
+
+def peak_memory(fn, payload, request):
+    tracemalloc.start()
+    fn(payload, request)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests per measurement")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", b"gzip")]})
+
+    print(
+        f"{'rows':>6} {'body KB':>8} {'encoding':>8} {'reser. us':>10} {'pass us':>9} {'cpu gain':>9} "
+        f"{'reser. KB':>10} {'pass KB':>8}"
+    )
+    for n_rows in (10, 200, 2000, 20000):
+        body = make_body(n_rows, rng)
+        n_requests = max(args.requests * 10 // n_rows, 5)
+        for payload in (RawPayload(body), RawPayload(gzip.compress(body), content_encoding="gzip")):
+            slow = cpu_per_request(reserialize, payload, request, n_requests)
+            fast = cpu_per_request(passthrough, payload, request, n_requests)
+            slow_peak = peak_memory(reserialize, payload, request)
+            fast_peak = peak_memory(passthrough, payload, request)
+            print(
+                f"{n_rows:>6} {len(body) / 1024:>8.1f} {payload.content_encoding or 'identity':>8} "
+                f"{slow * 1e6:>10.1f} {fast * 1e6:>9.1f} {slow / fast:>8.0f}x "
+                f"{slow_peak / 1024:>10.1f} {fast_peak / 1024:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
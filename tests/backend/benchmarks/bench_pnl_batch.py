@@ -0,0 +1,117 @@
+"""
+Batch PnL scaling benchmark
+
+Compares the stacked, vectorized PnL pass used by /api/portfolio/pnl/batch
+with a per-position pure-Python loop over the same positions, for a growing
+number of addresses. "total" includes converting the user-data dicts into
+columns; "compute" is the vectorized pass over already-stacked columns.
+
+    python -m tests.backend.benchmarks.bench_pnl_batch [--positions 5] [--repeat 5]
+"""
+import argparse
+import math
+import random
+import time
+
+from backend.src.pnl import PNL_FEES_P, PNL_TIERS_P, compute_pnl, owner_totals, prices_for, stack_positions
+
+
+def make_traders(n_addresses, positions_per_address, n_pairs, rng):
+    traders = []
+    for _ in range(n_addresses):
+        traders.append([
+            {
+                "pairIndex": rng.randrange(n_pairs),
+                "index": i,
+                "openPrice": int(rng.uniform(1, 90000) * 1e10),
+                "collateral": rng.randint(10, 10000) * 10**6,
+                "leverage": rng.choice([5, 10, 25, 75]) * 10**10,
+                "rolloverFee": rng.randint(0, 10**6),
+                "buy": rng.random() < 0.5,
+                "isPnl": rng.random() < 0.3,
+            }
+            for i in range(positions_per_address)
+        ])
+    return traders
+
+
+def vectorized(traders, by_pair):
+    arrays, owner = stack_positions(traders)
+    result = compute_pnl(arrays, prices_for(arrays, by_pair))
+    return owner_totals(arrays, owner, len(traders), result)["totalNetPnl"]
+
+
+def compute_only(arrays, owner, n_owners, by_pair):
+    result = compute_pnl(arrays, prices_for(arrays, by_pair))
+    return owner_totals(arrays, owner, n_owners, result)["totalNetPnl"]
+
+
+def pnl_based_fee(collateral, percent_profit):
+    if percent_profit < 0:
+        return 0
+    i = 0
+    while i < len(PNL_TIERS_P):
+        if percent_profit < int(PNL_TIERS_P[i]):
+            break
+        i += 1
+    i = min(i, len(PNL_TIERS_P) - 1)
+    pnl = int(collateral) * int(percent_profit) // 10**10 // 100
+    return float(int(PNL_FEES_P[i]) * pnl // 10**10 // 100)
+
+
+def scalar(traders, by_pair):
+    # calculatePnL one position at a time, as the browser does today
+    totals = []
+    for positions in traders:
+        total = 0.0
+        for p in positions:
+            current_price = by_pair[p["pairIndex"]]["c"] * 1e10
+            open_price, collateral, leverage = float(p["openPrice"]), float(p["collateral"]), float(p["leverage"])
+            shares = ((leverage * collateral) / open_price) / 1e6
+            diff = (current_price - open_price) if p["buy"] else (open_price - current_price)
+            if p["isPnl"]:
+                percent_profit = math.floor(((diff * shares) / collateral) * 1e8)
+                fee = pnl_based_fee(collateral, percent_profit)
+                total += ((percent_profit / 1e12) * collateral - fee) / 1e6
+            else:
+                closing_fee = ((450000000 / 1e10) * collateral * leverage) / 1e18
+                total += (diff / 1e10) * shares - closing_fee - float(p["rolloverFee"]) / 1e6
+        totals.append(total)
+    return totals
+
+
+def best_of(fn, repeat, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--positions", type=int, default=5, help="open positions per address")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    by_pair = {i: {"pairIndex": i, "c": rng.uniform(1, 90000)} for i in range(80)}
+
+    print(
+        f"{'addresses':>10} {'positions':>10} {'total ms':>9} {'compute ms':>11} "
+        f"{'scalar ms':>10} {'speedup':>8} {'compute speedup':>16}"
+    )
+    for n_addresses in (10, 100, 500, 1000, 5000):
+        traders = make_traders(n_addresses, args.positions, len(by_pair), rng)
+        arrays, owner = stack_positions(traders)
+        total = best_of(vectorized, args.repeat, traders, by_pair)
+        compute = best_of(compute_only, args.repeat, arrays, owner, n_addresses, by_pair)
+        ref = best_of(scalar, args.repeat, traders, by_pair)
+        print(
+            f"{n_addresses:>10} {len(arrays):>10} {total * 1e3:>9.2f} {compute * 1e3:>11.2f} "
+            f"{ref * 1e3:>10.2f} {ref / total:>7.1f}x {ref / compute:>15.1f}x"
+        )
+
+if __name__ == "__main__":
+    main()
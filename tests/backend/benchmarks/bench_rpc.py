@@ -0,0 +1,137 @@
+"""
+JSON-RPC layer benchmark
+
+Concurrent tx builds against local JSON-RPC stubs. Each build makes the
+calls a TraderClient builder typically makes: chain id, then gas price and
+the trader's nonce together, two contract reads and a gas estimate. The
+primary endpoint has a fixed latency plus a slow tail (`--tail-prob` of
+requests take `--tail-ms`); a second endpoint has the same base latency
+and no tail. Compared:
+
+- direct: one HTTP request per call to the primary, as web3's HTTP
+  provider sends them
+- layer: the same calls through rpc_client.JsonRpcClient (caching,
+  coalescing and batching) with only the primary endpoint
+- pool: the layer over both endpoints (EWMA routing, hedged reads)
+
+Reported: build latency, HTTP requests sent and JSON-RPC calls billed.
+
+    python -m tests.backend.benchmarks.bench_rpc [--builds 200] [--concurrency 20] [--latency-ms 30]
+        [--tail-prob 0.05] [--tail-ms 400]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from unittest.mock import patch
+
+import httpx
+
+from backend.src.rpc_client import JsonRpcClient
+from backend.src.rpc_pool import RpcPool
+
+from .bench_load import percentile
+
+
+PRIMARY = "http://primary.rpc/v2/key"
+SECONDARY = "http://secondary.rpc/v2/key"
+PAIRS_STORAGE = "0x5db9a7629912ebf95876228c24a848de0bfb43a9"
+TRADING = "0x5ff292d70ba9cd9e7ccb313782811b3d7120535f"
+
+
+class Stub:
+    def __init__(self, latency_ms, tail_prob, tail_ms):
+        self.latency = latency_ms / 1e3
+        self.tail_prob = tail_prob
+        self.tail = tail_ms / 1e3
+        self.rng = random.Random(0)
+        self.http_requests = 0
+        self.rpc_calls = 0
+
+    async def handler(self, request):
+        body = json.loads(request.content)
+        calls = body if isinstance(body, list) else [body]
+        self.http_requests += 1
+        self.rpc_calls += len(calls)
+        slow = request.url.host.startswith("primary") and self.rng.random() < self.tail_prob
+        await asyncio.sleep(self.tail if slow else self.latency)
+        answers = [{"jsonrpc": "2.0", "id": c["id"], "result": "0x2105"} for c in calls]
+        return httpx.Response(200, json=answers if isinstance(body, list) else answers[0])
+
+
+class Direct:
+    def __init__(self, http_client):
+        self.http_client = http_client
+        self.ids = 0
+
+    async def request(self, method, params=None):
+        self.ids += 1
+        response = await self.http_client.post(
+            PRIMARY, json={"jsonrpc": "2.0", "id": self.ids, "method": method, "params": params or []}
+        )
+        return response.json()
+
+
+async def build_tx(rpc, trader, pair_index):
+    await rpc.request("eth_chainId")
+    await asyncio.gather(
+        rpc.request("eth_gasPrice"),
+        rpc.request("eth_getTransactionCount", [trader, "latest"]),
+    )
+    await rpc.request("eth_call", [{"to": PAIRS_STORAGE, "data": f"0x8e3a7a0b{pair_index:064x}"}, "latest"])
+    await rpc.request("eth_call", [{"to": TRADING, "data": "0x4a2b7d5c"}, "latest"])
+    await rpc.request("eth_estimateGas", [{"from": trader, "to": TRADING, "data": f"0x{pair_index:08x}"}])
+
+
+async def run(variant, args):
+    stub = Stub(args.latency_ms, args.tail_prob, args.tail_ms)
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(stub.handler))
+    rpc = Direct(http_client) if variant == "direct" else JsonRpcClient(2.0, 0.002, 20, 4096)
+    pool = RpcPool([PRIMARY, SECONDARY] if variant == "pool" else [PRIMARY], 0.2, 0.02, 1.0, 5.0)
+    traders = [f"0x{i:040x}" for i in range(args.traders)]
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await build_tx(rpc, traders[i % len(traders)], i % 8)
+            latencies.append(time.perf_counter() - started)
+
+    with patch("backend.src.rpc_pool.get_http_client", return_value=http_client), \
+            patch("backend.src.rpc_client.rpc_pool", pool):
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.builds)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "builds/s": args.builds / elapsed,
+        "p50 ms": percentile(latencies, 50) * 1e3,
+        "p95 ms": percentile(latencies, 95) * 1e3,
+        "http": stub.http_requests,
+        "rpc calls": stub.rpc_calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--builds", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--traders", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--tail-prob", type=float, default=0.05)
+    parser.add_argument("--tail-ms", type=float, default=400.0)
+    args = parser.parse_args()
+
+    print(f"{'variant':<8} {'builds/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'http':>6} {'rpc calls':>10}")
+    for variant in ("direct", "layer", "pool"):
+        r = asyncio.run(run(variant, args))
+        print(
+            f"{variant:<8} {r['builds/s']:>9.1f} {r['p50 ms']:>8.1f} {r['p95 ms']:>8.1f} "
+            f"{r['http']:>6} {r['rpc calls']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Tick store benchmark
+
+Writes `--days` of simulated feed updates (`--pairs` ticks every
+`--interval` seconds) into a tick_store.TickStore in a temporary directory,
+then measures time-range queries, single-pair queries, a full candle
+backfill and how much the process heap grows while reading (the columns are
+memory-mapped, so reading months of ticks should not grow it much).
+
+    python -m tests.backend.benchmarks.bench_tick_store [--days 7] [--pairs 50] [--interval 5]
+"""
+import argparse
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+from backend.src.candles import RESOLUTIONS, CandleStore
+from backend.src.tick_store import TickStore
+
+
+def best_of(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def max_rss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--pairs", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=5.0, help="feed seconds between updates")
+    parser.add_argument("--segment-capacity", type=int, default=1_048_576)
+    args = parser.parse_args()
+
+    updates = int(args.days * 86400 / args.interval)
+    start = 1_700_000_000.0
+    end = start + updates * args.interval
+    rng = np.random.default_rng(0)
+    pair_indices = np.arange(args.pairs)
+    base = rng.uniform(1, 90000, size=args.pairs)
+
+    with tempfile.TemporaryDirectory() as path:
+        store = TickStore(path, args.segment_capacity, segment_seconds=86400, retention=365 * 86400)
+        started = time.perf_counter()
+        for i in range(updates):
+            store.append(start + i * args.interval, pair_indices, base * (1 + 1e-3 * np.sin(i / 100.0)))
+        elapsed = time.perf_counter() - started
+        stats = store.stats()
+        print(
+            f"appended {stats['ticks']:,} ticks in {elapsed:.1f}s ({stats['ticks'] / elapsed:,.0f} ticks/s, "
+            f"{updates / elapsed:,.0f} updates/s); {stats['segments']} segments, {stats['bytes'] / 2**20:.0f} MiB"
+        )
+        store.close()
+
+        # Fresh reader, as after a restart
+        store = TickStore(path, args.segment_capacity, segment_seconds=86400, retention=365 * 86400)
+        rss_before = max_rss_mib()
+        hour = best_of(lambda: store.range(end - 86400 - 3600, end - 86400))
+        day_pair = best_of(lambda: store.range(end - 86400, end, pair_index=7))
+        # Every tick in the store, one segment view at a time
+        scan_all = best_of(lambda: sum(float(ticks.price.sum()) for ticks in store.iter_ticks()), repeat=1)
+        candles = CandleStore(list(RESOLUTIONS), capacity=1440, max_pairs=args.pairs)
+        started = time.perf_counter()
+        read = candles.backfill(store, end)
+        backfill = time.perf_counter() - started
+        print(f"range 1h, all pairs:      {hour * 1e3:8.2f} ms")
+        print(f"range 1d, one pair:       {day_pair * 1e3:8.2f} ms")
+        print(f"scan all ticks:           {scan_all * 1e3:8.2f} ms")
+        print(f"candle backfill:          {backfill * 1e3:8.2f} ms ({read:,} ticks read over {len(RESOLUTIONS)} resolutions)")
+        print(f"max RSS growth while reading: {max_rss_mib() - rss_before:.0f} MiB (file: {stats['bytes'] / 2**20:.0f} MiB)")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Local stand-ins for the upstreams the backend talks to
+
+- core.avantisfi.com: /user-data
+- api.avantisfi.com: profit-loss, win-rate and paged closed-trade history
+- feed-v3.avantisfi.com: /v1/price-feeds/last-price
+- a fake TraderClient: pairs cache and the tx builders used by the routes
+
+Responses are generated deterministically per trader address, and every
+call waits a simulated latency: a fixed base plus exponentially distributed
+jitter, so the tail looks like a real network rather than a constant.
+
+`installed(...)` swaps them in for the shared httpx clients and the SDK
+client singleton for the duration of a run.
+"""
+import asyncio
+import json
+import random
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+from unittest.mock import patch
+
+import httpx
+
+from backend.src import avantis_client, http_clients
+from backend.src.http_clients import CORE, HISTORY, PRICE_FEED, _forward_request_id, _upstream_config
+from backend.src.metrics import InstrumentedTransport
+
+
+PAIRS = ["ETH/USD", "BTC/USD", "SOL/USD", "ARB/USD", "DOGE/USD", "EUR/USD", "GBP/USD", "XAU/USD"]
+
+
+class Latency:
+    """Simulated service time: `base_ms` plus exponential jitter with mean `jitter_ms`."""
+
+    def __init__(self, base_ms: float, jitter_ms: float, rng: random.Random):
+        self.base_ms = base_ms
+        self.jitter_ms = jitter_ms
+        self.rng = rng
+
+    def sample(self) -> float:
+        jitter = self.rng.expovariate(1.0 / self.jitter_ms) if self.jitter_ms > 0 else 0.0
+        return (self.base_ms + jitter) / 1e3
+
+    async def wait(self) -> None:
+        delay = self.sample()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def pair_name(pair_index: int) -> str:
+    return PAIRS[pair_index % len(PAIRS)] if pair_index < len(PAIRS) else f"PAIR{pair_index}/USD"
+
+
+class _NetworkStream(httpx.AsyncByteStream):
+    # Unread, like a body still on the socket (pass-through routes stream it raw)
+    def __init__(self, body: bytes):
+        self.body = body
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        yield self.body
+
+
+class UpstreamStandIns:
+    """HTTP stand-ins for the three Avantis hosts, served through httpx.MockTransport."""
+
+    def __init__(
+        self,
+        latency_ms: float = 20.0,
+        jitter_ms: float = 10.0,
+        seed: int = 0,
+        n_pairs: int = 80,
+        positions_per_trader: int = 5,
+        closed_trades_per_trader: int = 60,
+        page_size: int = 20,
+    ):
+        self.rng = random.Random(seed)
+        self.latency = Latency(latency_ms, jitter_ms, self.rng)
+        self.n_pairs = n_pairs
+        self.positions_per_trader = positions_per_trader
+        self.closed_trades_per_trader = closed_trades_per_trader
+        self.page_size = page_size
+        self.calls: Counter = Counter()
+        self._prices = [1000.0 + 37.0 * i for i in range(n_pairs)]
+        self._tick = 0
+
+    # --- generated documents ---
+
+    def positions(self, address: str) -> List[Dict[str, Any]]:
+        rng = random.Random(address.lower())
+        return [
+            {
+                "pairIndex": rng.randrange(self.n_pairs),
+                "index": i,
+                "openPrice": int(rng.uniform(1, 90000) * 1e10),
+                "collateral": rng.randint(10, 10000) * 10**6,
+                "leverage": rng.choice([5, 10, 25, 75]) * 10**10,
+                "rolloverFee": rng.randint(0, 10**6),
+                "buy": rng.random() < 0.5,
+                "isPnl": rng.random() < 0.3,
+                "trader": address,
+            }
+            for i in range(self.positions_per_trader)
+        ]
+
+    def user_data(self, address: str) -> Dict[str, Any]:
+        return {"positions": self.positions(address), "limitOrders": []}
+
+    def closed_trades(self, address: str) -> List[Dict[str, Any]]:
+        rng = random.Random(f"history:{address.lower()}")
+        trades = []
+        for i in range(self.closed_trades_per_trader):
+            size = rng.randint(10, 5000) * 10**6
+            trades.append({
+                "_id": f"{address.lower()}-{i}",
+                "timeStamp": 1_700_000_000 - i * 3600,
+                "event": {
+                    "args": {
+                        "t": {"pairIndex": rng.randrange(self.n_pairs), "index": i % 4, "buy": rng.random() < 0.5},
+                        "positionSizeUSDC": size,
+                        "usdcSentToTrader": int(size * rng.uniform(0.2, 2.0)),
+                    }
+                },
+            })
+        return trades
+
+    def history_page(self, address: str, page_number: int) -> Dict[str, Any]:
+        start = (page_number - 1) * self.page_size
+        return {"portfolio": self.closed_trades(address)[start:start + self.page_size]}
+
+    def last_prices(self) -> List[Dict[str, Any]]:
+        # A small random walk so consecutive snapshots differ
+        self._tick += 1
+        for i in range(self.n_pairs):
+            self._prices[i] *= 1.0 + self.rng.uniform(-1e-4, 1e-4)
+        return [
+            {"pairIndex": i, "c": round(price, 6), "t": 1_700_000_000 + self._tick}
+            for i, price in enumerate(self._prices)
+        ]
+
+    # --- HTTP ---
+
+    def _route(self, host: str, path: str, params: Dict[str, str]) -> Optional[Any]:
+        parts = path.strip("/").split("/")
+        if host == CORE and path == "/user-data" and "trader" in params:
+            return self.user_data(params["trader"])
+        if host == PRICE_FEED and path == "/v1/price-feeds/last-price":
+            return self.last_prices()
+        if host == HISTORY and parts[:3] == ["v1", "history", "portfolio"] and len(parts) == 5:
+            route, address = parts[3], parts[4]
+            trades = self.closed_trades(address)
+            wins = sum(t["event"]["args"]["usdcSentToTrader"] > t["event"]["args"]["positionSizeUSDC"] for t in trades)
+            if route == "profit-loss":
+                total = sum(t["event"]["args"]["usdcSentToTrader"] - t["event"]["args"]["positionSizeUSDC"] for t in trades)
+                return {"success": True, "data": {"total": total / 1e6, "trades": len(trades)}}
+            if route == "win-rate":
+                return {"success": True, "data": {"winRate": wins / max(1, len(trades)), "wins": wins}}
+        if host == HISTORY and parts[:4] == ["v2", "history", "portfolio", "history"] and len(parts) == 6:
+            return self.history_page(parts[4], int(parts[5]))
+        return None
+
+    def transport(self, host: str) -> httpx.MockTransport:
+        async def handler(request: httpx.Request) -> httpx.Response:
+            self.calls[host] += 1
+            await self.latency.wait()
+            body = self._route(host, request.url.path, dict(request.url.params))
+            if body is None:
+                return httpx.Response(404, json={"detail": "Not Found"})
+            content = json.dumps(body).encode()
+            return httpx.Response(
+                200,
+                headers={"content-type": "application/json", "content-length": str(len(content))},
+                stream=_NetworkStream(content),
+            )
+
+        return httpx.MockTransport(handler)
+
+
+class _FakePairsCache:
+    def __init__(self, owner: "FakeTraderClient"):
+        self.owner = owner
+        self._pairs: Optional[Dict[str, Any]] = None
+
+    async def get_pairs_info(self) -> Dict[str, Any]:
+        # Like the SDK: one RPC round to fill the cache, then the same dict
+        if self._pairs is None:
+            self.owner.calls["get_pairs_info"] += 1
+            await self.owner.latency.wait()
+            self._pairs = {}
+            for i in range(self.owner.n_pairs):
+                base, quote = pair_name(i).split("/")
+                self._pairs[str(i)] = {"from": base, "to": quote, "pairIndex": i, "feed": {"feedId": f"0x{i:064x}"}}
+        return self._pairs
+
+
+class _FakeTrade:
+    def __init__(self, owner: "FakeTraderClient"):
+        self.owner = owner
+
+    async def _build(self, name: str, **kwargs: Any) -> Dict[str, Any]:
+        self.owner.calls[name] += 1
+        await self.owner.latency.wait()
+        return {
+            "to": "0x5FF292d70bA9cD9e7CCb313782811b3D7120535f",
+            "data": "0x" + json.dumps(kwargs, sort_keys=True, default=str).encode().hex(),
+            "value": 0,
+            "chainId": 8453,
+        }
+
+    async def build_trade_open_tx(self, trade_input: Any, order_type: Any, slippage_percentage: float) -> Dict[str, Any]:
+        return await self._build("build_trade_open_tx", slippage=slippage_percentage)
+
+    async def build_trade_close_tx(self, **kwargs: Any) -> Dict[str, Any]:
+        return await self._build("build_trade_close_tx", **kwargs)
+
+    async def build_order_cancel_tx(self, **kwargs: Any) -> Dict[str, Any]:
+        return await self._build("build_order_cancel_tx", **kwargs)
+
+    async def build_trade_tp_sl_update_tx(self, **kwargs: Any) -> Dict[str, Any]:
+        return await self._build("build_trade_tp_sl_update_tx", **kwargs)
+
+
+class FakeTraderClient:
+    """The parts of avantis_trader_sdk.TraderClient the routes use, with RPC-like latency."""
+
+    def __init__(self, latency_ms: float = 80.0, jitter_ms: float = 40.0, seed: int = 0, n_pairs: int = 80):
+        self.latency = Latency(latency_ms, jitter_ms, random.Random(seed + 1))
+        self.n_pairs = n_pairs
+        self.calls: Counter = Counter()
+        self.pairs_cache = _FakePairsCache(self)
+        self.trade = _FakeTrade(self)
+
+
+@asynccontextmanager
+async def installed(upstreams: UpstreamStandIns, trader_client: FakeTraderClient) -> AsyncIterator[None]:
+    """Point the shared upstream clients and the SDK singleton at the stand-ins."""
+    clients = {}
+    for name in (CORE, HISTORY, PRICE_FEED):
+        base_url, timeout = _upstream_config(name)
+        clients[name] = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout),
+            transport=InstrumentedTransport(name, upstreams.transport(name)),
+            event_hooks={"request": [_forward_request_id]},
+        )
+    try:
+        with patch.dict(http_clients._clients, clients), patch.object(avantis_client, "_trader_client", trader_client):
+            yield
+    finally:
+        for client in clients.values():
+            await client.aclose()
@@ -1,10 +1,72 @@
 """
 Pytest configuration and fixtures for backend tests
 """
+import json
+import httpx
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi.testclient import TestClient
+from backend.src.circuit_breaker import reset_breakers
 from backend.src.index import app
+from backend.src import metrics
+from backend.src.history_store import history_store
+from backend.src.pair_metadata import pair_metadata
+from backend.src.pairs_payload import pairs_payload
+from backend.src.swr_cache import history_api_cache
+from backend.src.tick_store import tick_store
+from backend.src.user_data import user_data_cache
+
+
+@pytest.fixture(autouse=True)
+def reset_user_data_cache():
+    """Keep cached user-data from leaking between tests"""
+    user_data_cache.clear()
+    yield
+    user_data_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_upstream_state():
+    """Start every test with closed breakers and an empty upstream cache"""
+    reset_breakers()
+    history_api_cache.clear()
+    yield
+    reset_breakers()
+    history_api_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_pair_metadata():
+    """Start every test without a loaded pairs snapshot, pair index or encoded /pairs"""
+    pair_metadata.__init__()
+    pairs_payload.__init__()
+    yield
+    pair_metadata.__init__()
+    pairs_payload.__init__()
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """Start every test with empty metric series"""
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.fixture(autouse=True)
+def isolated_history_store(tmp_path):
+    """Give every test its own closed-trade history database"""
+    history_store.open(str(tmp_path / "history.sqlite3"))
+    yield history_store
+    history_store.close()
+
+
+@pytest.fixture(autouse=True)
+def isolated_tick_store(tmp_path):
+    """Give every test its own tick store directory"""
+    tick_store.open(str(tmp_path / "ticks"))
+    yield tick_store
+    tick_store.close()
 
 
 @pytest.fixture
@@ -13,6 +75,25 @@ def client():
     return TestClient(app)
 
 
+class _UnreadStream(httpx.AsyncByteStream):
+    def __init__(self, body: bytes):
+        self.body = body
+
+    async def __aiter__(self):
+        yield self.body
+
+
+@pytest.fixture
+def upstream_response():
+    """Factory for not-yet-read upstream responses, as a network transport returns them"""
+    def _make(json_body=None, status_code=200, content=None, headers=None):
+        if content is None:
+            content = json.dumps(json_body).encode()
+        headers = {"content-type": "application/json", **(headers or {})}
+        return httpx.Response(status_code, headers=headers, stream=_UnreadStream(content))
+    return _make
+
+
 @pytest.fixture
 def mock_trader_client():
     """Mock TraderClient for testing"""
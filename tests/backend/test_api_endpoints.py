@@ -1,8 +1,9 @@
 """
 API endpoint integration tests
 """
+import httpx
 import pytest
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch, AsyncMock, MagicMock
 from fastapi.testclient import TestClient
 from backend.src.index import app
 
@@ -10,7 +11,7 @@ client = TestClient(app)
 
 
 @pytest.mark.asyncio
-@patch("backend.src.index.get_trader_client")
+@patch("backend.src.pair_metadata.get_trader_client")
 async def test_get_pairs(mock_get_client, sample_pair_data):
     """Test getting all pairs"""
     mock_client = AsyncMock()
@@ -24,7 +25,7 @@ async def test_get_pairs(mock_get_client, sample_pair_data):
 
 
 @pytest.mark.asyncio
-@patch("backend.src.index.get_trader_client")
+@patch("backend.src.pair_metadata.get_trader_client")
 async def test_get_pairs_with_index(mock_get_client, sample_pair_data):
     """Test getting a specific pair by index"""
     mock_client = AsyncMock()
@@ -38,7 +39,7 @@ async def test_get_pairs_with_index(mock_get_client, sample_pair_data):
 
 
 @pytest.mark.asyncio
-@patch("backend.src.index.get_trader_client")
+@patch("backend.src.pair_metadata.get_trader_client")
 async def test_get_pairs_not_found(mock_get_client):
     """Test getting a non-existent pair"""
     mock_client = AsyncMock()
@@ -49,35 +50,37 @@ async def test_get_pairs_not_found(mock_get_client):
     assert response.status_code == 404
 
 
-@patch("httpx.AsyncClient")
+@patch("backend.src.user_data.get_http_client")
 @pytest.mark.asyncio
-async def test_get_trades(mock_httpx_client, sample_trade_data):
+async def test_get_trades(mock_get_http_client, sample_trade_data):
     """Test getting trades for a trader"""
-    mock_response = AsyncMock()
-    mock_response.json.return_value = sample_trade_data
-    mock_response.raise_for_status = AsyncMock()
-    
-    mock_client_instance = AsyncMock()
-    mock_client_instance.__aenter__.return_value.get = AsyncMock(return_value=mock_response)
-    mock_client_instance.__aexit__.return_value = None
-    mock_httpx_client.return_value = mock_client_instance
-    
+    mock_response = httpx.Response(
+        200, json=sample_trade_data, request=httpx.Request("GET", "https://core.avantisfi.com/user-data")
+    )
+
+    mock_http_client = MagicMock()
+    mock_http_client.get = AsyncMock(return_value=mock_response)
+    mock_get_http_client.return_value = mock_http_client
+
     response = client.get("/trades?trader_address=0x1234567890123456789012345678901234567890")
     assert response.status_code == 200
+    assert response.content == mock_response.content  # passed through, not re-encoded
     data = response.json()
     assert "positions" in data
     assert "limitOrders" in data
+    mock_http_client.get.assert_awaited_once_with(
+        "/user-data", params={"trader": "0x1234567890123456789012345678901234567890"}
+    )
 
 
-@patch("httpx.AsyncClient")
+@patch("backend.src.user_data.get_http_client")
 @pytest.mark.asyncio
-async def test_get_trades_error(mock_httpx_client):
+async def test_get_trades_error(mock_get_http_client):
     """Test error handling when fetching trades fails"""
-    mock_client_instance = AsyncMock()
-    mock_client_instance.__aenter__.return_value.get = AsyncMock(side_effect=Exception("API Error"))
-    mock_client_instance.__aexit__.return_value = None
-    mock_httpx_client.return_value = mock_client_instance
-    
+    mock_http_client = MagicMock()
+    mock_http_client.get = AsyncMock(side_effect=Exception("API Error"))
+    mock_get_http_client.return_value = mock_http_client
+
     response = client.get("/trades?trader_address=0x1234567890123456789012345678901234567890")
     assert response.status_code == 400
 
@@ -0,0 +1,116 @@
+"""
+In-memory OHLC candle tests
+"""
+import numpy as np
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from backend.src.candles import CandleStore
+from backend.src.index import app
+from backend.src.price_snapshot import price_snapshot
+
+client = TestClient(app)
+
+T0 = 1_700_000_100  # a five-minute boundary
+
+
+def _store(capacity=4, max_pairs=8):
+    return CandleStore(["1m", "5m"], capacity=capacity, max_pairs=max_pairs)
+
+
+def test_ticks_aggregate_into_candles():
+    """Test open/high/low/close/count per bucket and resolution"""
+    store = _store()
+    for offset, eth, btc in [(0, 10.0, 100.0), (20, 12.0, 99.0), (40, 9.0, 101.0), (60, 11.0, 102.0)]:
+        store.ingest(T0 + offset, [0, 1], [eth, btc])
+
+    one_minute = store.candles(0, "1m")
+    assert one_minute == {
+        "t": [T0, T0 + 60], "o": [10.0, 11.0], "h": [12.0, 11.0], "l": [9.0, 11.0], "c": [9.0, 11.0], "v": [3, 1]
+    }
+    five_minutes = store.candles(1, "5m")
+    assert five_minutes["t"] == [T0 // 300 * 300]
+    assert (five_minutes["o"], five_minutes["h"], five_minutes["l"], five_minutes["c"]) == ([100.0], [102.0], [99.0], [102.0])
+    assert five_minutes["v"] == [4]
+    assert store.candles(7, "1m") is None
+
+
+def test_ring_is_bounded_and_range_sliced():
+    """Test old candles are overwritten and from/to slice by open time"""
+    store = _store(capacity=4)
+    for minute in range(10):
+        store.ingest(T0 + 60 * minute, [3], [float(minute + 1)])
+
+    candles = store.candles(3, "1m")
+    assert candles["t"] == [T0 + 60 * m for m in range(6, 10)]
+    assert candles["c"] == [7.0, 8.0, 9.0, 10.0]
+    assert store.candles(3, "1m", T0 + 420, T0 + 480)["c"] == [8.0, 9.0]
+    assert store.candles(3, "1m", T0 + 9999)["t"] == []
+
+    memory = store.memory()["1m"]
+    assert memory["candles"] == 4
+    assert memory["bytesPerPair"] == 4 * 36
+    assert memory["bytes"] == store.rings["1m"].nbytes
+
+
+def test_pairs_without_ticks_have_gaps():
+    """Test a pair that did not tick in a bucket gets no candle there"""
+    store = _store()
+    store.ingest(T0, [0, 1], [1.0, 2.0])
+    store.ingest(T0 + 60, [1], [3.0])
+    store.ingest(T0 + 120, [0], [4.0])
+    assert store.candles(0, "1m")["t"] == [T0, T0 + 120]
+    assert store.candles(1, "1m")["t"] == [T0, T0 + 60]
+
+
+def test_invalid_and_late_ticks_are_dropped():
+    """Test NaN/non-positive prices, late ticks and pairs past the limit"""
+    store = _store(max_pairs=2)
+    store.ingest(T0 + 60, [0, 1, 2], [1.0, np.nan, 3.0])
+    store.ingest(T0, [0], [5.0])
+    assert store.candles(0, "1m")["c"] == [1.0]
+    assert store.rings["1m"].late_ticks == 1
+    assert store.candles(1, "1m") is None
+    assert store.candles(2, "1m")["c"] == [3.0]
+    store.ingest(T0 + 61, [5], [1.0])
+    assert store.candles(5, "1m") is None
+    assert len(store.slots) == 2
+
+
+def test_pairs_arriving_out_of_index_order():
+    """Test a pair first seen after a higher-indexed one is tracked"""
+    store = _store()
+    store.ingest(T0, [5, 0], [1.0, 0.0])  # pair 0 closed: price 0 is dropped
+    store.ingest(T0 + 1, [2], [2.0])
+    store.ingest(T0 + 2, [0], [3.0])
+    assert store.candles(5, "1m")["c"] == [1.0]
+    assert store.candles(2, "1m")["c"] == [2.0]
+    assert store.candles(0, "1m")["c"] == [3.0]
+
+
+def test_feed_updates_feed_candles():
+    """Test the price snapshot listener turns changed entries into ticks"""
+    store = _store()
+    with patch("backend.src.candles.time.time", return_value=T0 + 5):
+        store.on_prices([{"pairIndex": 0, "c": 3000.5}, {"pairIndex": 1, "c": "bad"}, {"c": 1.0}])
+    assert store.candles(0, "1m") == {"t": [T0], "o": [3000.5], "h": [3000.5], "l": [3000.5], "c": [3000.5], "v": [1]}
+
+
+def test_candles_endpoint():
+    """Test /api/candles serves UDF-shaped history from memory"""
+    store = _store()
+    store.ingest(T0, [4], [2.0])
+    store.ingest(T0 + 60, [4], [2.5])
+    with patch("backend.src.index.candle_store", store):
+        response = client.get("/api/candles/4", params={"resolution": "1m", "from": T0 + 30})
+        assert response.status_code == 200
+        assert response.json() == {"s": "ok", "t": [T0 + 60], "o": [2.5], "h": [2.5], "l": [2.5], "c": [2.5], "v": [1]}
+
+        assert client.get("/api/candles/9").json() == {"s": "no_data"}
+        assert client.get("/api/candles/4", params={"resolution": "1h"}).status_code == 400
+
+
+def test_candle_store_listens_to_price_snapshot():
+    """Test the shared store is registered on the price snapshot"""
+    from backend.src.candles import candle_store
+    assert candle_store.on_prices in price_snapshot._listeners
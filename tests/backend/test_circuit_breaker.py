@@ -0,0 +1,152 @@
+"""
+Circuit breaker and stale-while-revalidate cache tests
+"""
+import asyncio
+import httpx
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+from backend.src.circuit_breaker import CircuitBreaker, CircuitOpenError, is_upstream_failure
+from backend.src.deadline import DeadlineExceeded
+from backend.src.index import app
+from backend.src.swr_cache import SWRCache, history_api_cache
+
+client = TestClient(app)
+
+ADDRESS = "0x1234567890123456789012345678901234567890"
+
+
+def _status_error(code):
+    request = httpx.Request("GET", "http://upstream")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(code, request=request))
+
+
+def test_upstream_failure_classification():
+    """Test that only transport errors, 5xx answers and open circuits count as failures"""
+    assert is_upstream_failure(httpx.ConnectError("down"))
+    assert is_upstream_failure(_status_error(503))
+    assert is_upstream_failure(CircuitOpenError("history", 1.0))
+    assert not is_upstream_failure(_status_error(404))
+    assert not is_upstream_failure(ValueError("bad"))
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_and_half_opens():
+    """Test open after consecutive failures and a single trial after the reset timeout"""
+    breaker = CircuitBreaker("history", failure_threshold=2, reset_timeout=0.05)
+    failing = AsyncMock(side_effect=httpx.ConnectError("down"))
+
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectError):
+            await breaker.call(failing)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(failing)
+    assert failing.await_count == 2
+
+    await asyncio.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial call at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_breaker_ignores_client_errors():
+    """Test that 4xx answers do not open the circuit"""
+    breaker = CircuitBreaker("history", failure_threshold=1, reset_timeout=30)
+    with pytest.raises(httpx.HTTPStatusError):
+        await breaker.call(AsyncMock(side_effect=_status_error(404)))
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_cancelled_trial_keeps_circuit_open():
+    """Test a half-open trial that is cancelled or times out does not close the breaker"""
+    breaker = CircuitBreaker("history", failure_threshold=1, reset_timeout=0.01)
+    with pytest.raises(httpx.ConnectError):
+        await breaker.call(AsyncMock(side_effect=httpx.ConnectError("down")))
+    await asyncio.sleep(0.02)
+
+    for error in (asyncio.CancelledError(), DeadlineExceeded(), asyncio.TimeoutError()):
+        with pytest.raises(type(error)):
+            await breaker.call(AsyncMock(side_effect=error))
+        assert breaker.state == "half_open"
+        assert breaker.failures == 1
+    # The trial slot was given back
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_swr_hit_stale_and_revalidate():
+    """Test fresh hits, stale serving with one background refresh, and misses"""
+    cache = SWRCache(CircuitBreaker("history", 5, 30), max_entries=10)
+    fetch = AsyncMock(side_effect=[1, 2])
+
+    assert (await cache.get("k", fetch, ttl=0.05, stale_ttl=10)).status == "MISS"
+    hit = await cache.get("k", fetch, ttl=0.05, stale_ttl=10)
+    assert (hit.value, hit.status) == (1, "HIT")
+
+    await asyncio.sleep(0.06)
+    stale = await cache.get("k", fetch, ttl=0.05, stale_ttl=10)
+    assert (stale.value, stale.status) == (1, "STALE")
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert (await cache.get("k", fetch, ttl=0.05, stale_ttl=10)).value == 2
+    assert fetch.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_swr_serves_stale_when_upstream_fails():
+    """Test that expired values are served while the upstream is down"""
+    cache = SWRCache(CircuitBreaker("history", 5, 30), max_entries=10)
+    await cache.get("k", AsyncMock(return_value="old"), ttl=0, stale_ttl=0)
+
+    result = await cache.get("k", AsyncMock(side_effect=httpx.ConnectError("down")), ttl=0, stale_ttl=0)
+    assert (result.value, result.status) == ("old", "STALE")
+    with pytest.raises(httpx.ConnectError):
+        await cache.get("other", AsyncMock(side_effect=httpx.ConnectError("down")), ttl=0, stale_ttl=0)
+
+
+@pytest.mark.asyncio
+async def test_swr_evicts_least_recently_used():
+    """Test the entry bound"""
+    cache = SWRCache(CircuitBreaker("history", 5, 30), max_entries=2)
+    for key in ("a", "b", "c"):
+        await cache.get(key, AsyncMock(return_value=key), ttl=60, stale_ttl=0)
+    assert list(cache._entries) == ["b", "c"]
+
+
+@patch("backend.src.index.get_http_client")
+def test_profit_loss_route_cache_headers(mock_get_http_client, upstream_response):
+    """Test that repeated reads are served from cache and report it"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return upstream_response({"success": True, "data": [{"total": 12}]})
+
+    mock_get_http_client.return_value = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler), base_url="https://api.avantisfi.com"
+    )
+
+    first = client.get(f"/api/portfolio/profit-loss/{ADDRESS}")
+    second = client.get(f"/api/portfolio/profit-loss/{ADDRESS}")
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json() == first.json()
+    assert len(requests) == 1
+
+
+@patch("backend.src.index.get_http_client")
+def test_open_circuit_returns_503(mock_get_http_client):
+    """Test that an open circuit without cached data fails fast"""
+    breaker = history_api_cache.breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    response = client.get(f"/api/portfolio/win-rate/{ADDRESS}")
+    assert response.status_code == 503
+    mock_get_http_client.assert_not_called()
@@ -0,0 +1,205 @@
+"""
+Request deadline and hedged upstream request tests
+"""
+import asyncio
+import time
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+from backend.src import deadline
+from backend.src.config import settings
+from backend.src.hedging import HedgingTransport
+from backend.src.http_clients import _apply_deadline
+from backend.src.index import app
+from backend.src.metrics import upstream_hedges
+
+client = TestClient(app)
+
+TRADER = "0x1234567890123456789012345678901234567890"
+
+
+def test_budget_by_longest_path_prefix():
+    """Test per-prefix budgets override the default and 0 disables it"""
+    with patch.object(settings, "request_deadline", 10.0), \
+            patch.object(settings, "request_deadlines", {"/tx": 30.0, "/tx/batch": 45.0, "/health": 0.0}):
+        assert deadline.budget_for("/trades") == 10.0
+        assert deadline.budget_for("/tx/other") == 30.0
+        assert deadline.budget_for("/tx/batch") == 45.0
+        assert deadline.budget_for("/health") is None
+
+
+@pytest.mark.asyncio
+async def test_within_deadline_cancels_work():
+    """Test that running out of budget cancels the awaited work"""
+    cancelled = asyncio.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    deadline.deadline_var.set(time.monotonic() + 0.02)
+    with pytest.raises(deadline.DeadlineExceeded):
+        await deadline.within_deadline(slow())
+    assert cancelled.is_set()
+
+    # A cap alone is an ordinary timeout
+    deadline.deadline_var.set(None)
+    with pytest.raises(asyncio.TimeoutError):
+        await deadline.within_deadline(slow(), cap=0.01)
+
+
+@pytest.mark.asyncio
+async def test_detached_work_outlives_the_deadline():
+    """Test that shared work runs without the deadline of the task that started it"""
+    deadline.deadline_var.set(time.monotonic() + 0.01)
+    task = asyncio.ensure_future(deadline.detached(asyncio.sleep(0.03, result="done")))
+    with pytest.raises(deadline.DeadlineExceeded):
+        await deadline.within_deadline(asyncio.shield(task))
+    assert await task == "done"
+
+
+@pytest.mark.asyncio
+async def test_upstream_timeouts_clamped_to_deadline():
+    """Test the request hook shortens httpx timeouts to what is left"""
+    request = httpx.Request("GET", "https://core.avantisfi.com/user-data")
+    request.extensions["timeout"] = httpx.Timeout(10.0, connect=0.5).as_dict()
+
+    deadline.deadline_var.set(time.monotonic() + 2.0)
+    await _apply_deadline(request)
+    timeouts = request.extensions["timeout"]
+    assert timeouts["connect"] == 0.5
+    assert 1.5 < timeouts["read"] <= 2.0
+
+    deadline.deadline_var.set(time.monotonic() - 0.1)
+    with pytest.raises(deadline.DeadlineExceeded):
+        await _apply_deadline(request)
+
+
+@patch("backend.src.index.get_trader_client")
+def test_slow_builder_gets_504(mock_get_trader_client):
+    """Test an SDK call past the request deadline is cancelled and answered with 504"""
+    cancelled = []
+
+    async def slow_build(**kwargs):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    trader_client = MagicMock()
+    trader_client.trade.build_order_cancel_tx = AsyncMock(side_effect=slow_build)
+    mock_get_trader_client.return_value = trader_client
+
+    with patch.object(settings, "request_deadline", 0.05):
+        started = time.perf_counter()
+        response = client.post("/orders/cancel", json={"trader_address": TRADER, "pair_index": 0, "trade_index": 0})
+    assert response.status_code == 504
+    assert response.json() == {"detail": "Request deadline exceeded"}
+    assert time.perf_counter() - started < 1.0
+    assert cancelled == [True]
+
+
+@pytest.mark.asyncio
+async def test_middleware_cancels_app_past_deadline():
+    """Test the middleware answers 504 and cancels a handler that ignores the deadline"""
+    cancelled = asyncio.Event()
+
+    async def stuck_app(scope, receive, send):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    with patch.object(settings, "request_deadline", 0.02):
+        await deadline.DeadlineMiddleware(stuck_app)({"type": "http", "path": "/trades"}, None, send)
+    assert cancelled.is_set()
+    assert messages[0]["status"] == 504
+
+
+@pytest.mark.asyncio
+async def test_middleware_lifts_deadline_once_response_starts():
+    """Test a started response outlives the deadline, runs in the caller's task and
+    exempt paths get no deadline at all"""
+    tasks = []
+
+    async def streaming_app(scope, receive, send):
+        tasks.append(asyncio.current_task())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await asyncio.sleep(0.05)
+        await send({"type": "http.response.body", "body": deadline_var_state()})
+
+    def deadline_var_state():
+        return b"none" if deadline.deadline_var.get() is None else b"set"
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    with patch.object(settings, "request_deadline", 0.02):
+        await deadline.DeadlineMiddleware(streaming_app)({"type": "http", "path": "/trades"}, None, send)
+        assert tasks[0] is asyncio.current_task()
+        assert [m.get("status") for m in messages] == [200, None]
+        assert messages[1]["body"] == b"none"
+
+    assert deadline.budget_for("/health") is None
+    assert deadline.budget_for("/metrics") is None
+
+
+class Upstream:
+    """Serves requests in order with the given latencies (seconds)"""
+
+    def __init__(self, *latencies):
+        self.latencies = list(latencies)
+        self.calls = 0
+
+    async def handler(self, request):
+        latency = self.latencies[min(self.calls, len(self.latencies) - 1)]
+        self.calls += 1
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json={"latency": latency})
+
+
+@pytest.mark.asyncio
+async def test_slow_get_is_hedged():
+    """Test a GET slower than the hedge delay is sent again and the faster copy wins"""
+    upstream = Upstream(0.5, 0.01)
+    transport = HedgingTransport("core", httpx.MockTransport(upstream.handler), min_delay=0.01, max_delay=0.03)
+    async with httpx.AsyncClient(base_url="https://core.avantisfi.com", transport=transport) as http_client:
+        started = time.perf_counter()
+        response = await http_client.get("/user-data")
+    assert response.json() == {"latency": 0.01}
+    assert time.perf_counter() - started < 0.3
+    assert upstream.calls == 2
+    assert upstream_hedges.values[("core", "sent")] == 1
+    assert upstream_hedges.values[("core", "won")] == 1
+
+
+@pytest.mark.asyncio
+async def test_fast_gets_and_posts_are_not_hedged():
+    """Test hedging only applies to slow idempotent requests"""
+    upstream = Upstream(0.2)
+    transport = HedgingTransport("core", httpx.MockTransport(upstream.handler), min_delay=0.01, max_delay=0.05)
+    async with httpx.AsyncClient(base_url="https://core.avantisfi.com", transport=transport) as http_client:
+        await http_client.post("/orders", json={})
+    assert upstream.calls == 1
+
+    upstream = Upstream(0.001)
+    transport = HedgingTransport("core", httpx.MockTransport(upstream.handler), min_delay=0.01, max_delay=0.05)
+    async with httpx.AsyncClient(base_url="https://core.avantisfi.com", transport=transport) as http_client:
+        for _ in range(10):
+            await http_client.get("/user-data")
+    assert upstream.calls == 10
+    assert transport.hedge_delay() == 0.01
+    assert ("core", "sent") not in upstream_hedges.values
@@ -0,0 +1,192 @@
+"""
+Closed-trade history store tests
+"""
+import asyncio
+import time
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+from backend.src.config import settings
+from backend.src.deadline import deadline_var, within_deadline
+from backend.src.history_store import trade_id, trade_net_pnl
+from backend.src.index import app
+
+client = TestClient(app)
+
+ADDRESS = "0x1234567890123456789012345678901234567890"
+
+
+def _trade(n):
+    return {"_id": f"t{n}", "_mapped_netPnl": float(n % 7), "event": {"args": {"t": {"pairIndex": 0}}}}
+
+
+class FakeHistoryApi:
+    """Upstream stand-in serving newest-first pages of `page_size` trades."""
+
+    def __init__(self, count, page_size=3):
+        self.trades = [_trade(n) for n in range(count, 0, -1)]
+        self.page_size = page_size
+        self.requested = []
+
+    async def fetch_page(self, address, page_number):
+        self.requested.append(page_number)
+        start = (page_number - 1) * self.page_size
+        return self.trades[start:start + self.page_size]
+
+    def add(self, count):
+        newest = int(self.trades[0]["_id"][1:]) if self.trades else 0
+        self.trades = [_trade(n) for n in range(newest + count, newest, -1)] + self.trades
+
+
+def test_trade_helpers():
+    """Test trade ids and net PnL extraction"""
+    assert trade_id({"_id": "abc"}) == "abc"
+    assert trade_id({"x": 1}) == trade_id({"x": 1})
+    assert trade_net_pnl({"event": {"args": {"usdcSentToTrader": 150, "positionSizeUSDC": 100}}}) == 50.0
+    assert trade_net_pnl({}) is None
+
+
+@pytest.mark.asyncio
+async def test_sync_is_incremental(isolated_history_store):
+    """Test that later syncs only fetch pages newer than the stored trades"""
+    api = FakeHistoryApi(count=8)
+    with patch("backend.src.history_store.fetch_history_page", side_effect=api.fetch_page):
+        assert await isolated_history_store.sync(ADDRESS, force=True) == 8
+        # The first sync backfills, prefetching a window of pages past the end
+        assert api.requested[:4] == [1, 2, 3, 4]
+
+        api.requested.clear()
+        api.add(2)
+        assert await isolated_history_store.sync(ADDRESS, force=True) == 2
+        assert api.requested == [1]
+
+    trades, has_more = await isolated_history_store.page(ADDRESS, 1, 4)
+    assert [t["_id"] for t in trades] == ["t10", "t9", "t8", "t7"]
+    assert has_more
+    trades, has_more = await isolated_history_store.page(ADDRESS, 3, 4)
+    assert [t["_id"] for t in trades] == ["t2", "t1"]
+    assert not has_more
+
+
+@pytest.mark.asyncio
+async def test_sync_respects_interval(isolated_history_store):
+    """Test that recently synced addresses are served without upstream calls"""
+    api = FakeHistoryApi(count=2)
+    with patch("backend.src.history_store.fetch_history_page", side_effect=api.fetch_page):
+        await isolated_history_store.sync(ADDRESS)
+        api.requested.clear()
+        await isolated_history_store.sync(ADDRESS.lower())
+    assert api.requested == []
+
+
+@pytest.mark.asyncio
+async def test_top_trades_ranked_by_net_pnl(isolated_history_store):
+    """Test the local top-trades query"""
+    api = FakeHistoryApi(count=10)
+    with patch("backend.src.history_store.fetch_history_page", side_effect=api.fetch_page):
+        await isolated_history_store.sync(ADDRESS)
+    top = await isolated_history_store.top(ADDRESS, 3)
+    assert [t["_mapped_netPnl"] for t in top] == [6.0, 5.0, 4.0]
+
+
+@pytest.mark.asyncio
+async def test_stale_fallback_when_upstream_fails(isolated_history_store):
+    """Test that stored trades are served while the upstream is failing"""
+    api = FakeHistoryApi(count=2)
+    with patch("backend.src.history_store.fetch_history_page", side_effect=api.fetch_page):
+        await isolated_history_store.sync(ADDRESS)
+
+    down = AsyncMock(side_effect=httpx.ConnectError("down"))
+    with patch.object(settings, "history_sync_interval", 0), \
+            patch("backend.src.history_store.fetch_history_page", down):
+        assert await isolated_history_store.sync_or_stale(ADDRESS) is False
+        with pytest.raises(httpx.ConnectError):
+            await isolated_history_store.sync_or_stale("0x" + "9" * 40)
+    # One page for the known address, a prefetch window for the new one
+    assert down.await_count == 1 + settings.history_prefetch_window
+    trades, _ = await isolated_history_store.page(ADDRESS, 1, 10)
+    assert [t["_id"] for t in trades] == ["t2", "t1"]
+
+
+@patch.object(settings, "history_page_size", 2)
+@patch("backend.src.pair_metadata.get_trader_client")
+def test_history_endpoint_served_locally(mock_get_trader_client, sample_pair_data):
+    """Test exact hasMore and enrichment from the local store"""
+    api = FakeHistoryApi(count=3)
+    mock_trader_client = MagicMock()
+    mock_trader_client.pairs_cache.get_pairs_info = AsyncMock(return_value=sample_pair_data)
+    mock_get_trader_client.return_value = mock_trader_client
+
+    with patch("backend.src.history_store.fetch_history_page", side_effect=api.fetch_page):
+        first = client.get(f"/api/portfolio/history/{ADDRESS}/1").json()
+        requested = list(api.requested)
+        second = client.get(f"/api/portfolio/history/{ADDRESS}/2").json()
+
+    assert [t["_id"] for t in first["portfolio"]] == ["t3", "t2"]
+    assert first["hasMore"] is True
+    assert first["portfolio"][0]["pairInfo"] == {"from": "ETH", "to": "USD"}
+    assert [t["_id"] for t in second["portfolio"]] == ["t1"]
+    assert second["hasMore"] is False
+    assert requested[:2] == [1, 2]
+    assert api.requested == requested
+
+
+class SlowHistoryApi(FakeHistoryApi):
+    """FakeHistoryApi taking `delay` seconds per page."""
+
+    def __init__(self, count, page_size=3, delay=0.02):
+        super().__init__(count, page_size)
+        self.delay = delay
+
+    async def fetch_page(self, address, page_number):
+        await asyncio.sleep(self.delay)
+        return await super().fetch_page(address, page_number)
+
+
+@pytest.mark.asyncio
+async def test_long_history_backfills_across_deadlines(isolated_history_store):
+    """Test a history longer than one request's budget is stored page by page and resumed"""
+    api = SlowHistoryApi(count=3 * 60, delay=0.02)
+    stored = []
+    with patch("backend.src.history_store.fetch_history_page", side_effect=api.fetch_page), \
+            patch.object(settings, "history_prefetch_window", 1):
+        for _ in range(3):
+            token = deadline_var.set(time.monotonic() + 0.2)
+            try:
+                # Returns within the budget, serving what is stored so far
+                assert await within_deadline(isolated_history_store.sync_or_stale(ADDRESS)) is False
+            finally:
+                deadline_var.reset(token)
+            trades, _ = await isolated_history_store.page(ADDRESS, 1, 1000)
+            stored.append(len(trades))
+            # A cancelled backfill resumes from its cursor rather than page 1
+            isolated_history_store.close()
+
+        assert 0 < stored[0] < stored[1] < stored[2] < 180
+        api.requested.clear()
+        assert await isolated_history_store.sync(ADDRESS) > 0
+    # Page 1 for trades newer than the stored ones, then on from the cursor
+    assert api.requested[0] == 1 and api.requested[1] > 2
+    trades, has_more = await isolated_history_store.page(ADDRESS, 1, 1000)
+    assert [t["_id"] for t in trades] == [f"t{n}" for n in range(180, 0, -1)]
+    assert not has_more
+
+
+@patch.object(settings, "history_page_size", 50)
+@patch.object(settings, "history_backfill_wait", 0.05)
+@patch("backend.src.pair_metadata.get_trader_client")
+def test_history_has_more_while_backfill_runs(mock_get_trader_client, sample_pair_data):
+    """Test the last stored page still reports hasMore until the backfill is complete"""
+    api = SlowHistoryApi(count=3 * 40, delay=0.02)
+    mock_trader_client = MagicMock()
+    mock_trader_client.pairs_cache.get_pairs_info = AsyncMock(return_value=sample_pair_data)
+    mock_get_trader_client.return_value = mock_trader_client
+
+    with patch("backend.src.history_store.fetch_history_page", side_effect=api.fetch_page), \
+            patch.object(settings, "history_prefetch_window", 1):
+        response = client.get(f"/api/portfolio/history/{ADDRESS}/1")
+    body = response.json()
+    assert response.headers["X-Cache"] == "STALE"
+    assert 0 < len(body["portfolio"]) < 50
+    assert body["hasMore"] is True
@@ -0,0 +1,53 @@
+"""
+Shared upstream HTTP client tests
+"""
+import pytest
+from fastapi.testclient import TestClient
+from backend.src import http_clients
+from backend.src.config import settings
+from backend.src.index import app
+
+
+@pytest.fixture(autouse=True)
+def reset_clients():
+    http_clients._clients.clear()
+    yield
+    http_clients._clients.clear()
+
+
+def test_get_http_client_is_shared_per_host():
+    """Test that the same pooled client is returned for a host"""
+    core = http_clients.get_http_client(http_clients.CORE)
+    assert http_clients.get_http_client(http_clients.CORE) is core
+    assert http_clients.get_http_client(http_clients.HISTORY) is not core
+
+
+def test_get_http_client_uses_host_settings():
+    """Test that base URL and timeout come from settings"""
+    client = http_clients.get_http_client(http_clients.PRICE_FEED)
+    assert str(client.base_url).rstrip("/") == settings.price_feed_url
+    assert client.timeout.read == settings.price_feed_timeout
+
+
+def test_get_http_client_unknown_host():
+    """Test that unknown upstream names are rejected"""
+    with pytest.raises(ValueError):
+        http_clients.get_http_client("unknown")
+
+
+@pytest.mark.asyncio
+async def test_close_http_clients():
+    """Test that closing releases every client"""
+    client = http_clients.get_http_client(http_clients.CORE)
+    await http_clients.close_http_clients()
+    assert client.is_closed
+    assert http_clients._clients == {}
+
+
+def test_lifespan_opens_and_closes_clients():
+    """Test that the app lifespan manages the upstream clients"""
+    with TestClient(app):
+        opened = dict(http_clients._clients)
+        assert set(opened) == {http_clients.CORE, http_clients.HISTORY, http_clients.PRICE_FEED, http_clients.RPC}
+    assert all(c.is_closed for c in opened.values())
+    assert http_clients._clients == {}
@@ -0,0 +1,125 @@
+"""
+Prometheus metrics tests
+"""
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+from backend.src.index import app
+from backend.src.metrics import (
+    Histogram,
+    InstrumentedTransport,
+    endpoint_template,
+    http_request_duration,
+    record_cache,
+    render,
+    sdk_call,
+    sdk_call_duration,
+    upstream_request_duration,
+)
+from backend.src.user_data import user_data_cache
+
+client = TestClient(app)
+
+TRADER = "0x1234567890123456789012345678901234567890"
+
+
+def test_histogram_buckets_are_cumulative():
+    """Test bucket placement, sum and count in the text output"""
+    histogram = Histogram("test_seconds", "Test.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.1, "/a")
+    histogram.observe(3.0, "/a")
+    lines = histogram.render()
+    assert 'test_seconds_bucket{route="/a",le="0.1"} 2' in lines
+    assert 'test_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'test_seconds_sum{route="/a"} 3.15' in lines
+    assert 'test_seconds_count{route="/a"} 3' in lines
+
+
+def test_endpoint_template_collapses_ids():
+    """Test that addresses and numbers do not create one series each"""
+    assert endpoint_template(f"/api/portfolio/win-rate/{TRADER}") == "/api/portfolio/win-rate/{address}"
+    assert endpoint_template(f"/api/{TRADER}/history/2") == "/api/{address}/history/{n}"
+    assert endpoint_template("/v2/last-price") == "/v2/last-price"
+
+
+def test_route_latency_uses_route_template():
+    """Test that requests are labelled by route template and status"""
+    client.get("/health")
+    client.get("/pairs?pidx=abc")
+    client.get("/no-such-route")
+    series = set(http_request_duration.series)
+    assert ("GET", "/health", "200") in series
+    assert ("GET", "/pairs", "422") in series
+    assert ("GET", "unmatched", "404") in series
+
+
+def test_metrics_endpoint_exposition():
+    """Test the text format and the cache hit ratio"""
+    record_cache("user_data", "hit")
+    record_cache("user_data", "hit")
+    record_cache("user_data", "stale")
+    record_cache("user_data", "miss")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE lattice_http_request_duration_seconds histogram" in body
+    assert 'lattice_cache_requests_total{cache="user_data",result="hit"} 2.0' in body
+    assert 'lattice_cache_hit_ratio{cache="user_data"} 0.75' in body
+    assert "lattice_http_requests_in_flight" in body
+
+
+def test_sdk_call_records_outcome():
+    """Test that builder failures are recorded separately"""
+    with sdk_call("build_order_cancel_tx"):
+        pass
+    with pytest.raises(RuntimeError):
+        with sdk_call("build_order_cancel_tx"):
+            raise RuntimeError("revert")
+    assert set(sdk_call_duration.series) == {("build_order_cancel_tx", "ok"), ("build_order_cancel_tx", "error")}
+
+
+@patch("backend.src.index.get_trader_client")
+def test_builder_route_records_sdk_latency(mock_get_trader_client):
+    """Test the tx builder routes time their SDK call"""
+    trader_client = MagicMock()
+    trader_client.trade.build_order_cancel_tx = AsyncMock(return_value={"to": "0xabc", "data": "0x"})
+    mock_get_trader_client.return_value = trader_client
+
+    response = client.post("/orders/cancel", json={"trader_address": TRADER, "pair_index": 0, "trade_index": 0})
+    assert response.status_code == 200
+    assert ("build_order_cancel_tx", "ok") in sdk_call_duration.series
+
+
+@pytest.mark.asyncio
+async def test_instrumented_transport():
+    """Test upstream latency per host, endpoint and status"""
+    def handler(request):
+        return httpx.Response(503 if request.url.path.endswith("/down") else 200, json={})
+
+    transport = InstrumentedTransport("core", httpx.MockTransport(handler))
+    async with httpx.AsyncClient(base_url="https://core.avantisfi.com", transport=transport) as http_client:
+        await http_client.get(f"/user-data/{TRADER}")
+        await http_client.get("/down")
+    assert set(upstream_request_duration.series) == {
+        ("core", "/user-data/{address}", "200"),
+        ("core", "/down", "503"),
+    }
+
+
+@pytest.mark.asyncio
+@patch("backend.src.user_data.get_http_client")
+async def test_user_data_cache_counts(mock_get_http_client, sample_trade_data):
+    """Test that cache lookups are counted as miss then hit"""
+    mock_http_client = MagicMock()
+    mock_http_client.get = AsyncMock(return_value=httpx.Response(
+        200, json=sample_trade_data, request=httpx.Request("GET", "https://core.avantisfi.com/user-data")
+    ))
+    mock_get_http_client.return_value = mock_http_client
+
+    await user_data_cache.get(TRADER)
+    await user_data_cache.get(TRADER)
+    assert 'lattice_cache_hit_ratio{cache="user_data"} 0.5' in render()
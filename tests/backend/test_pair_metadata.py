@@ -0,0 +1,72 @@
+"""
+Pair metadata index tests
+"""
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+from backend.src.index import app
+from backend.src.pair_metadata import PairMetadataIndex, build_pair_meta, pair_metadata
+
+client = TestClient(app)
+
+
+def _history_trade(pair_index):
+    return {"event": {"args": {"t": {"pairIndex": pair_index}}}}
+
+
+def test_build_pair_meta_from_dict(sample_pair_data):
+    """Test reading plain dict pair info"""
+    meta = build_pair_meta(0, sample_pair_data["0"])
+    assert (meta.pair_index, meta.from_, meta.to, meta.feed_id) == (0, "ETH", "USD", "test-feed-id")
+    assert meta.name == "ETH/USD"
+
+
+def test_build_pair_meta_from_model():
+    """Test reading SDK-style model attributes"""
+    info = SimpleNamespace(from_="BTC", to="USD", feed=SimpleNamespace(feed_id="0xabc"))
+    meta = build_pair_meta(1, info)
+    assert (meta.from_, meta.to, meta.feed_id) == ("BTC", "USD", "0xabc")
+
+
+def test_sync_rebuilds_only_on_change(sample_pair_data):
+    """Test that the index is rebuilt once per pairs info version"""
+    index = PairMetadataIndex()
+    index.sync(sample_pair_data)
+    index.sync(sample_pair_data)
+    assert index.version == 1
+    assert index.get(0).from_ == "ETH"
+
+    sample_pair_data["1"] = {"from": "BTC", "to": "USD"}
+    index.sync(sample_pair_data)
+    assert index.version == 2
+    assert index.get(1).name == "BTC/USD"
+
+
+def test_enrich_trades(sample_pair_data):
+    """Test that trades get pairInfo and unknown pairs are left alone"""
+    index = PairMetadataIndex()
+    index.sync(sample_pair_data)
+    trades = index.enrich_trades([_history_trade(0), _history_trade(7), {"event": None}])
+    assert trades[0]["pairInfo"] == {"from": "ETH", "to": "USD"}
+    assert "pairInfo" not in trades[1]
+    assert "pairInfo" not in trades[2]
+
+
+@patch("backend.src.pair_metadata.get_trader_client")
+@patch("backend.src.history_store.fetch_history_page")
+def test_top_trades_enrichment(mock_fetch_page, mock_get_trader_client, sample_pair_data):
+    """Test that top trades are enriched from the metadata index"""
+    trades = [dict(_history_trade(0), _id="a", _mapped_netPnl=5), dict(_history_trade(3), _id="b", _mapped_netPnl=1)]
+    mock_fetch_page.side_effect = lambda address, page: trades if page == 1 else []
+
+    mock_trader_client = MagicMock()
+    mock_trader_client.pairs_cache.get_pairs_info = AsyncMock(return_value=sample_pair_data)
+    mock_get_trader_client.return_value = mock_trader_client
+
+    response = client.get("/api/portfolio/top-trades/0xabc")
+    assert response.status_code == 200
+    data = response.json()
+    assert data[0]["pairInfo"] == {"from": "ETH", "to": "USD"}
+    assert "pairInfo" not in data[1]
+    assert pair_metadata.get(0).feed_id == "test-feed-id"
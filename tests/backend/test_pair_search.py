@@ -0,0 +1,132 @@
+"""
+Pair search index tests
+"""
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from backend.src.index import app
+from backend.src.pair_metadata import pair_metadata
+from backend.src.pair_search import normalize, pair_search
+from backend.src.tx_batch import TxBuildContext
+
+client = TestClient(app)
+
+PAIRS = {
+    "0": {"from": "ETH", "to": "USD", "pairIndex": 0},
+    "1": {"from": "BTC", "to": "USD", "pairIndex": 1},
+    "2": {"from": "ETHFI", "to": "USD", "pairIndex": 2},
+    "3": {"from": "SOL", "to": "USD", "pairIndex": 3},
+    "4": {"from": "EUR", "to": "USD", "pairIndex": 4},
+    "5": {"from": "ETH", "to": "BTC", "pairIndex": 5},
+    "6": {"from": "DOGE", "to": "USD", "pairIndex": 6},
+}
+
+
+@pytest.fixture
+def pairs():
+    pair_metadata.sync(PAIRS)
+
+
+def _names(hits):
+    return [hit.meta.name for hit in hits]
+
+
+def test_normalize_aliases():
+    """Test separators and case are ignored"""
+    assert normalize("eth-usd") == normalize("ETH/USD") == normalize(" ETH_usd ") == "ETHUSD"
+
+
+def test_resolve_lenient_names(pairs):
+    """Test full names in any spelling, and base symbols defaulting to USD"""
+    assert pair_search.resolve("ETH/USD") == 0
+    assert pair_search.resolve("eth-usd") == 0
+    assert pair_search.resolve("ETHUSD") == 0
+    assert pair_search.resolve("eth/btc") == 5
+    assert pair_search.resolve("ETH") == 0
+    assert pair_search.resolve("doge") == 6
+    # No guessing past typos when building txs
+    assert pair_search.resolve("ETHH/USD") is None
+    assert pair_search.resolve("XRP") is None
+
+
+def test_search_ranks_exact_then_prefix_then_fuzzy(pairs):
+    """Test match order and kinds"""
+    hits = pair_search.search("eth", 10)
+    assert _names(hits)[:3] == ["ETH/USD", "ETH/BTC", "ETHFI/USD"]
+    assert [hit.match for hit in hits[:3]] == ["exact", "exact", "prefix"]
+
+    assert _names(pair_search.search("ethusd", 10))[0] == "ETH/USD"
+    assert _names(pair_search.search("usd", 10)) == [
+        "ETH/USD", "BTC/USD", "SOL/USD", "EUR/USD", "DOGE/USD", "ETHFI/USD"
+    ]
+
+    hits = pair_search.search("btcc", 10)
+    assert hits[0].meta.name == "BTC/USD"
+    assert hits[0].match == "fuzzy"
+    assert pair_search.search("xyz", 10) == []
+    assert len(pair_search.search("e", 2)) == 2
+
+
+def test_index_follows_pairs_info_version(pairs):
+    """Test the index is rebuilt when pair metadata is"""
+    assert pair_search.resolve("ADA") is None
+    pair_metadata.sync({**PAIRS, "7": {"from": "ADA", "to": "USD", "pairIndex": 7}})
+    assert pair_search.resolve("ADA") == 7
+
+
+def test_search_latency_is_bounded():
+    """Test a long fuzzy query over a large pair list stays fast"""
+    pair_metadata.sync({
+        str(i): {"from": f"TOKEN{i}", "to": "USD", "pairIndex": i} for i in range(1000)
+    })
+    pair_search.search("warmup", 10)
+    started = time.perf_counter()
+    pair_search.search("TOKNE42USDX" * 10, 10)
+    assert time.perf_counter() - started < 0.25
+
+
+@pytest.mark.asyncio
+async def test_pairs_sharing_a_name_are_all_kept():
+    """Test two pairs normalizing to one name are both searchable and never guessed between"""
+    pair_metadata.sync({**PAIRS, "9": {"from": "eth", "to": "usd", "pairIndex": 9}})
+    assert pair_search.matches("ETH/USD") == [0, 9]
+    assert pair_search.resolve("ETH/USD") is None
+    assert {hit.meta.pair_index for hit in pair_search.search("ethusd", 10) if hit.match == "exact"} == {0, 9}
+
+    trader_client = MagicMock()
+    trader_client.pairs_cache.get_pair_index = AsyncMock(return_value=42)
+    with pytest.raises(HTTPException) as exc_info:
+        await TxBuildContext(trader_client).resolve_pair_index("eth-usd", None)
+    assert exc_info.value.status_code == 400
+    trader_client.pairs_cache.get_pair_index.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_builders_resolve_without_sdk(pairs):
+    """Test lenient pair names resolve from the index, not the SDK"""
+    trader_client = MagicMock()
+    trader_client.pairs_cache.get_pair_index = AsyncMock(return_value=42)
+    ctx = TxBuildContext(trader_client)
+    assert await ctx.resolve_pair_index("sol-usd", None) == 3
+    assert await ctx.resolve_pair_index("BTC", None) == 1
+    trader_client.pairs_cache.get_pair_index.assert_not_awaited()
+
+
+@patch("backend.src.pair_metadata.get_trader_client")
+def test_search_endpoint(mock_get_trader_client):
+    """Test /pairs/search loads pairs info and returns ranked results"""
+    trader_client = MagicMock()
+    trader_client.pairs_cache.get_pairs_info = AsyncMock(return_value=PAIRS)
+    mock_get_trader_client.return_value = trader_client
+
+    response = client.get("/pairs/search", params={"q": "sol", "limit": 3})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["query"] == "sol"
+    assert body["results"][0] == {"pairIndex": 3, "name": "SOL/USD", "from": "SOL", "to": "USD", "match": "exact"}
+    assert len(body["results"]) <= 3
+
+    response = client.get("/pairs/search")
+    assert response.status_code == 422
@@ -0,0 +1,82 @@
+"""
+Pre-encoded /pairs payload tests
+"""
+import gzip
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+from backend.src.index import app
+from backend.src.pairs_payload import PairsPayload
+
+client = TestClient(app)
+
+
+def _mock_pairs(mock_get_client, pairs):
+    mock_client = MagicMock()
+    mock_client.pairs_cache.get_pairs_info = AsyncMock(return_value=pairs)
+    mock_get_client.return_value = mock_client
+
+
+def test_rebuild_only_on_new_version(sample_pair_data):
+    """Test that bodies are encoded once per pairs-info version"""
+    payload = PairsPayload()
+    payload.sync(sample_pair_data, 1)
+    first = payload.variants
+    payload.sync(sample_pair_data, 1)
+    assert payload.variants is first
+    payload.sync({**sample_pair_data, "1": {"from": "BTC", "to": "USD"}}, 2)
+    assert payload.variants is not first
+    assert set(payload.by_pair) == {0, 1}
+
+
+def test_body_matches_json_encoding(sample_pair_data):
+    """Test that the assembled body is what FastAPI would have produced"""
+    payload = PairsPayload()
+    payload.sync(sample_pair_data, 1)
+    assert json.loads(payload.variants["identity"].body) == sample_pair_data
+    assert gzip.decompress(payload.variants["gzip"].body) == payload.variants["identity"].body
+    assert json.loads(payload.by_pair[0].body) == sample_pair_data["0"]
+    assert len({v.etag for v in payload.variants.values()}) == len(payload.variants)
+
+
+@patch("backend.src.pair_metadata.get_trader_client")
+def test_pairs_etag_and_not_modified(mock_get_client, sample_pair_data):
+    """Test strong ETags and 304 for a matching If-None-Match"""
+    _mock_pairs(mock_get_client, sample_pair_data)
+
+    response = client.get("/pairs", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.json() == sample_pair_data
+    etag = response.headers["etag"]
+    assert not etag.startswith("W/")
+
+    cached = client.get("/pairs", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    weak = client.get("/pairs", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert weak.status_code == 304
+    assert client.get("/pairs", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+@patch("backend.src.pair_metadata.get_trader_client")
+def test_pairs_gzip_variant(mock_get_client, sample_pair_data):
+    """Test the precompressed variant for gzip-accepting clients"""
+    _mock_pairs(mock_get_client, sample_pair_data)
+
+    response = client.get("/pairs", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"].startswith("Accept-Encoding")
+    assert response.json() == sample_pair_data
+
+
+@patch("backend.src.pair_metadata.get_trader_client")
+def test_single_pair_slice(mock_get_client, sample_pair_data):
+    """Test that ?pidx= is served from its own pre-encoded slice"""
+    _mock_pairs(mock_get_client, sample_pair_data)
+
+    response = client.get("/pairs?pidx=0")
+    assert response.status_code == 200
+    assert response.json() == sample_pair_data["0"]
+    assert client.get("/pairs?pidx=0", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+    assert client.get("/pairs?pidx=7").status_code == 404
@@ -0,0 +1,82 @@
+"""
+Cold-start pairs snapshot tests
+"""
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+from backend.src import pairs_snapshot
+from backend.src.index import app
+from backend.src.pair_metadata import pair_metadata
+from backend.src.pairs_snapshot import SnapshotError, read_snapshot, write_snapshot
+from backend.src.tx_batch import TxBuildContext
+
+client = TestClient(app)
+
+
+def test_snapshot_round_trip(tmp_path, sample_pair_data):
+    """Test that a written snapshot reads back as the same pairs info"""
+    path = str(tmp_path / "pairs.json")
+    write_snapshot(path, sample_pair_data)
+    assert read_snapshot(path) == sample_pair_data
+    assert json.loads(open(path, "rb").read())["format"] == pairs_snapshot.SNAPSHOT_FORMAT
+    assert read_snapshot(str(tmp_path / "missing.json")) is None
+
+
+def test_snapshot_rejects_unknown_format(tmp_path):
+    """Test that snapshots from another format version are refused"""
+    path = tmp_path / "pairs.json"
+    path.write_text(json.dumps({"format": 999, "pairs": {}}))
+    with pytest.raises(SnapshotError):
+        read_snapshot(str(path))
+
+
+@patch("backend.src.pair_metadata.get_trader_client")
+def test_pairs_served_from_snapshot_while_sdk_is_cold(mock_get_trader_client, tmp_path, sample_pair_data):
+    """Test /pairs answers from the snapshot and the SDK cache loads in the background"""
+    path = str(tmp_path / "pairs.json")
+    write_snapshot(path, sample_pair_data)
+    live = {**sample_pair_data, "1": {"from": "BTC", "to": "USD", "pairIndex": 1, "feed": {"feedId": "btc"}}}
+    trader_client = MagicMock()
+    trader_client.pairs_cache.get_pairs_info = AsyncMock(return_value=live)
+    mock_get_trader_client.return_value = trader_client
+
+    assert pair_metadata.load_snapshot(path)
+    assert pair_metadata.get(0).feed_id == "test-feed-id"
+
+    response = client.get("/pairs")
+    assert response.status_code == 200
+    assert response.json() == sample_pair_data
+
+    # The background load has run by the next request, which is served live
+    response = client.get("/pairs")
+    assert response.json() == live
+    assert pair_metadata.live
+
+
+@pytest.mark.asyncio
+async def test_pair_names_resolve_from_snapshot(tmp_path, sample_pair_data):
+    """Test that pair names resolve without touching the SDK pairs cache"""
+    path = str(tmp_path / "pairs.json")
+    write_snapshot(path, sample_pair_data)
+    pair_metadata.load_snapshot(path)
+
+    trader_client = MagicMock()
+    trader_client.pairs_cache.get_pair_index = AsyncMock(return_value=42)
+    ctx = TxBuildContext(trader_client)
+    assert await ctx.resolve_pair_index("eth/usd", None) == 0
+    assert await ctx.resolve_pair_index("BTC/USD", None) == 42
+    trader_client.pairs_cache.get_pair_index.assert_awaited_once_with("BTC/USD")
+
+
+@patch("backend.src.pairs_snapshot.get_trader_client")
+def test_cli_writes_snapshot(mock_get_trader_client, tmp_path, sample_pair_data):
+    """Test the snapshot CLI"""
+    trader_client = MagicMock()
+    trader_client.pairs_cache.get_pairs_info = AsyncMock(return_value=sample_pair_data)
+    mock_get_trader_client.return_value = trader_client
+    path = str(tmp_path / "out" / "pairs.json")
+
+    with patch("sys.argv", ["pairs_snapshot", "--output", path]):
+        pairs_snapshot.main()
+    assert read_snapshot(path) == sample_pair_data
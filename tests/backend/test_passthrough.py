@@ -0,0 +1,101 @@
+"""
+Zero-copy pass-through response tests
+"""
+import gzip
+import json
+import httpx
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+from backend.src.config import settings
+from backend.src.index import app
+from backend.src.passthrough import RawPayload, accepts_encoding, fetch_raw, passthrough_response
+
+client = TestClient(app)
+
+ADDRESS = "0x1234567890123456789012345678901234567890"
+BODY = json.dumps({"success": True, "data": [{"total": 12}]}).encode()
+
+
+def _request(accept_encoding):
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def _gzip_client(upstream_response, seen=None):
+    def handler(request):
+        if seen is not None:
+            seen.append(request)
+        return upstream_response(content=gzip.compress(BODY), headers={"content-encoding": "gzip"})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://api.avantisfi.com")
+
+
+def test_accepts_encoding():
+    """Test Accept-Encoding parsing, including q=0 and wildcards"""
+    assert accepts_encoding(_request("gzip, deflate, br"), "gzip")
+    assert not accepts_encoding(_request("gzip;q=0, br"), "gzip")
+    assert accepts_encoding(_request("*"), "deflate")
+    assert not accepts_encoding(_request(None), "gzip")
+    assert not accepts_encoding(None, "gzip")
+
+
+@pytest.mark.asyncio
+async def test_fetch_raw_keeps_upstream_encoding(upstream_response):
+    """Test that the body is kept compressed, exactly as received"""
+    seen = []
+    payload = await fetch_raw(_gzip_client(upstream_response, seen), "/v1/history/portfolio/win-rate/x")
+    assert payload.content_encoding == "gzip"
+    assert payload.body == gzip.compress(BODY)
+    assert payload.decoded() == BODY
+    assert payload.json()["data"][0]["total"] == 12
+    assert seen[0].headers["accept-encoding"] == "gzip, deflate"
+
+
+@pytest.mark.asyncio
+async def test_fetch_raw_raises_for_status(upstream_response):
+    """Test that upstream errors surface as HTTPStatusError"""
+    transport = httpx.MockTransport(lambda request: upstream_response({"error": "nope"}, status_code=404))
+    async with httpx.AsyncClient(transport=transport, base_url="https://api.avantisfi.com") as http:
+        with pytest.raises(httpx.HTTPStatusError):
+            await fetch_raw(http, "/missing")
+
+
+def test_passthrough_response_encoding_negotiation():
+    """Test compressed bodies are forwarded when accepted and decoded otherwise"""
+    payload = RawPayload(gzip.compress(BODY), "application/json", "gzip")
+
+    accepted = passthrough_response(payload, _request("gzip"))
+    assert accepted.body == payload.body
+    assert accepted.headers["content-encoding"] == "gzip"
+    assert accepted.headers["vary"] == "Accept-Encoding"
+
+    plain = passthrough_response(payload, _request("identity"))
+    assert plain.body == BODY
+    assert "content-encoding" not in plain.headers
+
+
+@patch.object(settings, "passthrough_stream_threshold", 16)
+@patch.object(settings, "passthrough_chunk_size", 8)
+@patch("backend.src.index.get_http_client")
+def test_large_bodies_are_streamed_in_chunks(mock_get_http_client, upstream_response):
+    """Test chunked transfer for bodies above the threshold"""
+    mock_get_http_client.return_value = _gzip_client(upstream_response)
+
+    response = client.get(f"/api/portfolio/win-rate/{ADDRESS}", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert "content-length" not in response.headers  # framed as chunked by the server
+    assert response.content == BODY
+    assert response.headers["X-Cache"] == "MISS"
+
+
+@patch("backend.src.index.get_http_client")
+def test_proxy_route_forwards_compressed_body(mock_get_http_client, upstream_response):
+    """Test that a gzip-accepting client gets the upstream bytes unchanged"""
+    mock_get_http_client.return_value = _gzip_client(upstream_response)
+
+    response = client.get(f"/api/portfolio/profit-loss/{ADDRESS}", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == json.loads(BODY)
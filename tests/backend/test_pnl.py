@@ -0,0 +1,287 @@
+"""
+Vectorized PnL engine tests
+"""
+import math
+import random
+import httpx
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+from backend.src.circuit_breaker import get_breaker
+from backend.src.http_clients import CORE, PRICE_FEED
+from backend.src.index import app
+from backend.src.pnl import (
+    PNL_FEES_P,
+    PNL_TIERS_P,
+    compute_pnl,
+    liquidation_prices,
+    pnl_based_fee,
+    positions_to_arrays,
+)
+from backend.src.user_data import user_data_cache
+
+client = TestClient(app)
+
+
+# Line-by-line ports of frontend/src/utils/pnlCalculations.ts used as the reference
+def ts_get_pnl_based_fee(collateral, percent_profit):
+    if percent_profit < 0:
+        return 0
+    i = 0
+    while i < len(PNL_TIERS_P):
+        if percent_profit < int(PNL_TIERS_P[i]):
+            break
+        i += 1
+    if i == len(PNL_TIERS_P):
+        i -= 1
+    pnl = (int(collateral) * int(percent_profit)) // 10**10 // 100
+    fee = (int(PNL_FEES_P[i]) * pnl) // 10**10 // 100
+    return float(fee)
+
+
+def ts_calculate_pnl(p, price_val):
+    current_price = price_val * 1e10
+    open_price, collateral, leverage = float(p["openPrice"]), float(p["collateral"]), float(p["leverage"])
+    shares = ((leverage * collateral) / open_price) / 1e6
+    diff = (current_price - open_price) if p["buy"] else (open_price - current_price)
+    if not p["isPnl"]:
+        closing_fee = ((450000000 / 1e10) * collateral * leverage) / 1e18
+        rollover_fee = float(p["rolloverFee"]) / 1e6
+        gross_pnl_percent = (diff * shares) / collateral / 100
+        gross_pnl = (diff / 1e10) * shares
+        net_pnl = gross_pnl - closing_fee - rollover_fee
+        return {
+            "grossPnlPercent": gross_pnl_percent,
+            "grossPnl": gross_pnl,
+            "closingFee": closing_fee,
+            "rolloverFee": rollover_fee,
+            "netPnlPercent": (net_pnl / (collateral / 1e6)) * 100,
+            "netPnl": net_pnl,
+        }
+    gross_pnl_percent = math.floor(((diff * shares) / collateral) * 1e8)
+    gross_pnl = (gross_pnl_percent / 1e12) * collateral
+    fee = ts_get_pnl_based_fee(collateral, gross_pnl_percent)
+    net_pnl = (gross_pnl_percent / 1e12) * collateral - fee
+    return {
+        "grossPnl": gross_pnl / 1e6,
+        "grossPnlPercent": gross_pnl_percent / 1e10,
+        "pnlPercent": ((net_pnl / (collateral / 1e6)) * 100) / 1e6,
+        "fee": fee / 1e6,
+        "pnl": net_pnl / 1e6,
+    }
+
+
+def _random_position(rng, pair_index):
+    open_price = rng.uniform(0.5, 90000)
+    return {
+        "pairIndex": pair_index,
+        "index": 0,
+        "openPrice": int(open_price * 1e10),
+        "collateral": rng.randint(5, 500000) * 10**6 + rng.randint(0, 999999),
+        "leverage": rng.choice([2, 5, 10, 25, 75, 250, 500]) * 10**10,
+        "rolloverFee": rng.randint(0, 5 * 10**6),
+        "buy": rng.random() < 0.5,
+        "isPnl": rng.random() < 0.5,
+    }, open_price * rng.uniform(0.7, 1.5)
+
+
+def test_pnl_based_fee_tiers_match_reference():
+    """Test searchsorted tiers and exact BigInt fee arithmetic"""
+    collateral = np.array([10**9, 10**12, 123456789012, 10**9, 10**9, 10**9, 5 * 10**11], dtype=np.int64)
+    percent = np.array([-5, 10**10 - 1, 10**10, 2 * 10**12, 3 * 10**13, 10**15, 987654321098], dtype=np.int64)
+    expected = [ts_get_pnl_based_fee(c, p) for c, p in zip(collateral, percent)]
+    assert pnl_based_fee(collateral, percent).tolist() == expected
+
+
+def test_compute_pnl_matches_typescript_formulas_exactly():
+    """Test bit-identical results against the frontend formulas"""
+    rng = random.Random(7)
+    samples = [_random_position(rng, i) for i in range(500)]
+    positions = [p for p, _ in samples]
+    prices = np.array([price for _, price in samples])
+
+    result = compute_pnl(positions_to_arrays(positions), prices)
+    for i, (position, price) in enumerate(samples):
+        for key, value in ts_calculate_pnl(position, price).items():
+            assert result[key][i] == value, (i, key)
+
+
+def test_liquidation_price_matches_market_detail_formula():
+    """Test the vectorized full-loss liquidation price"""
+    positions = [
+        {"pairIndex": 0, "openPrice": 2000 * 10**10, "collateral": 100 * 10**6, "leverage": 10 * 10**10, "rolloverFee": 0, "buy": True, "isPnl": False},
+        {"pairIndex": 0, "openPrice": 2000 * 10**10, "collateral": 100 * 10**6, "leverage": 10 * 10**10, "rolloverFee": 10**6, "buy": False, "isPnl": True},
+    ]
+    liq = liquidation_prices(positions_to_arrays(positions))
+    adjusted = 100 - 100 * 10 * 0.00045
+    assert liq[0] == 2000 - (2000 * ((adjusted * 85) / 100 - 0)) / (adjusted * 10)
+    assert liq[1] == 2000 + (2000 * ((100 * 85) / 100 - 1)) / (100 * 10)
+
+
+@patch("backend.src.price_snapshot.get_http_client")
+@patch("backend.src.user_data.get_http_client")
+def test_pnl_endpoint(mock_core, mock_feed):
+    """Test the endpoint over cached user data and the price snapshot"""
+    positions = [
+        {"pairIndex": 0, "index": 0, "openPrice": 2000 * 10**10, "collateral": 100 * 10**6, "leverage": 10 * 10**10, "rolloverFee": 0, "buy": True, "isPnl": False},
+        {"pairIndex": 9, "index": 1, "openPrice": 5 * 10**10, "collateral": 50 * 10**6, "leverage": 5 * 10**10, "rolloverFee": 0, "buy": True, "isPnl": True},
+    ]
+    core_response = MagicMock()
+    core_response.json.return_value = {"positions": positions, "limitOrders": []}
+    mock_core.return_value = MagicMock(get=AsyncMock(return_value=core_response))
+    feed_response = MagicMock()
+    feed_response.json.return_value = [{"pairIndex": 0, "c": 2200.0}]
+    mock_feed.return_value = MagicMock(get=AsyncMock(return_value=feed_response))
+
+    from backend.src.price_snapshot import price_snapshot
+    price_snapshot.updated_at = None
+    response = client.get("/api/portfolio/pnl/0x1234567890123456789012345678901234567890")
+    price_snapshot.updated_at = None
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["positionCount"] == 2
+    assert data["pricedPositionCount"] == 1
+    first, second = data["positions"]
+    assert first["type"] == "nonZeroFeePerp"
+    assert first["netPnl"] == ts_calculate_pnl(positions[0], 2200.0)["netPnl"]
+    assert data["totalNetPnl"] == first["netPnl"]
+    assert data["portfolioValue"] == 150.0
+    assert second["type"] is None and second["currentPrice"] is None
+
+
+def test_owner_totals_match_per_address_computation():
+    """Test the stacked pass against computing each address separately"""
+    from backend.src.pnl import owner_totals, pnl_totals, prices_for, stack_positions
+
+    rng = random.Random(11)
+    by_pair = {i: {"pairIndex": i, "c": rng.uniform(1, 1000)} for i in range(5)}
+    traders = [[_random_position(rng, rng.randrange(5))[0] for _ in range(n)] for n in (3, 0, 7)]
+
+    arrays, owner = stack_positions(traders)
+    result = compute_pnl(arrays, prices_for(arrays, by_pair))
+    totals = owner_totals(arrays, owner, len(traders), result)
+
+    for i, positions in enumerate(traders):
+        single = positions_to_arrays(positions)
+        expected = pnl_totals(single, compute_pnl(single, prices_for(single, by_pair)))
+        assert totals["totalNetPnl"][i] == pytest.approx(expected["totalNetPnl"])
+        assert totals["positionCount"][i] == len(positions)
+
+
+@patch("backend.src.price_snapshot.get_http_client")
+@patch("backend.src.user_data.get_http_client")
+def test_pnl_batch_endpoint_ranks_addresses(mock_core, mock_feed):
+    """Test per-address totals, the leaderboard and failed addresses"""
+    def position(open_price, buy):
+        return {"pairIndex": 0, "index": 0, "openPrice": open_price * 10**10, "collateral": 100 * 10**6,
+                "leverage": 10 * 10**10, "rolloverFee": 0, "buy": buy, "isPnl": False}
+
+    user_data = {
+        "0xaaa": {"positions": [position(2000, True)]},
+        "0xbbb": {"positions": [position(2000, False)]},
+        "0xccc": {"positions": [position(1000, True), position(1500, True)]},
+    }
+
+    async def core_get(path, params):
+        trader = params["trader"]
+        if trader not in user_data:
+            raise RuntimeError("unknown trader")
+        response = MagicMock()
+        response.json.return_value = user_data[trader]
+        return response
+
+    mock_core.return_value = MagicMock(get=AsyncMock(side_effect=core_get))
+    feed_response = MagicMock()
+    feed_response.json.return_value = [{"pairIndex": 0, "c": 2100.0}]
+    mock_feed.return_value = MagicMock(get=AsyncMock(return_value=feed_response))
+
+    from backend.src.price_snapshot import price_snapshot
+    price_snapshot.updated_at = None
+    response = client.post("/api/portfolio/pnl/batch", json={"addresses": ["0xaaa", "0xbbb", "0xccc", "0xddd"]})
+    price_snapshot.updated_at = None
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [row["address"] for row in data["leaderboard"]] == ["0xccc", "0xaaa", "0xbbb"]
+    assert data["leaderboard"][0]["rank"] == 1
+    assert data["results"]["0xccc"]["positionCount"] == 2
+    assert data["results"]["0xaaa"]["exposure"] == 1000.0
+    assert set(data["errors"]) == {"0xddd"}
+
+
+@patch("backend.src.price_snapshot.get_http_client")
+@patch("backend.src.user_data.get_http_client")
+def test_pnl_endpoint_open_circuit_returns_503(mock_core, mock_feed):
+    """Test that an open core circuit without cached user data fails fast"""
+    breaker = get_breaker(CORE)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    feed_response = MagicMock()
+    feed_response.json.return_value = [{"pairIndex": 0, "c": 2200.0}]
+    mock_feed.return_value = MagicMock(get=AsyncMock(return_value=feed_response))
+
+    from backend.src.price_snapshot import price_snapshot
+    price_snapshot.updated_at = None
+    response = client.get("/api/portfolio/pnl/0x1234567890123456789012345678901234567890")
+    price_snapshot.updated_at = None
+
+    assert response.status_code == 503
+    mock_core.assert_not_called()
+
+
+@patch("backend.src.price_snapshot.get_http_client")
+@patch("backend.src.user_data.get_http_client")
+def test_pnl_batch_endpoint_open_circuit_returns_503(mock_core, mock_feed):
+    """Test that an open price feed circuit without a snapshot fails the batch fast"""
+    breaker = get_breaker(PRICE_FEED)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    core_response = MagicMock()
+    core_response.json.return_value = {"positions": [], "limitOrders": []}
+    mock_core.return_value = MagicMock(get=AsyncMock(return_value=core_response))
+
+    from backend.src.price_snapshot import price_snapshot
+    price_snapshot.updated_at = None
+    response = client.post("/api/portfolio/pnl/batch", json={"addresses": ["0xaaa", "0xbbb"]})
+
+    assert response.status_code == 503
+    mock_feed.assert_not_called()
+
+
+@patch.object(user_data_cache, "stale_ttl", 60.0)
+@patch.object(user_data_cache, "ttl", 0.0)
+@patch("backend.src.price_snapshot.get_http_client")
+@patch("backend.src.user_data.get_http_client")
+def test_pnl_endpoints_report_stale_user_data(mock_core, mock_feed):
+    """Test that expired user data is served and reported while core is failing"""
+    address = "0x1234567890123456789012345678901234567890"
+    positions = [{"pairIndex": 0, "index": 0, "openPrice": 2000 * 10**10, "collateral": 100 * 10**6,
+                  "leverage": 10 * 10**10, "rolloverFee": 0, "buy": True, "isPnl": False}]
+    core_response = MagicMock()
+    core_response.json.return_value = {"positions": positions, "limitOrders": []}
+    mock_core.return_value = MagicMock(get=AsyncMock(return_value=core_response))
+    feed_response = MagicMock()
+    feed_response.json.return_value = [{"pairIndex": 0, "c": 2200.0}]
+    mock_feed.return_value = MagicMock(get=AsyncMock(return_value=feed_response))
+
+    from backend.src.price_snapshot import price_snapshot
+    price_snapshot.updated_at = None
+    response = client.get(f"/api/portfolio/pnl/{address}")
+    assert response.headers["X-Cache"] == "MISS"
+
+    mock_core.return_value = MagicMock(get=AsyncMock(side_effect=httpx.ConnectError("down")))
+    response = client.get(f"/api/portfolio/pnl/{address}")
+    assert response.status_code == 200
+    assert response.headers["X-Cache"] == "STALE"
+    assert response.json()["positionCount"] == 1
+    assert response.json()["userDataAge"] >= 0
+
+    response = client.post("/api/portfolio/pnl/batch", json={"addresses": [address, "0xddd"]})
+    price_snapshot.updated_at = None
+    assert response.status_code == 200
+    data = response.json()
+    assert data["stale"] == [address]
+    assert data["results"][address]["positionCount"] == 1
+    assert set(data["errors"]) == {"0xddd"}
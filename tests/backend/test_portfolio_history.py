@@ -0,0 +1,116 @@
+"""
+Streaming portfolio history tests
+"""
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+from backend.src.circuit_breaker import get_breaker
+from backend.src.config import settings
+from backend.src.http_clients import HISTORY
+from backend.src.index import app
+from backend.src.portfolio_history import iter_history_pages
+
+client = TestClient(app)
+
+
+def _history_trade(pair_index, trade_id):
+    return {"_id": trade_id, "event": {"args": {"t": {"pairIndex": pair_index}}}}
+
+
+@pytest.mark.asyncio
+async def test_iter_history_pages_prefetches_within_window():
+    """Test ordered pages, bounded prefetch and stop on the first empty page"""
+    requested = []
+    in_flight = 0
+    peak = 0
+
+    async def fetch_page(page):
+        nonlocal in_flight, peak
+        requested.append(page)
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01 if page % 2 else 0.001)
+        in_flight -= 1
+        return [page] if page <= 5 else []
+
+    pages = [p async for p in iter_history_pages(fetch_page, window=3, max_pages=100)]
+    assert pages == [[1], [2], [3], [4], [5]]
+    assert peak <= 3
+    assert max(requested) <= 8
+
+
+@pytest.mark.asyncio
+async def test_iter_history_pages_respects_max_pages():
+    """Test the hard page cap"""
+    fetch_page = AsyncMock(side_effect=lambda page: [page])
+    pages = [p async for p in iter_history_pages(fetch_page, window=4, max_pages=2)]
+    assert pages == [[1], [2]]
+    assert fetch_page.await_count == 2
+
+
+@patch("backend.src.pair_metadata.get_trader_client")
+@patch("backend.src.history_store.fetch_history_page")
+def test_stream_endpoint_emits_enriched_ndjson(mock_fetch_page, mock_get_trader_client, sample_pair_data):
+    """Test that the stream emits one enriched trade per line from the local store"""
+    history = {1: [_history_trade(0, "a"), _history_trade(0, "b")], 2: [_history_trade(5, "c")]}
+
+    async def fetch_page(address, page):
+        return history.get(page, [])
+
+    mock_fetch_page.side_effect = fetch_page
+    mock_trader_client = MagicMock()
+    mock_trader_client.pairs_cache.get_pairs_info = AsyncMock(return_value=sample_pair_data)
+    mock_get_trader_client.return_value = mock_trader_client
+
+    response = client.get("/api/portfolio/history/0xabc/stream")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.headers["X-Cache"] == "HIT"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["_id"] for r in rows] == ["a", "b", "c"]
+    assert rows[0]["pairInfo"] == {"from": "ETH", "to": "USD"}
+    assert "pairInfo" not in rows[2]
+
+    # Served from the store: a second stream does not walk the upstream pages again
+    fetched = mock_fetch_page.await_count
+    response = client.get("/api/portfolio/history/0xabc/stream")
+    assert [json.loads(line)["_id"] for line in response.text.splitlines()] == ["a", "b", "c"]
+    assert mock_fetch_page.await_count == fetched
+
+
+@patch.object(settings, "history_backfill_wait", 0.05)
+@patch.object(settings, "history_prefetch_window", 1)
+@patch("backend.src.pair_metadata.get_trader_client")
+@patch("backend.src.history_store.fetch_history_page")
+def test_stream_endpoint_reports_late_errors(mock_fetch_page, mock_get_trader_client, sample_pair_data):
+    """Test that a backfill failing after the stream started ends it with an error line"""
+    async def fetch_page(address, page):
+        if page > 1:
+            await asyncio.sleep(0.2)
+            raise RuntimeError("upstream down")
+        return [_history_trade(0, "a")]
+
+    mock_fetch_page.side_effect = fetch_page
+    mock_trader_client = MagicMock()
+    mock_trader_client.pairs_cache.get_pairs_info = AsyncMock(return_value=sample_pair_data)
+    mock_get_trader_client.return_value = mock_trader_client
+
+    response = client.get("/api/portfolio/history/0xabc/stream")
+    assert response.headers["X-Cache"] == "STALE"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows[0]["_id"] == "a"
+    assert rows[-1] == {"error": "upstream down"}
+
+
+@patch("backend.src.history_store.fetch_history_page")
+def test_stream_endpoint_open_circuit_returns_503(mock_fetch_page):
+    """Test that an open history circuit with nothing stored fails fast"""
+    breaker = get_breaker(HISTORY)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    response = client.get("/api/portfolio/history/0xabc/stream")
+    assert response.status_code == 503
+    mock_fetch_page.assert_not_called()
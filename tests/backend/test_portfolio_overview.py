@@ -0,0 +1,130 @@
+"""
+Portfolio overview aggregation tests
+"""
+import asyncio
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+from backend.src.config import settings
+from backend.src.index import app
+from backend.src.user_data import user_data_cache
+
+client = TestClient(app)
+
+ADDRESS = "0x1234567890123456789012345678901234567890"
+
+
+def _history_client(routes):
+    async def get(path, *args, **kwargs):
+        for suffix, result in routes.items():
+            if suffix in path:
+                if isinstance(result, Exception):
+                    raise result
+                if isinstance(result, float):
+                    await asyncio.sleep(result)
+                    result = {}
+                response = MagicMock()
+                response.json.return_value = result
+                return response
+        raise AssertionError(f"unexpected path {path}")
+
+    mock_http_client = MagicMock()
+    mock_http_client.get = AsyncMock(side_effect=get)
+    return mock_http_client
+
+
+def _history_api_client(routes, upstream_response):
+    """Real client over a mock transport, for routes that stream the upstream body."""
+    async def handler(request):
+        for suffix, result in routes.items():
+            if suffix in request.url.path:
+                if isinstance(result, float):
+                    await asyncio.sleep(result)
+                    result = {}
+                return upstream_response(result)
+        raise AssertionError(f"unexpected path {request.url.path}")
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://api.avantisfi.com")
+
+
+@patch("backend.src.pair_metadata.get_trader_client")
+@patch("backend.src.user_data.get_http_client")
+@patch("backend.src.portfolio_history.get_http_client")
+@patch("backend.src.index.get_http_client")
+def test_overview_combines_all_sources(mock_history, mock_history_pages, mock_core, mock_get_trader_client, sample_pair_data, sample_trade_data, upstream_response):
+    """Test the combined document when every upstream succeeds"""
+    mock_history.return_value = _history_api_client({
+        "profit-loss": {"success": True, "data": [{"total": 12}]},
+        "win-rate": {"success": True, "winRate": 55},
+    }, upstream_response)
+    mock_history_pages.return_value = _history_client({
+        "/1": {"portfolio": [{"_id": "a", "_mapped_netPnl": 3, "event": {"args": {"t": {"pairIndex": 0}}}}]},
+        "/2": {"portfolio": []},
+    })
+    mock_core.return_value = _history_client({"user-data": sample_trade_data})
+    mock_trader_client = MagicMock()
+    mock_trader_client.pairs_cache.get_pairs_info = AsyncMock(return_value=sample_pair_data)
+    mock_get_trader_client.return_value = mock_trader_client
+
+    response = client.get(f"/api/portfolio/overview/{ADDRESS}")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["errors"] == {}
+    assert data["profitLoss"]["data"][0]["total"] == 12
+    assert data["winRate"]["winRate"] == 55
+    assert data["topTrades"][0]["pairInfo"] == {"from": "ETH", "to": "USD"}
+    assert data["userData"]["positions"][0]["collateral"] == 100000000
+
+
+@patch.object(settings, "overview_source_timeout", 0.05)
+@patch("backend.src.pair_metadata.get_trader_client")
+@patch("backend.src.user_data.get_http_client")
+@patch("backend.src.portfolio_history.get_http_client")
+@patch("backend.src.index.get_http_client")
+def test_overview_returns_partial_results(mock_history, mock_history_pages, mock_core, mock_get_trader_client, sample_pair_data, upstream_response):
+    """Test per-source error markers for failing and slow upstreams"""
+    mock_history.return_value = _history_api_client({
+        "profit-loss": {"success": True, "data": []},
+        "win-rate": 1.0,
+    }, upstream_response)
+    mock_history_pages.return_value = _history_client({"/history/": RuntimeError("boom")})
+    mock_core.return_value = _history_client({"user-data": RuntimeError("core down")})
+    mock_trader_client = MagicMock()
+    mock_trader_client.pairs_cache.get_pairs_info = AsyncMock(return_value=sample_pair_data)
+    mock_get_trader_client.return_value = mock_trader_client
+
+    response = client.get(f"/api/portfolio/overview/{ADDRESS}")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["profitLoss"] == {"success": True, "data": []}
+    assert data["winRate"] is None and data["errors"]["winRate"]["status_code"] == 504
+    assert data["topTrades"] is None and data["errors"]["topTrades"]["status_code"] == 500
+    assert data["userData"] is None and "core down" in data["errors"]["userData"]["detail"]
+
+
+@patch.object(user_data_cache, "stale_ttl", 60.0)
+@patch.object(user_data_cache, "ttl", 0.0)
+@patch("backend.src.pair_metadata.get_trader_client")
+@patch("backend.src.user_data.get_http_client")
+@patch("backend.src.portfolio_history.get_http_client")
+@patch("backend.src.index.get_http_client")
+def test_overview_reports_stale_user_data(mock_history, mock_history_pages, mock_core, mock_get_trader_client, sample_pair_data, sample_trade_data, upstream_response):
+    """Test that expired user data is served and listed in `stale` while core is failing"""
+    mock_history.return_value = _history_api_client({
+        "profit-loss": {"success": True, "data": []},
+        "win-rate": {"success": True, "winRate": 55},
+    }, upstream_response)
+    mock_history_pages.return_value = _history_client({"/1": {"portfolio": []}})
+    mock_core.return_value = _history_client({"user-data": sample_trade_data})
+    mock_trader_client = MagicMock()
+    mock_trader_client.pairs_cache.get_pairs_info = AsyncMock(return_value=sample_pair_data)
+    mock_get_trader_client.return_value = mock_trader_client
+
+    assert client.get(f"/api/portfolio/overview/{ADDRESS}").json()["stale"] == []
+
+    mock_core.return_value = _history_client({"user-data": httpx.ConnectError("core down")})
+    data = client.get(f"/api/portfolio/overview/{ADDRESS}").json()
+    assert data["stale"] == ["userData"]
+    assert data["userData"]["positions"][0]["collateral"] == 100000000
+    assert "userData" not in data["errors"]
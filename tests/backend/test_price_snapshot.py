@@ -0,0 +1,90 @@
+"""
+Price snapshot service tests
+"""
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+from backend.src.index import app
+from backend.src.price_snapshot import PriceSnapshot, price_snapshot
+
+client = TestClient(app)
+
+SAMPLE_PRICES = [
+    {"pairIndex": 0, "c": 3000.5},
+    {"pairIndex": 1, "c": 65000.0},
+]
+
+
+def _mock_feed(prices):
+    mock_response = httpx.Response(200, json=prices, request=httpx.Request("GET", "https://feed-v3.avantisfi.com"))
+    mock_http_client = MagicMock()
+    mock_http_client.get = AsyncMock(return_value=mock_response)
+    return mock_http_client
+
+
+@pytest.fixture(autouse=True)
+def reset_snapshot():
+    price_snapshot.updated_at = None
+    yield
+    price_snapshot.updated_at = None
+
+
+def test_update_builds_pair_index():
+    """Test that the pairIndex lookup mirrors the price array"""
+    snapshot = PriceSnapshot(refresh_interval=1.0, max_staleness=5.0)
+    assert snapshot.is_stale()
+    snapshot.update(SAMPLE_PRICES)
+    assert snapshot.prices == SAMPLE_PRICES
+    assert snapshot.by_pair[1]["c"] == 65000.0
+    assert not snapshot.is_stale()
+
+
+def test_failing_listener_does_not_skip_others():
+    """Test a listener error is logged and later listeners still run"""
+    snapshot = PriceSnapshot(refresh_interval=1.0, max_staleness=5.0)
+    received = []
+    snapshot.add_listener(MagicMock(side_effect=ValueError("boom")))
+    snapshot.add_listener(received.append)
+    snapshot.update(SAMPLE_PRICES)
+    assert received == [SAMPLE_PRICES]
+    assert snapshot.by_pair[0]["c"] == 3000.5
+
+
+@pytest.mark.asyncio
+async def test_get_only_refreshes_when_stale():
+    """Test that fresh snapshots are served without an upstream call"""
+    snapshot = PriceSnapshot(refresh_interval=1.0, max_staleness=5.0)
+    feed = _mock_feed(SAMPLE_PRICES)
+    with patch("backend.src.price_snapshot.get_http_client", return_value=feed):
+        await snapshot.get()
+        await snapshot.get()
+    assert feed.get.await_count == 1
+
+    snapshot.max_staleness = 0.0
+    with patch("backend.src.price_snapshot.get_http_client", return_value=feed):
+        await snapshot.get()
+    assert feed.get.await_count == 2
+
+
+@patch("backend.src.price_snapshot.get_http_client")
+def test_last_prices_endpoint(mock_get_http_client):
+    """Test that all prices are served with the snapshot age"""
+    mock_get_http_client.return_value = _mock_feed(SAMPLE_PRICES)
+    response = client.get("/api/price-feeds/last-price")
+    assert response.status_code == 200
+    assert response.json() == SAMPLE_PRICES
+    assert response.headers["content-type"] == "application/json"
+    assert float(response.headers["X-Price-Snapshot-Age"]) >= 0
+
+
+@patch("backend.src.price_snapshot.get_http_client")
+def test_last_price_by_pair_endpoint(mock_get_http_client):
+    """Test per-pair lookup and missing pairs"""
+    mock_get_http_client.return_value = _mock_feed(SAMPLE_PRICES)
+    response = client.get("/api/price-feeds/last-price/1")
+    assert response.status_code == 200
+    assert response.json()["c"] == 65000.0
+
+    response = client.get("/api/price-feeds/last-price/42")
+    assert response.status_code == 404
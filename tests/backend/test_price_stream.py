@@ -0,0 +1,107 @@
+"""
+Price stream fan-out tests
+"""
+import json
+import httpx
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from backend.src.index import app
+from backend.src.price_snapshot import PriceSnapshot
+from backend.src.price_stream import PriceBroadcaster, parse_pair_indices, price_broadcaster, stream_prices
+
+client = TestClient(app)
+
+
+class StandInFeed:
+    """Local stand-in for feed-v3 serving whatever prices the test sets."""
+
+    def __init__(self, prices):
+        self.prices = prices
+
+    def handler(self, request):
+        return httpx.Response(200, json=self.prices)
+
+    def client(self):
+        return httpx.AsyncClient(base_url="http://feed.test", transport=httpx.MockTransport(self.handler))
+
+
+def test_parse_pair_indices():
+    """Test parsing of the pairs query parameter"""
+    assert parse_pair_indices(None) is None
+    assert parse_pair_indices("0, 3,7") == {0, 3, 7}
+    with pytest.raises(ValueError):
+        parse_pair_indices("eth")
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_gets_latest_value_per_pair():
+    """Test that unsent ticks are coalesced per pair"""
+    broadcaster = PriceBroadcaster()
+    subscription = broadcaster.subscribe()
+    for price in (1.0, 2.0, 3.0):
+        broadcaster.publish([{"pairIndex": 0, "c": price}])
+    broadcaster.publish([{"pairIndex": 1, "c": 10.0}])
+
+    batch = await subscription.next_batch()
+    assert sorted(batch, key=lambda e: e["pairIndex"]) == [
+        {"pairIndex": 0, "c": 3.0},
+        {"pairIndex": 1, "c": 10.0},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_subscription_filters_pairs():
+    """Test that clients only receive their subscribed pairs"""
+    broadcaster = PriceBroadcaster()
+    subscription = broadcaster.subscribe({1})
+    broadcaster.publish([{"pairIndex": 0, "c": 1.0}, {"pairIndex": 1, "c": 2.0}])
+    assert await subscription.next_batch() == [{"pairIndex": 1, "c": 2.0}]
+
+    broadcaster.unsubscribe(subscription)
+    assert broadcaster.subscriber_count == 0
+
+
+@pytest.mark.asyncio
+async def test_snapshot_refresh_publishes_only_changes():
+    """Test fan-out from one upstream feed to subscribers"""
+    feed = StandInFeed([{"pairIndex": 0, "c": 1.0}, {"pairIndex": 1, "c": 2.0}])
+    snapshot = PriceSnapshot(refresh_interval=1.0, max_staleness=0.0)
+    broadcaster = PriceBroadcaster()
+    snapshot.add_listener(broadcaster.publish)
+    subscription = broadcaster.subscribe()
+
+    async with feed.client() as feed_client:
+        with patch("backend.src.price_snapshot.get_http_client", return_value=feed_client):
+            await snapshot.refresh()
+            assert len(await subscription.next_batch()) == 2
+
+            feed.prices = [{"pairIndex": 0, "c": 1.5}, {"pairIndex": 1, "c": 2.0}]
+            await snapshot.refresh()
+            assert await subscription.next_batch() == [{"pairIndex": 0, "c": 1.5}]
+
+
+@pytest.mark.asyncio
+async def test_stream_prices_frames():
+    """Test the SSE framing of the initial snapshot and updates"""
+    subscription = price_broadcaster.subscribe({0})
+    with patch("backend.src.price_stream.price_snapshot") as mock_snapshot:
+        mock_snapshot.by_pair = {0: {"pairIndex": 0, "c": 1.0}, 1: {"pairIndex": 1, "c": 2.0}}
+        frames = stream_prices(subscription)
+        first = await frames.__anext__()
+        assert first.startswith("event: snapshot\n")
+        assert json.loads(first.split("data: ")[1]) == [{"pairIndex": 0, "c": 1.0}]
+
+        price_broadcaster.publish([{"pairIndex": 0, "c": 1.1}])
+        second = await frames.__anext__()
+        assert second.startswith("event: prices\n")
+        assert json.loads(second.split("data: ")[1]) == [{"pairIndex": 0, "c": 1.1}]
+        await frames.aclose()
+
+    assert subscription not in price_broadcaster._subscriptions
+
+
+def test_stream_rejects_invalid_pairs():
+    """Test that malformed pair lists are rejected"""
+    response = client.get("/api/price-feeds/stream?pairs=eth")
+    assert response.status_code == 400
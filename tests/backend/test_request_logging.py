@@ -0,0 +1,116 @@
+"""
+Request logging, sampling and request ID tests
+"""
+import io
+import json
+import logging
+import httpx
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from backend.src.config import settings
+from backend.src.http_clients import _forward_request_id
+from backend.src.index import app
+from backend.src.request_logging import (
+    RequestContextFilter,
+    log_sampled_var,
+    request_id_var,
+    sample_rate,
+    setup_logging,
+    stop_logging,
+)
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def log_stream():
+    """Capture the queued log output, then restore the default setup"""
+    stream = io.StringIO()
+    setup_logging(stream)
+    yield stream
+    setup_logging()
+
+
+def _record(level=logging.INFO):
+    return logging.LogRecord("test", level, __file__, 1, "hello %s", ("world",), None)
+
+
+def test_request_id_is_generated_and_echoed():
+    """Test that every response carries a request ID, reusing the caller's"""
+    generated = client.get("/health").headers["x-request-id"]
+    assert len(generated) == 32
+    assert client.get("/health", headers={"X-Request-ID": "abc-123"}).headers["x-request-id"] == "abc-123"
+
+
+@pytest.mark.asyncio
+async def test_request_id_is_forwarded_upstream():
+    """Test the upstream client hook"""
+    request = httpx.Request("GET", "https://core.avantisfi.com/user-data")
+    token = request_id_var.set("abc-123")
+    try:
+        await _forward_request_id(request)
+    finally:
+        request_id_var.reset(token)
+    assert request.headers["X-Request-ID"] == "abc-123"
+
+    untagged = httpx.Request("GET", "https://core.avantisfi.com/user-data")
+    await _forward_request_id(untagged)
+    assert "X-Request-ID" not in untagged.headers
+
+
+@patch.object(settings, "log_sample_rates", {"/api": 0.5, "/api/price-feeds/last-price": 0.0})
+def test_sample_rate_longest_prefix():
+    """Test per-route sample rates"""
+    assert sample_rate("/api/price-feeds/last-price/3") == 0.0
+    assert sample_rate("/api/portfolio/win-rate/x") == 0.5
+    assert sample_rate("/trades") == 1.0
+
+
+def test_filter_drops_info_of_unsampled_requests():
+    """Test that only warnings and errors survive an unsampled request"""
+    log_filter = RequestContextFilter()
+    token = log_sampled_var.set(False)
+    try:
+        assert not log_filter.filter(_record(logging.INFO))
+        assert log_filter.filter(_record(logging.WARNING))
+    finally:
+        log_sampled_var.reset(token)
+    record = _record()
+    assert log_filter.filter(record)
+    assert record.request_id == "-"
+
+
+def test_records_are_written_off_the_caller(log_stream):
+    """Test that records go through the queue listener with the request ID"""
+    logger = logging.getLogger("backend.src.test")
+    token = request_id_var.set("req-1")
+    try:
+        logger.info("hello %s", "world")
+    finally:
+        request_id_var.reset(token)
+    stop_logging()  # drains the queue
+    assert "[req-1] hello world" in log_stream.getvalue()
+
+
+@patch.object(settings, "log_format", "json")
+def test_json_format(log_stream):
+    """Test structured one-object-per-line output"""
+    setup_logging(log_stream)
+    logging.getLogger("backend.src.test").warning("hello %s", "json")
+    stop_logging()
+    entry = json.loads(log_stream.getvalue().strip().splitlines()[-1])
+    assert entry["msg"] == "hello json"
+    assert entry["level"] == "WARNING"
+    assert entry["request_id"] == "-"
+
+
+@patch.object(settings, "log_sample_rates", {"/health": 0.0})
+def test_access_log_is_sampled(log_stream):
+    """Test that unsampled routes write no access line while others do"""
+    client.get("/health")
+    client.get("/ready")
+    stop_logging()
+    output = log_stream.getvalue()
+    assert "GET /health" not in output
+    assert "GET /ready - Status: " in output
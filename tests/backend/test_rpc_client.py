@@ -0,0 +1,167 @@
+"""
+JSON-RPC caching, coalescing and batching tests
+"""
+import asyncio
+import json
+import httpx
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from backend.src.config import settings
+from backend.src.rpc_client import PER_BLOCK, PERMANENT, JsonRpcClient, cache_policy, install, rpc_client
+
+
+class RpcStub:
+    """Local JSON-RPC endpoint recording every HTTP request it receives"""
+
+    def __init__(self, delay=0.0, status_code=200):
+        self.delay = delay
+        self.status_code = status_code
+        self.bodies = []
+        self.block = 100
+
+    def _answer(self, call):
+        method = call["method"]
+        if method == "eth_chainId":
+            return {"jsonrpc": "2.0", "id": call["id"], "result": "0x2105"}
+        if method == "eth_blockNumber":
+            return {"jsonrpc": "2.0", "id": call["id"], "result": hex(self.block)}
+        if method == "eth_call" and call["params"][0].get("to") == "0xrevert":
+            return {"jsonrpc": "2.0", "id": call["id"], "error": {"code": 3, "message": "execution reverted"}}
+        return {"jsonrpc": "2.0", "id": call["id"], "result": f"{method}:{len(self.bodies)}"}
+
+    async def handler(self, request):
+        body = json.loads(request.content)
+        self.bodies.append(body)
+        await asyncio.sleep(self.delay)
+        if self.status_code != 200:
+            return httpx.Response(self.status_code, text="rate limited")
+        if isinstance(body, list):
+            return httpx.Response(200, json=[self._answer(call) for call in body])
+        return httpx.Response(200, json=self._answer(body))
+
+    @property
+    def calls(self):
+        return sum(len(b) if isinstance(b, list) else 1 for b in self.bodies)
+
+
+@pytest.fixture
+def rpc_stub():
+    stub = RpcStub()
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(stub.handler))
+    with patch("backend.src.rpc_pool.get_http_client", return_value=http_client):
+        yield stub
+
+
+def _client(block_time=2.0):
+    return JsonRpcClient(block_time=block_time, batch_window=0.001, max_batch_size=20, max_entries=100)
+
+
+def test_cache_policy():
+    """Test which calls are cached for good, per block or not at all"""
+    assert cache_policy("eth_chainId", []) == PERMANENT
+    assert cache_policy("eth_gasPrice", []) == PER_BLOCK
+    assert cache_policy("eth_call", [{"to": "0xabc"}, "latest"]) == PER_BLOCK
+    assert cache_policy("eth_call", [{"to": "0xabc"}, "0x64"]) == PERMANENT
+    assert cache_policy("eth_getTransactionCount", ["0xabc", "pending"]) is None
+    assert cache_policy("eth_sendRawTransaction", ["0x00"]) is None
+
+
+@pytest.mark.asyncio
+async def test_chain_invariant_results_are_cached(rpc_stub):
+    """Test that eth_chainId goes upstream once"""
+    client = _client(block_time=0.0)
+    first = await client.request("eth_chainId")
+    second = await client.request("eth_chainId")
+    assert first["result"] == second["result"] == "0x2105"
+    assert rpc_stub.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_per_block_results_expire(rpc_stub):
+    """Test that latest-block reads are reused within one block time only"""
+    client = _client(block_time=0.05)
+    first = await client.request("eth_gasPrice")
+    assert (await client.request("eth_gasPrice"))["result"] == first["result"]
+    await asyncio.sleep(0.06)
+    assert (await client.request("eth_gasPrice"))["result"] != first["result"]
+    assert rpc_stub.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_identical_calls_are_coalesced(rpc_stub):
+    """Test that concurrent identical reads share one upstream call"""
+    rpc_stub.delay = 0.01
+    client = _client()
+    call = {"to": "0xpairs", "data": "0x1234"}
+    results = await asyncio.gather(*(client.request("eth_call", [call, "latest"]) for _ in range(10)))
+    assert len({r["result"] for r in results}) == 1
+    assert rpc_stub.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_batched(rpc_stub):
+    """Test that distinct calls issued together go out as one batch"""
+    client = _client()
+    results = await asyncio.gather(
+        client.request("eth_chainId"),
+        client.request("eth_gasPrice"),
+        client.request("eth_getTransactionCount", ["0xtrader", "latest"]),
+        client.request("eth_sendRawTransaction", ["0x00"]),
+    )
+    assert len(rpc_stub.bodies) == 1
+    assert isinstance(rpc_stub.bodies[0], list) and len(rpc_stub.bodies[0]) == 4
+    assert results[0]["result"] == "0x2105"
+    assert results[3]["result"].startswith("eth_sendRawTransaction")
+
+
+@pytest.mark.asyncio
+async def test_errors_are_returned_and_not_cached(rpc_stub):
+    """Test that JSON-RPC errors reach the caller and are retried next time"""
+    client = _client()
+    call = [{"to": "0xrevert", "data": "0x"}, "latest"]
+    assert (await client.request("eth_call", call))["error"]["message"] == "execution reverted"
+    await client.request("eth_call", call)
+    assert rpc_stub.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_http_failure_reaches_every_caller(rpc_stub):
+    """Test that a failed batch raises for all of its calls"""
+    rpc_stub.status_code = 429
+    client = _client()
+    results = await asyncio.gather(
+        client.request("eth_chainId"), client.request("eth_gasPrice"), return_exceptions=True
+    )
+    assert all(isinstance(r, httpx.HTTPStatusError) for r in results)
+    assert len(rpc_stub.bodies) == 1
+
+
+class AsyncProviderStub:
+    def __init__(self, endpoint_uri):
+        self.endpoint_uri = endpoint_uri
+
+    async def make_request(self, method, params):
+        raise AssertionError("not rerouted")
+
+
+class SyncProviderStub:
+    def __init__(self, endpoint_uri):
+        self.endpoint_uri = endpoint_uri
+
+    def make_request(self, method, params):
+        return {"jsonrpc": "2.0", "id": 1, "result": "0x2105"}
+
+
+def test_install_switches_matching_providers():
+    """Test that only async providers for the configured RPC URL are rerouted"""
+    rpc_web3 = SimpleNamespace(provider=AsyncProviderStub(settings.provider_url))
+    sync_web3 = SimpleNamespace(provider=SyncProviderStub(settings.provider_url))
+    l1_web3 = SimpleNamespace(provider=AsyncProviderStub("https://eth.llamarpc.com"))
+    trader_client = SimpleNamespace(web3=sync_web3, async_web3=rpc_web3, l1_async_web3=l1_web3)
+
+    assert install(trader_client) == 1
+    assert rpc_web3.provider.make_request == rpc_client.make_request
+    assert l1_web3.provider.make_request != rpc_client.make_request
+    # The sync provider keeps working for the SDK's blocking helpers
+    assert sync_web3.provider.make_request("eth_chainId", [])["result"] == "0x2105"
@@ -0,0 +1,114 @@
+"""
+Multi-endpoint JSON-RPC pool tests
+"""
+import asyncio
+import json
+import time
+import httpx
+import pytest
+from unittest.mock import patch
+from backend.src.metrics import rpc_extra_requests
+from backend.src.rpc_pool import RpcPool
+
+FAST = "http://fast.rpc/v2/key"
+SLOW = "http://slow.rpc/v2/key"
+BODY = json.dumps({"jsonrpc": "2.0", "id": 1, "method": "eth_gasPrice", "params": []}).encode()
+
+
+class Stubs:
+    """Local JSON-RPC endpoints with injected latency and status per host"""
+
+    def __init__(self, **latency_ms):
+        self.latency = {host: ms / 1e3 for host, ms in latency_ms.items()}
+        self.status = {}
+        self.hits = []
+
+    async def handler(self, request):
+        host = request.url.host.split(".")[0]
+        self.hits.append(host)
+        await asyncio.sleep(self.latency[host])
+        status = self.status.get(host, 200)
+        if status != 200:
+            return httpx.Response(status, text="unavailable")
+        return httpx.Response(200, json={"jsonrpc": "2.0", "id": 1, "result": host})
+
+
+@pytest.fixture
+def stubs():
+    stubs = Stubs(fast=5, slow=60)
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(stubs.handler))
+    with patch("backend.src.rpc_pool.get_http_client", return_value=http_client):
+        yield stubs
+
+
+def _pool(*urls):
+    return RpcPool(urls, alpha=0.3, hedge_min_delay=0.01, hedge_max_delay=0.2, cooldown=5.0)
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_fastest_endpoint(stubs):
+    """Test that EWMA latency moves traffic to the faster endpoint"""
+    pool = _pool(SLOW, FAST)
+    for _ in range(10):
+        await pool.post(BODY, read_only=False)
+    assert pool.ranked()[0].url == FAST
+    assert stubs.hits.count("fast") >= 8
+    assert pool.endpoints[1].latency < pool.endpoints[0].latency
+
+
+@pytest.mark.asyncio
+async def test_slow_read_is_hedged(stubs):
+    """Test that a read stuck past the p95 delay is answered by the second endpoint"""
+    pool = _pool(SLOW, FAST)
+    slow, fast = pool.endpoints
+    for _ in range(10):
+        slow.record_success(0.001)  # looked fast until now
+        fast.record_success(0.005)
+
+    started = time.perf_counter()
+    result = await pool.post(BODY, read_only=True)
+    elapsed = time.perf_counter() - started
+
+    assert result["result"] == "fast"
+    assert elapsed < 0.05
+    assert stubs.hits == ["slow", "fast"]
+    assert rpc_extra_requests.values[("hedge",)] == 1
+    assert rpc_extra_requests.values[("hedge_won",)] == 1
+
+
+@pytest.mark.asyncio
+async def test_writes_are_not_hedged(stubs):
+    """Test that a non-read call waits for its endpoint"""
+    pool = _pool(SLOW, FAST)
+    for _ in range(10):
+        pool.endpoints[0].record_success(0.001)
+        pool.endpoints[1].record_success(0.005)
+
+    result = await pool.post(BODY, read_only=False)
+    assert result["result"] == "slow"
+    assert stubs.hits == ["slow"]
+
+
+@pytest.mark.asyncio
+async def test_failing_endpoint_is_skipped(stubs):
+    """Test failover for reads and the cooldown after a failure"""
+    stubs.status["fast"] = 503
+    pool = _pool(FAST, SLOW)
+
+    result = await pool.post(BODY, read_only=True)
+    assert result["result"] == "slow"
+    assert [e.url for e in pool.ranked()] == [SLOW, FAST]
+    assert pool.endpoints[0].error_rate > 0
+
+
+@pytest.mark.asyncio
+async def test_write_failover_only_when_not_delivered(stubs):
+    """Test that writes move on after a 429 but not after a 500"""
+    stubs.status["fast"] = 429
+    assert (await _pool(FAST, SLOW).post(BODY, read_only=False))["result"] == "slow"
+
+    stubs.status["fast"] = 500
+    stubs.hits.clear()
+    with pytest.raises(httpx.HTTPStatusError):
+        await _pool(FAST, SLOW).post(BODY, read_only=False)
+    assert stubs.hits == ["fast"]
@@ -0,0 +1,231 @@
+"""
+Memory-mapped tick store tests
+"""
+import os
+import numpy as np
+import pytest
+from unittest.mock import patch
+from backend.src.candles import CandleStore
+from backend.src.tick_store import LOCK_RETRY_SECONDS, Segment, TickStore, TickStoreError
+
+T0 = 1_700_000_100.0
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TickStore(str(tmp_path / "ticks"), segment_capacity=8, segment_seconds=3600, retention=86400)
+    yield store
+    store.close()
+
+
+def _fill(store, updates, pairs=(0, 1), step=10.0):
+    for i in range(updates):
+        store.append(T0 + i * step, list(pairs), [100.0 + i + p for p in pairs])
+
+
+def test_append_and_range_by_time_and_pair(store):
+    """Test time ranges are half-open and pair filters apply"""
+    _fill(store, 3)
+    ticks = store.range(T0 + 10, T0 + 20)
+    assert ticks.t.tolist() == [T0 + 10, T0 + 10]
+    assert ticks.pair_index.tolist() == [0, 1]
+    assert ticks.price.tolist() == [101.0, 102.0]
+
+    ticks = store.range(pair_index=1)
+    assert ticks.price.tolist() == [101.0, 102.0, 103.0]
+    assert len(store.range(T0 + 1000)) == 0
+
+
+def test_single_segment_reads_are_views_of_the_file(store):
+    """Test readers get arrays over the mapping, not copies"""
+    _fill(store, 2)
+    ticks = store.range()
+    assert not any(column.flags.owndata for column in ticks)
+    assert ticks.t.base is not None
+
+
+def test_read_only_segments_are_unmapped_after_queries(store):
+    """Test only the segment being written stays mapped"""
+    _fill(store, 6)
+    closed = []
+    close = Segment.close
+
+    def tracking_close(segment):
+        closed.append(segment.path)
+        close(segment)
+
+    with patch.object(Segment, "close", tracking_close):
+        older = store.range(pair_index=0)
+        assert len(older) == 6
+    first, active = [info.path for info in store.segments()]
+    assert closed == [first]
+    assert store._active.path == active
+
+
+def test_segments_rotate_when_full_and_by_age(store):
+    """Test appends spill into new segments and queries span them"""
+    _fill(store, 6)  # 12 ticks over capacity-8 segments
+    assert store.stats()["segments"] == 2
+    assert store.stats()["ticks"] == 12
+    assert store.range(pair_index=0).price.tolist() == [100.0, 101.0, 102.0, 103.0, 104.0, 105.0]
+
+    store.append(T0 + 3600 * 2, [0], [1.0])
+    assert store.stats()["segments"] == 3
+
+    # One update larger than a segment
+    store.append(T0 + 3600 * 2 + 1, list(range(10)), [float(p) for p in range(10)])
+    assert store.stats()["segments"] == 4
+    assert store.range(T0 + 3600 * 2 + 1).pair_index.tolist() == list(range(10))
+
+
+def test_reopened_store_reads_existing_segments(store, tmp_path):
+    """Test ticks survive a restart and new appends go to a new segment"""
+    _fill(store, 2)
+    store.close()
+
+    reopened = TickStore(store.path, segment_capacity=8, segment_seconds=3600, retention=86400)
+    assert reopened.range().price.tolist() == [100.0, 101.0, 101.0, 102.0]
+    reopened.append(T0 + 100, [0], [7.0])
+    assert reopened.stats()["segments"] == 2
+    assert reopened.range(T0 + 50).price.tolist() == [7.0]
+    reopened.close()
+
+
+def test_late_ticks_are_dropped(store):
+    """Test a segment stays sorted by time"""
+    store.append(T0 + 10, [0], [1.0])
+    store.append(T0, [0], [2.0])
+    assert store.late_ticks == 1
+    assert store.range().price.tolist() == [1.0]
+
+
+def test_retention_deletes_old_segments(store):
+    """Test expired segments are removed when a new one starts"""
+    _fill(store, 4)
+    old = {os.path.basename(s.path) for s in store.segments()}
+    store.append(T0 + 86400 * 2, [0], [1.0])
+    names = {os.path.basename(s.path) for s in store.segments()}
+    assert not names & old
+    assert store.range().price.tolist() == [1.0]
+
+
+def test_size_limits_delete_oldest_segments(tmp_path):
+    """Test segment count and byte caps keep the newest segments"""
+    store = TickStore(str(tmp_path), segment_capacity=8, segment_seconds=10, retention=86400, max_segments=2)
+    for i in range(4):
+        store.append(T0 + 10 * i, [0], [float(i)])
+    assert store.stats()["segments"] == 2
+    assert store.range().price.tolist() == [2.0, 3.0]
+
+    store.max_segments, store.max_bytes = None, store.stats()["bytes"] - 1
+    store.append(T0 + 40, [0], [4.0])
+    assert store.stats()["segments"] == 1
+    assert store.range().price.tolist() == [4.0]
+    store.close()
+
+
+def test_rejects_foreign_files(tmp_path):
+    """Test non-segment files are not read as ticks"""
+    path = tmp_path / "bogus.ticks"
+    path.write_bytes(b"not a segment" * 10)
+    with pytest.raises(TickStoreError):
+        Segment.open(str(path))
+    store = TickStore(str(tmp_path), segment_capacity=8, segment_seconds=3600, retention=86400)
+    assert store.segments() == []
+
+
+def test_feed_updates_are_stored(store):
+    """Test the price snapshot listener stores changed entries"""
+    with patch("backend.src.tick_store.time.time", return_value=T0):
+        store.on_prices([{"pairIndex": 3, "c": 42.5}, {"pairIndex": 4, "c": None}])
+    ticks = store.range()
+    assert ticks.pair_index.tolist() == [3]
+    assert ticks.price.tolist() == [42.5]
+
+
+def test_candles_backfill_from_ticks(store):
+    """Test candles rebuilt from stored ticks match live aggregation"""
+    rng = np.random.default_rng(0)
+    live = CandleStore(["1m", "5m"], capacity=16, max_pairs=4)
+    big = TickStore(store.path + "-big", segment_capacity=50, segment_seconds=3600, retention=86400)
+    for i in range(120):
+        prices = rng.uniform(90, 110, size=3)
+        live.ingest(T0 + i * 7, [0, 1, 2], prices)
+        big.append(T0 + i * 7, [0, 1, 2], prices)
+
+    backfilled = CandleStore(["1m", "5m"], capacity=16, max_pairs=4)
+    assert backfilled.backfill(big, T0 + 120 * 7) == 2 * 360
+    for resolution in ("1m", "5m"):
+        for pidx in range(3):
+            assert backfilled.candles(pidx, resolution) == live.candles(pidx, resolution)
+    big.close()
+
+
+def test_backfill_merges_segments_of_several_writers(tmp_path):
+    """Test overlapping segments from successive writers fold in time order, none dropped as late"""
+    path = str(tmp_path / "shared")
+    for parity in (0, 1):
+        # The second writer takes over the lock with the first one's segment still open in time
+        writer = TickStore(path, segment_capacity=64, segment_seconds=3600, retention=86400)
+        for i in range(parity, 40, 2):
+            writer.append(T0 + 15 * i, [i % 3], [100.0 + i])
+        writer.close()
+    live = CandleStore(["1m"], capacity=16, max_pairs=4)
+    for i in range(40):
+        live.ingest(T0 + 15 * i, [i % 3], [100.0 + i])
+
+    reader = TickStore(path, segment_capacity=64, segment_seconds=3600, retention=86400)
+    assert reader.stats()["segments"] == 2
+    assert reader.range().t.tolist() == [T0 + 15 * i for i in range(40)]
+    backfilled = CandleStore(["1m"], capacity=16, max_pairs=4)
+    assert backfilled.backfill(reader, T0 + 600) == 40
+    assert backfilled.rings["1m"].late_ticks == 0
+    for pidx in range(3):
+        assert backfilled.candles(pidx, "1m") == live.candles(pidx, "1m")
+    reader.close()
+
+
+def test_one_writer_per_directory(tmp_path):
+    """Test a second process neither writes nor deletes the writer's segments, and takes over later"""
+    path = str(tmp_path / "shared")
+    first = TickStore(path, segment_capacity=8, segment_seconds=3600, retention=86400)
+    second = TickStore(path, segment_capacity=8, segment_seconds=3600, retention=86400)
+    first.append(T0, [0], [1.0])
+    # Would start a segment and expire the writer's active one if it could write
+    second.append(T0 + 2 * 86400, [0, 1], [2.0, 3.0])
+    assert second.unwritten_ticks == 2
+    assert second.enforce_retention(T0 + 2 * 86400) == 0
+    first.append(T0 + 10, [0], [4.0])
+    assert first.range().price.tolist() == [1.0, 4.0]
+
+    first.close()
+    second.append(T0 + 2 * 86400 + 1, [0], [5.0])  # still waiting to retry the lock
+    second.append(T0 + 2 * 86400 + LOCK_RETRY_SECONDS, [0], [6.0])
+    assert second.unwritten_ticks == 3
+    assert second.range().price.tolist() == [6.0]
+    second.close()
+
+
+def test_backfill_window_is_capped_by_retention(tmp_path):
+    """Test the daily ring does not read ticks older than the retention"""
+    store = TickStore(str(tmp_path), segment_capacity=8, segment_seconds=10 * 86400, retention=86400)
+    store.append(T0 - 3 * 86400, [0], [1.0])
+    store.append(T0, [0], [2.0])
+    assert store.stats()["ticks"] == 2  # same segment, so not deleted yet
+    candles = CandleStore(["1d"], capacity=30, max_pairs=4)
+    assert candles.backfill(store, T0 + 1) == 1
+    assert candles.candles(0, "1d")["c"] == [2.0]
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_live_ticks_wait_for_background_backfill(store):
+    """Test updates arriving during the backfill are applied after it, not dropped as late"""
+    store.append(T0, [0], [1.0])
+    candles = CandleStore(["1m"], capacity=4, max_pairs=4)
+    candles.start_backfill(store, T0 + 30)
+    with patch("backend.src.candles.time.time", return_value=T0 + 40):
+        candles.on_prices([{"pairIndex": 0, "c": 3.0}])
+    await candles._backfill_task
+    assert candles.candles(0, "1m") == {"t": [T0 - T0 % 60], "o": [1.0], "h": [3.0], "l": [1.0], "c": [3.0], "v": [2]}
+    await candles.stop()
@@ -0,0 +1,90 @@
+"""
+Batch transaction builder tests
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+from backend.src.index import app
+from backend.src.tx_batch import TxBuildContext, run_batch
+
+client = TestClient(app)
+
+TRADER = "0x1234567890123456789012345678901234567890"
+
+
+@pytest.mark.asyncio
+async def test_run_batch_preserves_order_and_bounds_concurrency():
+    """Test input-order results and the concurrency limit"""
+    running = 0
+    peak = 0
+
+    async def build(item):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01 * (5 - item))
+        running -= 1
+        if item == 2:
+            raise ValueError("boom")
+        return {"to": f"0x{item}"}
+
+    results = await run_batch(list(range(5)), build, concurrency=2)
+    assert peak == 2
+    assert [r.ok for r in results] == [True, True, False, True, True]
+    assert results[3].tx.to == "0x3"
+    assert results[2].error == "boom"
+
+
+@pytest.mark.asyncio
+async def test_context_resolves_each_pair_name_once():
+    """Test that pair-name resolution is shared within a context"""
+    trader_client = MagicMock()
+    trader_client.pairs_cache.get_pair_index = AsyncMock(return_value=4)
+    ctx = TxBuildContext(trader_client)
+    results = await asyncio.gather(*(ctx.resolve_pair_index("ETH/USD", None) for _ in range(3)))
+    assert results == [4, 4, 4]
+    assert await ctx.resolve_pair_index("ETH/USD", 7) == 7
+    trader_client.pairs_cache.get_pair_index.assert_awaited_once_with("ETH/USD")
+
+
+@patch("backend.src.index.get_trader_client")
+@patch("backend.src.user_data.get_http_client")
+def test_batch_endpoint_mixed_items(mock_get_http_client, mock_get_client, sample_trade_data):
+    """Test a mixed batch with per-item results and one shared user-data fetch"""
+    mock_response = MagicMock()
+    mock_response.json.return_value = {
+        "positions": sample_trade_data["positions"] + [{"pairIndex": 0, "index": 1, "collateral": 50000000}],
+        "limitOrders": [],
+    }
+    core = MagicMock()
+    core.get = AsyncMock(return_value=mock_response)
+    mock_get_http_client.return_value = core
+
+    trader_client = MagicMock()
+    trader_client.pairs_cache.get_pair_index = AsyncMock(return_value=0)
+    trader_client.trade.build_trade_close_tx = AsyncMock(return_value={"to": "0xclose", "data": "0x"})
+    trader_client.trade.build_order_cancel_tx = AsyncMock(side_effect=Exception("order not found"))
+    mock_get_client.return_value = trader_client
+
+    response = client.post("/tx/batch", json={"items": [
+        {"type": "close", "params": {"trader_address": TRADER, "pair": "ETH/USD", "index": 0}},
+        {"type": "cancel", "params": {"trader_address": TRADER, "pair_index": 0, "trade_index": 3}},
+        {"type": "close", "params": {"trader_address": TRADER, "pair": "ETH/USD", "index": 1}},
+    ]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["ok"] for r in results] == [True, False, True]
+    assert results[0]["tx"]["to"] == "0xclose"
+    assert results[1]["status_code"] == 400
+    assert "order not found" in results[1]["error"]
+    assert core.get.await_count == 1
+    trader_client.pairs_cache.get_pair_index.assert_awaited_once_with("ETH/USD")
+
+
+def test_batch_endpoint_rejects_unknown_type():
+    """Test that items are validated against the existing request models"""
+    response = client.post("/tx/batch", json={"items": [{"type": "swap", "params": {}}]})
+    assert response.status_code == 422
+    response = client.post("/tx/batch", json={"items": []})
+    assert response.status_code == 422
@@ -0,0 +1,113 @@
+"""
+User-data cache tests
+"""
+import asyncio
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+from backend.src.index import app
+from backend.src.user_data import UserData, UserDataCache, normalize_address, user_data_cache
+
+client = TestClient(app)
+
+TRADER = "0x1234567890123456789012345678901234567890"
+
+
+def _mock_core(data, delay=0.0):
+    async def get(*args, **kwargs):
+        await asyncio.sleep(delay)
+        return mock_response
+
+    mock_response = httpx.Response(200, json=data, request=httpx.Request("GET", "https://core.avantisfi.com/user-data"))
+    mock_http_client = MagicMock()
+    mock_http_client.get = AsyncMock(side_effect=get)
+    return mock_http_client
+
+
+def test_normalize_address_ignores_case():
+    """Test that differently-cased addresses share one key"""
+    assert normalize_address(TRADER.upper().replace("0X", "0x")) == normalize_address(TRADER)
+
+
+def test_user_data_position_index(sample_trade_data):
+    """Test positions are indexed by (pairIndex, index)"""
+    user_data = UserData(sample_trade_data)
+    assert user_data.position(0, 0)["collateral"] == 100000000
+    assert user_data.position(0, 1) is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_gets_share_one_fetch(sample_trade_data):
+    """Test single-flight coalescing of concurrent misses"""
+    cache = UserDataCache(ttl=10.0)
+    core = _mock_core(sample_trade_data, delay=0.01)
+    with patch("backend.src.user_data.get_http_client", return_value=core):
+        results = await asyncio.gather(*(cache.get(TRADER) for _ in range(5)))
+        await cache.get(TRADER.lower())
+    assert core.get.await_count == 1
+    assert all(r is results[0] for r in results)
+
+
+@pytest.mark.asyncio
+async def test_ttl_and_invalidate(sample_trade_data):
+    """Test that expired or invalidated entries are refetched"""
+    cache = UserDataCache(ttl=0.0)
+    core = _mock_core(sample_trade_data)
+    with patch("backend.src.user_data.get_http_client", return_value=core):
+        await cache.get(TRADER)
+        await cache.get(TRADER)
+        assert core.get.await_count == 2
+
+        cache.ttl = 10.0
+        await cache.get(TRADER)
+        cache.invalidate(TRADER)
+        await cache.get(TRADER)
+        assert core.get.await_count == 3
+
+
+@patch("backend.src.index.get_trader_client")
+@patch("backend.src.user_data.get_http_client")
+def test_close_trade_uses_cache_and_invalidates(mock_get_http_client, mock_get_client, sample_trade_data):
+    """Test the percent-close path reads cached positions and invalidates after"""
+    core = _mock_core(sample_trade_data)
+    mock_get_http_client.return_value = core
+    mock_trader_client = MagicMock()
+    mock_trader_client.trade.build_trade_close_tx = AsyncMock(return_value={"to": "0xabc", "data": "0x"})
+    mock_get_client.return_value = mock_trader_client
+
+    assert client.get(f"/trades?trader_address={TRADER}").status_code == 200
+    response = client.post(
+        "/trades/close",
+        json={"trader_address": TRADER, "pair_index": 0, "index": 0, "close_percent": 50},
+    )
+    assert response.status_code == 200
+    assert core.get.await_count == 1
+    kwargs = mock_trader_client.trade.build_trade_close_tx.await_args.kwargs
+    assert kwargs["collateral_to_close"] == 50.0
+    assert normalize_address(TRADER) not in user_data_cache._entries
+
+
+@pytest.mark.asyncio
+async def test_cache_is_bounded_and_drops_expired_entries(sample_trade_data):
+    """Test LRU eviction past max_entries and removal of entries past the stale window"""
+    cache = UserDataCache(ttl=10.0, stale_ttl=0.0, max_entries=2)
+    traders = [f"0x{i:040x}" for i in range(3)]
+    with patch("backend.src.user_data.get_http_client", return_value=_mock_core(sample_trade_data)):
+        await cache.get(traders[0])
+        await cache.get(traders[1])
+        await cache.get(traders[0])  # hit: now most recently used
+        await cache.get(traders[2])
+        assert set(cache._entries) == {normalize_address(traders[0]), normalize_address(traders[2])}
+
+        cache.ttl = 0.0
+        await cache.get(traders[1])
+        assert list(cache._entries) == [normalize_address(traders[1])]
+
+
+@patch("backend.src.user_data.get_http_client")
+def test_trades_reports_miss_then_hit(mock_get_http_client, sample_trade_data):
+    """Test X-Cache is MISS for the request that fetched and HIT after"""
+    mock_get_http_client.return_value = _mock_core(sample_trade_data)
+    assert client.get(f"/trades?trader_address={TRADER}").headers["X-Cache"] == "MISS"
+    assert client.get(f"/trades?trader_address={TRADER}").headers["X-Cache"] == "HIT"
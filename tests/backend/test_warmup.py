@@ -0,0 +1,123 @@
+"""
+Startup warm-up and readiness tests
+"""
+import sys
+import threading
+import time
+import types
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+from backend.src import avantis_client
+from backend.src.config import settings
+from backend.src.index import app
+from backend.src.pair_metadata import pair_metadata
+from backend.src.pairs_payload import pairs_payload
+from backend.src.warmup import Warmup, warmup
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_warmup():
+    warmup.__init__()
+    yield
+    warmup.__init__()
+
+
+def _mock_trader_client(pairs):
+    trader_client = MagicMock()
+    trader_client.pairs_cache.get_pairs_info = AsyncMock(return_value=pairs)
+    return trader_client
+
+
+@pytest.mark.asyncio
+@patch("backend.src.warmup.import_module")
+@patch("backend.src.pair_metadata.get_trader_client")
+@patch("backend.src.warmup.get_trader_client")
+async def test_warmup_runs_every_phase(mock_get_trader_client, mock_metadata_trader_client, mock_import_module, sample_pair_data):
+    """Test phase order, timings and preloaded pair indexes"""
+    mock_get_trader_client.return_value = mock_metadata_trader_client.return_value = _mock_trader_client(sample_pair_data)
+    state = Warmup()
+    assert not state.ready
+
+    await state.run()
+
+    assert state.ready
+    assert list(state.phases) == ["trader_client", "sdk_types", "pairs_info", "pairs_payload"]
+    mock_import_module.assert_called_once_with("avantis_trader_sdk.types")
+    assert pair_metadata.get(0).name == "ETH/USD"
+    assert pairs_payload.version == pair_metadata.version
+    status = state.status()
+    assert status["status"] == "ready"
+    assert set(status["phases_ms"]) == set(state.phases)
+
+
+@pytest.mark.asyncio
+@patch("backend.src.warmup.import_module")
+@patch("backend.src.pair_metadata.get_trader_client")
+@patch("backend.src.warmup.get_trader_client")
+async def test_warmup_failure_is_reported(mock_get_trader_client, mock_metadata_trader_client, mock_import_module):
+    """Test that a failing phase stops the warm-up and is reported"""
+    trader_client = MagicMock()
+    trader_client.pairs_cache.get_pairs_info = AsyncMock(side_effect=RuntimeError("rpc down"))
+    mock_get_trader_client.return_value = mock_metadata_trader_client.return_value = trader_client
+    state = Warmup()
+
+    await state.run()
+
+    assert not state.ready
+    assert "pairs_info" not in state.phases
+    assert state.status()["status"] == "failed"
+    assert "rpc down" in state.status()["error"]
+
+
+@pytest.mark.asyncio
+@patch("backend.src.warmup.import_module")
+@patch("backend.src.pair_metadata.get_trader_client")
+@patch("backend.src.warmup.get_trader_client")
+async def test_ready_endpoint_gates_on_warmup(mock_get_trader_client, mock_metadata_trader_client, mock_import_module, sample_pair_data):
+    """Test /ready is 503 until warm-up finishes, while /health stays ok"""
+    mock_get_trader_client.return_value = mock_metadata_trader_client.return_value = _mock_trader_client(sample_pair_data)
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "warming_up"
+    assert client.get("/health").status_code == 200
+
+    await warmup.run()
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+    assert "pairs_info" in response.json()["phases_ms"]
+
+
+@patch.object(settings, "warmup_on_startup", False)
+def test_ready_without_warmup():
+    """Test that /ready is immediately ready when warm-up is disabled"""
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+
+def test_trader_client_is_built_once_across_threads():
+    """Test warmup's worker thread and a handler racing for the client share one instance"""
+    built = []
+
+    class SlowTraderClient:
+        def __init__(self, provider_url):
+            time.sleep(0.05)
+            built.append(self)
+
+    sdk = types.SimpleNamespace(TraderClient=SlowTraderClient)
+    results = []
+    with patch.dict(sys.modules, {"avantis_trader_sdk": sdk}), \
+            patch.object(settings, "rpc_cache_enabled", False), \
+            patch.object(avantis_client, "_trader_client", None):
+        threads = [threading.Thread(target=lambda: results.append(avantis_client.get_trader_client())) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert len(built) == 1
+    assert all(result is built[0] for result in results)